@@ -8,14 +8,21 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
-import yfinance as yf
+from modules.provedor_mercado import obter_provedor
 from modules.ticker_info import CACHE_PATH as TICKER_INFO_PATH
 
 from modules.usuarios import carregar_usuarios, salvar_usuarios
 from modules.upload_relatorio import ACOES_PATH, RENDA_FIXA_PATH, PROVENTOS_PATH, padronizar_tabelas, padronizar_dividendos
+from modules.base_particionada import ano_mes_particao, assinatura_base, carregar_base, particoes_base
+from modules.upload_pdf_avenue import ACOES_PDF_PATH, DIVIDENDOS_PDF_PATH
 from modules.avenue_views import aba_acoes_avenue, aba_proventos_avenue, padronizar_dividendos_avenue, carregar_dividendos_avenue, padronizar_acoes_avenue, carregar_acoes_avenue
-from modules.cotacoes import converter_usd_para_brl, obter_historico_indice
+from modules.cotacoes import converter_df_usd_para_brl, converter_usd_para_brl_serie, obter_historico_indice
+from modules.precos_historicos import obter_close_mensal
+from modules.parse_numeros import parse_num_misto_serie
 from modules.posicao_atual import preparar_posicao_base, atualizar_cotacoes, dataframe_para_excel_bytes, preparar_tabela_posicao_estilizada
+from modules.atualizador_posicao import SnapshotPosicao, chave_base, obter_atualizador
+from modules.sessoes_http import estatisticas_http
+from modules.armazenamento import ConflitoVersaoError, gravar_parquet_atomico, gravar_texto_atomico, trava_dataset, versao_arquivo
 from modules.investimentos_manuais import (
     carregar_caixa,
     registrar_caixa,
@@ -40,13 +47,16 @@ from modules.opcoes import (
     filtrar_opcoes,
     exportar_vendas_para_excel,
     calcular_estatisticas_opcoes,
+    calcular_gregas_vendas,
     ARQ_VENDAS_OPCOES,
 )
+from modules.gregas import COLUNAS_GREGAS, adicionar_gregas
 
 from modules.opcoes_net import (
     buscar_opcoes_opcoesnet_bovespa,
     carregar_cache_opcoesnet,
     salvar_cache_opcoesnet,
+    salvar_snapshot_opcoesnet,
     exportar_opcoesnet_para_excel,
     LayoutOpcoesNetMudouError,
     listar_vencimentos_opcoesnet,
@@ -117,20 +127,46 @@ div[data-testid="stMetricValue"] {
 # ========== FUNÇÕES AUXILIARES ==========
 
 @st.cache_data(show_spinner=False)
-def _read_parquet_cached(path: str, mtime: float):
-    return pd.read_parquet(path)
+def _read_parquet_cached(path: str, mtime: float, usuarios: tuple | None = None, meses: tuple | None = None):
+    # Arquivo único ou base particionada por usuário/mês (só as partições pedidas)
+    return carregar_base(path, usuarios=usuarios, meses=meses)
 
-def carregar_df_parquet(path):
+def carregar_df_parquet(path, usuarios=None, meses=None):
     if os.path.exists(path):
         try:
-            mtime = os.path.getmtime(path)
-            return _read_parquet_cached(path, mtime)
+            mtime = assinatura_base(path)
+            if mtime is None:
+                return pd.DataFrame()
+            return _read_parquet_cached(
+                path,
+                mtime,
+                tuple(usuarios) if usuarios is not None else None,
+                tuple(meses) if meses is not None else None,
+            )
         except Exception:
             return pd.DataFrame()
     else:
         return pd.DataFrame()
 
 
+@st.cache_data(show_spinner=False)
+def _particoes_cached(path: str, mtime: float) -> list:
+    return particoes_base(path)
+
+
+def particoes_dashboard(paths) -> list:
+    """(Usuário, Mês/Ano) gravados nas bases, pelos nomes das partições."""
+    saida = []
+    for path in paths:
+        try:
+            mtime = assinatura_base(path) if os.path.exists(path) else None
+            if mtime is not None:
+                saida.extend(_particoes_cached(path, mtime))
+        except Exception:
+            continue
+    return saida
+
+
 def _normalizar_df_caixa(df: pd.DataFrame) -> pd.DataFrame:
     if df is None or not isinstance(df, pd.DataFrame) or df.empty:
         return pd.DataFrame()
@@ -779,15 +815,34 @@ def gerar_grafico_top_pagadores(df: pd.DataFrame, coluna_ativo: str = "Ativo", c
 df_usuarios = carregar_usuarios()
 usuarios_list = sorted(df_usuarios.get("Nome", pd.Series()).dropna().unique().tolist()) if not df_usuarios.empty else []
 
+# Partições lidas: só os usuários e o período escolhidos na barra lateral
+PERIODOS_CARGA = {"Todo o histórico": None, "Últimos 12 meses": 12, "Últimos 24 meses": 24, "Últimos 36 meses": 36}
+particoes_dados = particoes_dashboard([ACOES_PATH, RENDA_FIXA_PATH, PROVENTOS_PATH, ACOES_PDF_PATH, DIVIDENDOS_PDF_PATH])
+usuarios_dados = sorted({str(u) for u, _m in particoes_dados if u} | set(usuarios_list))
+meses_dados = sorted({m for _u, m in particoes_dados if m}, key=ano_mes_particao)
+with st.sidebar:
+    st.subheader("Dados carregados")
+    usuarios_carga = st.multiselect(
+        "Usuários",
+        usuarios_dados,
+        key="carga_usuarios",
+        placeholder="Todos",
+        help="Só as partições destes usuários são lidas (vazio = todos)",
+    )
+    periodo_carga = st.selectbox("Período", list(PERIODOS_CARGA), key="carga_periodo")
+filtro_usuarios = usuarios_carga or None
+meses_periodo = PERIODOS_CARGA[periodo_carga]
+filtro_meses = meses_dados[-meses_periodo:] if meses_periodo and meses_dados else None
+
 # Dados brasileiros
-df_acoes_raw = carregar_df_parquet(ACOES_PATH)
-df_rf_raw = carregar_df_parquet(RENDA_FIXA_PATH)
-df_prov_raw = carregar_df_parquet(PROVENTOS_PATH)
+df_acoes_raw = carregar_df_parquet(ACOES_PATH, filtro_usuarios, filtro_meses)
+df_rf_raw = carregar_df_parquet(RENDA_FIXA_PATH, filtro_usuarios, filtro_meses)
+df_prov_raw = carregar_df_parquet(PROVENTOS_PATH, filtro_usuarios, filtro_meses)
 df_padronizado = padronizar_tabelas(df_acoes_raw, df_rf_raw)
 
 # Dados Avenue
-df_acoes_avenue_raw = carregar_acoes_avenue()
-df_dividendos_avenue_raw = carregar_dividendos_avenue()
+df_acoes_avenue_raw = carregar_acoes_avenue(filtro_usuarios, filtro_meses)
+df_dividendos_avenue_raw = carregar_dividendos_avenue(filtro_usuarios, filtro_meses)
 
 # Padronizar e converter Avenue
 df_acoes_avenue_padrao = pd.DataFrame()
@@ -795,16 +850,7 @@ if not df_acoes_avenue_raw.empty:
     df_acoes_avenue_padrao = padronizar_acoes_avenue(df_acoes_avenue_raw)
     
     # Converter USD para BRL
-    if "Valor de Mercado" in df_acoes_avenue_padrao.columns and "Mês/Ano" in df_acoes_avenue_padrao.columns:
-        df_acoes_avenue_padrao["Valor de Mercado"] = df_acoes_avenue_padrao.apply(
-            lambda row: converter_usd_para_brl(row["Valor de Mercado"], row["Mês/Ano"]) if pd.notna(row["Mês/Ano"]) else row["Valor de Mercado"],
-            axis=1
-        )
-    if "Preço" in df_acoes_avenue_padrao.columns and "Mês/Ano" in df_acoes_avenue_padrao.columns:
-        df_acoes_avenue_padrao["Preço"] = df_acoes_avenue_padrao.apply(
-            lambda row: converter_usd_para_brl(row["Preço"], row["Mês/Ano"]) if pd.notna(row["Mês/Ano"]) else row["Preço"],
-            axis=1
-        )
+    df_acoes_avenue_padrao = converter_df_usd_para_brl(df_acoes_avenue_padrao, ["Valor de Mercado", "Preço"], coluna_mes="Mês/Ano")
     
     df_acoes_avenue_padrao["Tipo"] = "Ações Dólar"
     
@@ -851,17 +897,8 @@ def _yf_close_mensal(sym: str) -> pd.Series:
     if not sym:
         return pd.Series(dtype=float)
     try:
-        hist = yf.Ticker(sym).history(period="max", interval="1d", auto_adjust=False)
-        if not isinstance(hist, pd.DataFrame) or hist.empty or "Close" not in hist.columns:
-            return pd.Series(dtype=float)
-        s = pd.to_numeric(hist["Close"], errors="coerce")
-        s.index = pd.to_datetime(s.index, errors="coerce")
-        s = s[~s.index.isna()].copy()
-        if s.empty:
-            return pd.Series(dtype=float)
-        s_m = s.resample("M").last().dropna()
-        s_m.index = s_m.index.to_period("M")
-        return s_m
+        # Base local de preços: baixa o histórico completo uma vez e depois só os pregões novos
+        return obter_close_mensal(sym)
     except Exception:
         return pd.Series(dtype=float)
 
@@ -917,15 +954,6 @@ def _ler_json_safe(path: str) -> dict:
     return {}
 
 
-def _salvar_json_safe(path: str, obj: dict) -> None:
-    try:
-        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(obj or {}, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
-
-
 def _mtime_or_none(path: str):
     try:
         return os.path.getmtime(path) if path and os.path.exists(path) else None
@@ -944,10 +972,11 @@ def _load_or_build_parquet_cached(
         return carregar_df_parquet(parquet_path)
     df = build_fn()
     try:
-        os.makedirs(os.path.dirname(parquet_path) or ".", exist_ok=True)
-        if isinstance(df, pd.DataFrame):
-            df.to_parquet(parquet_path, index=False)
-        _salvar_json_safe(meta_path, meta_new)
+        # Outras sessões leem e regravam o mesmo cache: troca atômica sob a trava
+        with trava_dataset(parquet_path):
+            if isinstance(df, pd.DataFrame):
+                gravar_parquet_atomico(df, parquet_path)
+            gravar_texto_atomico(json.dumps(meta_new or {}, ensure_ascii=False, indent=2), meta_path)
     except Exception:
         pass
     return df if isinstance(df, pd.DataFrame) else pd.DataFrame()
@@ -1278,13 +1307,11 @@ df_dividendos_opcoes = opcoes_para_dividendos_sinteticos()
 
 # Converter dividendos Avenue para BRL
 if not df_dividendos_avenue.empty:
-    for col_valor in ["Valor Bruto", "Impostos", "Valor Líquido"]:
-        if col_valor in df_dividendos_avenue.columns and "Data" in df_dividendos_avenue.columns:
-            df_dividendos_avenue[col_valor] = df_dividendos_avenue.apply(
-                lambda row: converter_usd_para_brl(row[col_valor], f"{row['Data'].month:02d}/{row['Data'].year}") 
-                if pd.notna(row["Data"]) and pd.notna(row[col_valor]) else row[col_valor],
-                axis=1
-            )
+    if "Data" in df_dividendos_avenue.columns:
+        meses_div_avenue = pd.to_datetime(df_dividendos_avenue["Data"], errors="coerce").dt.strftime("%m/%Y")
+        for col_valor in ["Valor Bruto", "Impostos", "Valor Líquido"]:
+            if col_valor in df_dividendos_avenue.columns:
+                df_dividendos_avenue[col_valor] = converter_usd_para_brl_serie(df_dividendos_avenue[col_valor], meses_div_avenue)
 
 # Consolidar dividendos com coluna "Fonte Provento"
 def preparar_dividendos_consolidado(df, fonte_nome):
@@ -1338,12 +1365,10 @@ def ticker_para_yf(ticker):
 def _obter_preco_atual_acao_yf_cached(ticker_base: str) -> float | None:
     """Obtém o último Close disponível via yfinance para o ativo base."""
     try:
-        import yfinance as yf
-
         tk = ticker_para_yf((ticker_base or "").strip().upper())
         if not tk:
             return None
-        hist = yf.Ticker(tk).history(period="5d")
+        hist = obter_provedor().historico(tk, period="5d")
         if hist is None or hist.empty or "Close" not in hist.columns:
             return None
         close = pd.to_numeric(hist["Close"], errors="coerce").dropna()
@@ -1354,6 +1379,20 @@ def _obter_preco_atual_acao_yf_cached(ticker_base: str) -> float | None:
         return None
 
 
+# Quanto a aba espera pelo primeiro snapshot de uma base antes de exibir a prévia sem cotações
+ESPERA_PRIMEIRO_SNAPSHOT = 3.0
+
+
+@st.fragment(run_every=3)
+def _aguardar_snapshot_posicao(chave: str, versao: datetime):
+    """Enquanto o atualizador de fundo busca cotações, re-renderiza a página quando o snapshot mudar."""
+    atualizador = obter_atualizador()
+    snap = atualizador.obter(chave)
+    if (snap is not None and snap.atualizado_em != versao) or not atualizador.atualizando(chave):
+        st.rerun()
+    st.caption("🔄 Atualizando cotações em segundo plano...")
+
+
 def exibir_tabela_info_tickers(df, titulo="📄 Ticker / Setor / Fundamentais (yfinance)"):
     """Exibe tabela com tickers padronizados e informações de setor/fundamentos via yfinance."""
     if df.empty:
@@ -2081,6 +2120,17 @@ with tab_opcoes:
                         todos_vencimentos=buscar_todos_vencimentos,
                         vencimentos=vencimentos_sel_opnet,
                     )
+                # Histórico append-only (coleta completa, antes dos filtros da tela)
+                try:
+                    salvar_snapshot_opcoesnet(df_new, ativo=ativo_base)
+                except Exception as e:
+                    print(f"Erro ao gravar histórico opcoes.net: {e}")
+                falhas_venc = df_new.attrs.get("vencimentos_com_falha") or {}
+                if falhas_venc:
+                    st.warning(
+                        f"⚠️ {len(falhas_venc)} vencimento(s) não puderam ser baixados e ficaram de fora: "
+                        + ", ".join(falhas_venc)
+                    )
 
                 # Aplicar filtros escolhidos (uma única vez, conforme solicitado)
                 df_show = df_new.copy()
@@ -2135,6 +2185,10 @@ with tab_opcoes:
                 strike_num = pd.to_numeric(df_show_net["STRIKE"], errors="coerce")
                 df_show_net["Preço Atual"] = float(preco_atual_acao)
                 df_show_net["Diferença Strike (%)"] = ((strike_num - float(preco_atual_acao)) / float(preco_atual_acao)) * 100.0
+                if {"PREMIO", "VENCIMENTO", "TIPO"}.issubset(df_show_net.columns):
+                    df_show_net = adicionar_gregas(
+                        df_show_net, float(preco_atual_acao), "STRIKE", "VENCIMENTO", "PREMIO", "TIPO"
+                    )
             elif ativo_ref:
                 st.caption("Não foi possível obter preço atual via yfinance; filtro de distância do strike ficará indisponível.")
 
@@ -2159,6 +2213,7 @@ with tab_opcoes:
                     "VENCIMENTO",
                     "Mês Vencimento",
                     "PREMIO",
+                    *COLUNAS_GREGAS,
                     "Fonte",
                     "Coletado Em",
                 ]
@@ -2175,6 +2230,12 @@ with tab_opcoes:
                 fmt["PREMIO"] = "R$ {:.2f}"
             if "Diferença Strike (%)" in df_show_net.columns:
                 fmt["Diferença Strike (%)"] = "{:.2f}%"
+            for c in ["Vol. Implícita (%)", "Prob. Exercício (%)"]:
+                if c in df_show_net.columns:
+                    fmt[c] = "{:.1f}%"
+            for c in ["Delta", "Gama", "Theta (dia)", "Vega"]:
+                if c in df_show_net.columns:
+                    fmt[c] = "{:.4f}"
 
             styler = df_show_net.style.format(fmt)
             if "Diferença Strike (%)" in df_show_net.columns:
@@ -2333,8 +2394,10 @@ with tab_opcoes:
             if df_vendas_filtrado.empty:
                 st.info("Nenhuma venda com os filtros selecionados")
             else:
-                # Preparar tabela para exibição
-                df_display = df_vendas_filtrado.copy()
+                # Preparar tabela para exibição (com gregas atuais das vendas ativas)
+                tickers_ativos = df_vendas_filtrado.loc[df_vendas_filtrado["Status"] == "Ativa", "Ticker Base"].dropna().unique()
+                precos_ativos = {t: _obter_preco_atual_acao_yf_cached(str(t)) for t in tickers_ativos}
+                df_display = calcular_gregas_vendas(df_vendas_filtrado, precos_ativos)
                 
                 # Formatar datas
                 if "Data Operação" in df_display.columns:
@@ -2566,64 +2629,6 @@ with tab_consolidacao:
                 txt = txt.split(" - ", 1)[0].strip()
             return txt.upper()
 
-        def _parse_num_misto(valor):
-            """Parse numérico tolerante (pt-BR e US), sem destruir strings com milhar."""
-            if pd.isna(valor):
-                return np.nan
-            if isinstance(valor, (int, float, np.integer, np.floating)):
-                try:
-                    return float(valor)
-                except Exception:
-                    return np.nan
-            txt = str(valor).strip()
-            if not txt:
-                return np.nan
-            # remove símbolos comuns
-            txt = txt.replace("R$", "").replace("US$", "").replace("$", "")
-            txt = txt.replace("%", "").replace("\u00a0", " ")
-            txt = txt.replace(" ", "")
-            # parênteses para negativo
-            negativo = False
-            if txt.startswith("(") and txt.endswith(")"):
-                negativo = True
-                txt = txt[1:-1]
-            # sinais
-            if txt.startswith("+"):
-                txt = txt[1:]
-            elif txt.startswith("-"):
-                negativo = True
-                txt = txt[1:]
-
-            if not txt:
-                return np.nan
-
-            # Se tem "." e ",": assume pt-BR (milhar "." e decimal ",")
-            if "." in txt and "," in txt:
-                txt_norm = txt.replace(".", "").replace(",", ".")
-            # Só vírgula: assume decimal
-            elif "," in txt:
-                txt_norm = txt.replace(".", "").replace(",", ".")
-            # Só ponto: pode ser decimal ou milhar
-            elif "." in txt:
-                partes = txt.split(".")
-                # Ex.: 14.000 (milhar) / 1.234.567
-                if len(partes) > 2:
-                    txt_norm = "".join(partes)
-                else:
-                    # uma ocorrência: se exatamente 3 dígitos após ponto, tratar como milhar
-                    if len(partes) == 2 and len(partes[1]) == 3 and partes[0].isdigit() and partes[1].isdigit():
-                        txt_norm = "".join(partes)
-                    else:
-                        txt_norm = txt
-            else:
-                txt_norm = txt
-
-            try:
-                num = float(txt_norm)
-                return -num if negativo else num
-            except Exception:
-                return np.nan
-
         def _parse_mes_ano_to_periodo(mes_ano) -> pd.Period | None:
             if pd.isna(mes_ano):
                 return None
@@ -2698,9 +2703,9 @@ with tab_consolidacao:
                     return None
 
             return {
-                "acoes": _mtime(ACOES_PATH),
-                "renda_fixa": _mtime(RENDA_FIXA_PATH),
-                "proventos": _mtime(PROVENTOS_PATH),
+                "acoes": assinatura_base(ACOES_PATH),
+                "renda_fixa": assinatura_base(RENDA_FIXA_PATH),
+                "proventos": assinatura_base(PROVENTOS_PATH),
                 "vendas_opcoes": _mtime(str(ARQ_VENDAS_OPCOES)),
                 "caixa": _mtime(CAIXA_PATH),
                 "acoes_manuais": _mtime(ACOES_MANUAIS_PATH),
@@ -2708,6 +2713,8 @@ with tab_consolidacao:
                 "acoes_manuais_hist_mensal": _mtime("data/investimentos_manuais_acoes_hist_mensal.parquet"),
                 "caixa_hist_full": _mtime("data/investimentos_manuais_caixa_hist_full.parquet"),
                 "rentab_version": 11,
+                # A base é montada só com as partições carregadas
+                "filtro_carga": [filtro_usuarios, filtro_meses],
             }
 
         def _preparar_caixa_base_rentabilidade(df_caixa: pd.DataFrame) -> pd.DataFrame:
@@ -2801,21 +2808,20 @@ with tab_consolidacao:
                 if "Quantidade Disponível" in dfp.columns:
                     qtd = qtd.where(qtd.notna(), dfp["Quantidade Disponível"])
             dfp["Quantidade"] = qtd
-            dfp["Quantidade"] = dfp["Quantidade"].apply(_parse_num_misto)
-            dfp["Quantidade"] = pd.to_numeric(dfp["Quantidade"], errors="coerce").fillna(0.0)
+            dfp["Quantidade"] = parse_num_misto_serie(dfp["Quantidade"]).fillna(0.0)
 
             # Preço: usar exclusivamente a coluna 'Preço' (não derivar de Valor/Quantidade)
             if "Preço" in dfp.columns:
-                dfp["Preco"] = dfp["Preço"].apply(_parse_num_misto)
+                dfp["Preco"] = parse_num_misto_serie(dfp["Preço"])
             else:
                 dfp["Preco"] = np.nan
             dfp["Preco"] = dfp["Preco"].where(dfp["Preco"].notna() & (dfp["Preco"] > 0))
 
             # Valor (para fallback controlado em tipos sem preço no relatório)
             if "Valor" in dfp.columns:
-                dfp["ValorSrc"] = dfp["Valor"].apply(_parse_num_misto)
+                dfp["ValorSrc"] = parse_num_misto_serie(dfp["Valor"])
             elif "Valor de Mercado" in dfp.columns:
-                dfp["ValorSrc"] = dfp["Valor de Mercado"].apply(_parse_num_misto)
+                dfp["ValorSrc"] = parse_num_misto_serie(dfp["Valor de Mercado"])
             else:
                 dfp["ValorSrc"] = np.nan
             dfp["ValorSrc"] = pd.to_numeric(dfp["ValorSrc"], errors="coerce")
@@ -2887,7 +2893,7 @@ with tab_consolidacao:
                 dfd["Chave"] = ""
 
             if "Valor Líquido" in dfd.columns:
-                dfd["Dividendos"] = dfd["Valor Líquido"].apply(_parse_num_misto)
+                dfd["Dividendos"] = parse_num_misto_serie(dfd["Valor Líquido"])
             else:
                 dfd["Dividendos"] = 0.0
             dfd["Dividendos"] = pd.to_numeric(dfd["Dividendos"], errors="coerce").fillna(0.0)
@@ -3425,67 +3431,48 @@ with tab_posicao:
         with col_a:
             if st.button("Atualizar cotações", key="posicao_atual_btn_atualizar"):
                 st.session_state["posicao_atual_forcar_update"] = True
-                st.session_state["posicao_atual_df"] = None
-                st.session_state["posicao_atual_sem_cotacao"] = None
-                st.session_state["posicao_atual_ultima_atualizacao"] = None
                 # Limpa caches para garantir atualização completa
                 st.cache_data.clear()
                 st.rerun()
 
-        # Se a base mudou (ex: novo upload), força atualização
-        try:
-            # Assinatura leve, mas sensível a moeda/tipo (evita manter valores antigos quando muda BRL/USD/EUR)
-            sig_parts = []
-            if "Ticker" in df_posicao_base.columns:
-                sig_parts.append(df_posicao_base["Ticker"].astype(str))
-            if "Moeda" in df_posicao_base.columns:
-                sig_parts.append(df_posicao_base["Moeda"].astype(str))
-            if "Tipo" in df_posicao_base.columns:
-                sig_parts.append(df_posicao_base["Tipo"].astype(str))
-            if sig_parts:
-                sig = sig_parts[0]
-                for s in sig_parts[1:]:
-                    sig = sig + "|" + s
-                base_sig = f"{len(df_posicao_base)}|{','.join(sig.head(50).tolist())}"
-            else:
-                base_sig = f"{len(df_posicao_base)}"
-        except Exception:
-            base_sig = None
-
-        # FIX definitivo: se o servidor ficar ligado, o session_state pode manter as cotações do dia anterior.
-        # Força atualização automaticamente quando virar o dia, ou quando a última atualização ficar “velha”.
-        now_dt = datetime.now()
-        last_dt = st.session_state.get("posicao_atual_ultima_atualizacao")
-        stale_by_day = isinstance(last_dt, datetime) and (last_dt.date() != now_dt.date())
-        stale_by_age = (not isinstance(last_dt, datetime)) or ((now_dt - last_dt).total_seconds() > 60 * 30)  # 30 min
-
-        precisa_atualizar = (
-            st.session_state.get("posicao_atual_df") is None
-            or st.session_state.get("posicao_atual_forcar_update") is True
-            or (base_sig is not None and st.session_state.get("posicao_atual_base_sig") != base_sig)
-            or stale_by_day
-            or stale_by_age
-        )
+        # Stale-while-revalidate: o atualizador de fundo mantém o snapshot da base aquecido
+        # (revalida ao virar o dia ou após 30 min). A aba exibe o último snapshot na hora e
+        # é re-renderizada quando os preços novos chegam, sem bloquear na rede.
+        # A chave é o hash do conteúdo da base: novo upload ou outros filtros geram outra chave.
+        chave_posicao = chave_base(df_posicao_base)
+        atualizador = obter_atualizador()
+        atualizador.registrar(chave_posicao, df_posicao_base)
+        if st.session_state.get("posicao_atual_forcar_update") is True:
+            atualizador.solicitar(chave_posicao, forcar=True)
+            st.session_state["posicao_atual_forcar_update"] = False
 
-        if precisa_atualizar:
+        snap = atualizador.obter(chave_posicao)
+        if snap is None:
+            # Primeira carga desta base: espera pouco pelo atualizador de fundo.
             with st.spinner("Buscando cotações em tempo real (yfinance)..."):
-                df_atual, sem_cotacao, dt_atual = atualizar_cotacoes(df_posicao_base)
-            st.session_state["posicao_atual_df"] = df_atual
-            st.session_state["posicao_atual_sem_cotacao"] = sem_cotacao
-            st.session_state["posicao_atual_ultima_atualizacao"] = dt_atual
-            st.session_state["posicao_atual_base_sig"] = base_sig
-            st.session_state["posicao_atual_forcar_update"] = False
+                snap = atualizador.aguardar(chave_posicao, timeout=ESPERA_PRIMEIRO_SNAPSHOT)
+        previa = snap is None
+        if previa:
+            # Cotações ainda não chegaram: exibe a base com os preços do histórico (sem rede);
+            # o fragmento abaixo re-renderiza a aba quando o snapshot ficar pronto.
+            df_previa, _, dt_previa = atualizar_cotacoes(df_posicao_base, buscar_cotacoes=False)
+            snap = SnapshotPosicao(df=df_previa, sem_cotacao=[], atualizado_em=dt_previa)
 
         # Exibir timestamp de atualização
-        last_dt = st.session_state.get("posicao_atual_ultima_atualizacao")
+        last_dt = snap.atualizado_em
         with col_b:
-            if isinstance(last_dt, datetime):
-                st.caption(f"✅ Última atualização: {last_dt.strftime('%d/%m/%Y %H:%M:%S')}")
+            if previa:
+                st.caption("⏳ Prévia com preços do histórico — cotações em tempo real a caminho.")
+                erro_atualizacao = atualizador.erro(chave_posicao)
+                if erro_atualizacao:
+                    st.warning(f"Não foi possível buscar as cotações: {erro_atualizacao}")
             else:
-                st.caption("⏱️ Aguardando primeira atualização...")
+                st.caption(f"✅ Última atualização: {last_dt.strftime('%d/%m/%Y %H:%M:%S')}")
+            if atualizador.atualizando(chave_posicao):
+                _aguardar_snapshot_posicao(chave_posicao, last_dt)
 
-        df_atual = st.session_state.get("posicao_atual_df")
-        sem_cotacao = st.session_state.get("posicao_atual_sem_cotacao") or []
+        df_atual = snap.df
+        sem_cotacao = snap.sem_cotacao or []
 
         if sem_cotacao:
             st.warning(
@@ -4530,6 +4517,12 @@ with tab_outros:
             
             st.markdown("---")
             st.subheader("Ações Inseridas (lotes)")
+            # Versão dos lotes que estão no editor: guardada quando o editor é carregado
+            # (sem edições pendentes) e usada no salvar, que falha se outra sessão gravou depois
+            _edicao_lotes = st.session_state.get("acoes_lotes_editor") or {}
+            _lotes_sem_edicao = not any(_edicao_lotes.get(k) for k in ("edited_rows", "added_rows", "deleted_rows"))
+            if _lotes_sem_edicao or "acoes_lotes_versao" not in st.session_state:
+                st.session_state["acoes_lotes_versao"] = versao_arquivo(ACOES_MANUAIS_PATH)
             df_acoes_view = carregar_acoes_man()
             if not df_acoes_view.empty:
                 df_lotes = df_acoes_view.copy()
@@ -4558,6 +4551,12 @@ with tab_outros:
 
                 col_sv1, col_sv2 = st.columns(2)
                 with col_sv1:
+                    if st.session_state.get("acoes_lotes_conflito") and st.button("🔄 Recarregar lotes", key="btn_reload_lotes"):
+                        # Descarta as edições feitas sobre a versão antiga
+                        st.session_state.pop("acoes_lotes_editor", None)
+                        st.session_state.pop("acoes_lotes_versao", None)
+                        st.session_state["acoes_lotes_conflito"] = False
+                        st.rerun()
                     if st.button("💾 Salvar alterações (venda/compra)", key="btn_save_lotes"):
                         try:
                             df_new = df_acoes_view.copy()
@@ -4614,9 +4613,14 @@ with tab_outros:
 
                             # salva via módulo
                             from modules.investimentos_manuais import salvar_acoes as _salvar_acoes
-                            _salvar_acoes(df_new)
+                            _salvar_acoes(df_new, versao_esperada=st.session_state["acoes_lotes_versao"])
+                            st.session_state["acoes_lotes_versao"] = versao_arquivo(ACOES_MANUAIS_PATH)
+                            st.session_state.pop("acoes_lotes_editor", None)
                             st.success("✅ Alterações salvas.")
                             st.rerun()
+                        except ConflitoVersaoError:
+                            st.session_state["acoes_lotes_conflito"] = True
+                            st.warning("⚠️ Os lotes foram alterados em outra sessão. Recarregue os lotes e refaça as alterações.")
                         except Exception as e:
                             st.error(f"❌ Erro ao salvar alterações: {e}")
                 with col_sv2:
@@ -4841,3 +4845,22 @@ div[data-testid='stMetric'] label, div[data-testid='stMetric'] span {font-size:
 </style>
 """, unsafe_allow_html=True)
 
+# Diagnóstico das sessões HTTP compartilhadas (opcoes.net, SEC, Alpha Vantage, FMP):
+# montado no fim para já contar as requisições feitas nesta renderização
+with st.sidebar:
+    with st.expander("🌐 Conexões HTTP (diagnóstico)", expanded=False):
+        df_http = estatisticas_http()
+        if df_http.empty:
+            st.caption("Nenhuma requisição HTTP neste processo ainda.")
+        else:
+            st.caption(
+                f"{int(df_http['Requisições'].sum())} requisições, {int(df_http['Erros'].sum())} erros e "
+                f"{int(df_http['Retentativas'].sum())} retentativas desde o início do processo."
+            )
+            st.dataframe(
+                df_http.style.format(
+                    {"Latência Média (ms)": "{:,.0f}", "Latência Máx (ms)": "{:,.0f}"}, na_rep="-"
+                ),
+                hide_index=True,
+                use_container_width=True,
+            )
@@ -0,0 +1,184 @@
+"""Gravação segura dos arquivos de dados compartilhados entre sessões.
+
+Várias sessões do Streamlit (threads do mesmo processo), o monitor de
+ingestão e scripts podem gravar o mesmo arquivo em `data/` ao mesmo tempo:
+
+- `gravar_parquet_atomico` / `gravar_texto_atomico` escrevem num temporário na
+  mesma pasta, fazem fsync e trocam com `os.replace`. Quem lê vê o arquivo
+  antigo ou o novo, nunca um pela metade, e não espera por trava nenhuma.
+- `trava_dataset(path)` é a trava exclusiva do dataset (arquivo
+  `<path>.lock`, vale entre processos; reentrante na mesma thread). Todo
+  read-modify-write (carregar, alterar, salvar) deve rodar dentro dela, senão
+  duas gravações simultâneas perdem as alterações uma da outra. Também serve
+  de decorador.
+- `versao_arquivo(path)` identifica a versão gravada. Passar
+  `versao_esperada=` na gravação faz a checagem otimista: se outro escritor
+  gravou depois da leitura, levanta `ConflitoVersaoError` em vez de
+  sobrescrever (edições feitas na tela, em que a leitura e a gravação ficam em
+  execuções diferentes do script).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Dict, Iterator, Optional
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+# Espera máxima pela trava de um dataset (gravações de lote grandes seguram a
+# trava de `base_particionada` por alguns segundos)
+TIMEOUT_TRAVA = 120.0
+_INTERVALO_TENTATIVA = 0.05
+
+_travas_locais: Dict[str, threading.RLock] = {}
+_profundidade: Dict[str, int] = {}
+_arquivos_trava: Dict[str, BinaryIO] = {}
+_lock_registro = threading.Lock()
+
+
+class ConflitoVersaoError(RuntimeError):
+    """O arquivo foi gravado por outro escritor depois da leitura."""
+
+
+def _trava_local(chave: str) -> threading.RLock:
+    with _lock_registro:
+        trava = _travas_locais.get(chave)
+        if trava is None:
+            trava = _travas_locais[chave] = threading.RLock()
+        return trava
+
+
+def _travar_arquivo(caminho: str, limite: float) -> BinaryIO:
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    f = open(caminho, "a+b")
+    while True:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:  # pragma: no cover - Windows
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return f
+        except OSError:
+            if time.monotonic() >= limite:
+                f.close()
+                raise TimeoutError(f"Tempo esgotado esperando a trava {caminho}")
+            time.sleep(_INTERVALO_TENTATIVA)
+
+
+def _destravar_arquivo(f: BinaryIO) -> None:
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:  # pragma: no cover - Windows
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        f.close()
+
+
+@contextmanager
+def trava_dataset(path, timeout: float = TIMEOUT_TRAVA) -> Iterator[None]:
+    """Trava exclusiva do dataset em `path` (arquivo ou pasta) enquanto durar o bloco."""
+    chave = os.path.abspath(os.fspath(path))
+    limite = time.monotonic() + timeout
+    trava = _trava_local(chave)
+    if not trava.acquire(timeout=timeout):
+        raise TimeoutError(f"Tempo esgotado esperando a trava de {path}")
+    try:
+        # Só a thread dona da trava local mexe nas entradas desta chave
+        if _profundidade.get(chave, 0) == 0:
+            _arquivos_trava[chave] = _travar_arquivo(f"{chave}.lock", limite)
+        _profundidade[chave] = _profundidade.get(chave, 0) + 1
+        try:
+            yield
+        finally:
+            _profundidade[chave] -= 1
+            if _profundidade[chave] == 0:
+                del _profundidade[chave]
+                _destravar_arquivo(_arquivos_trava.pop(chave))
+    finally:
+        trava.release()
+
+
+def versao_arquivo(path) -> str:
+    """Versão gravada em `path` (muda a cada gravação); "" se o arquivo não existe."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return ""
+    return f"{st.st_mtime_ns}-{st.st_size}-{st.st_ino}"
+
+
+def _fsync_pasta(pasta: str) -> None:
+    """Garante a troca de nome no disco (no Windows não dá para abrir pastas)."""
+    if os.name != "posix":
+        return
+    try:
+        fd = os.open(pasta, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def gravar_atomico(path, escrever: Callable[[BinaryIO], None], versao_esperada: Optional[str] = None) -> str:
+    """Grava `path` com `escrever(arquivo_binario)` via temporário + fsync + `os.replace`.
+
+    A troca em si não precisa de trava (a última gravação vence, sempre inteira);
+    com `versao_esperada`, a checagem e a troca rodam sob `trava_dataset(path)`.
+
+    Returns:
+        A versão gravada (`versao_arquivo`).
+    """
+    path = os.fspath(path)
+    pasta = os.path.dirname(path) or "."
+    os.makedirs(pasta, exist_ok=True)
+    # Temporário com nome único: gravações simultâneas não se misturam
+    tmp = os.path.join(pasta, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            escrever(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if versao_esperada is None:
+            os.replace(tmp, path)
+        else:
+            with trava_dataset(path):
+                if versao_arquivo(path) != versao_esperada:
+                    raise ConflitoVersaoError(f"{path} foi alterado por outra sessão; recarregue antes de salvar")
+                os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    _fsync_pasta(pasta)
+    return versao_arquivo(path)
+
+
+def gravar_parquet_atomico(df: pd.DataFrame, path, versao_esperada: Optional[str] = None, index: Optional[bool] = False) -> str:
+    """`df.to_parquet(path)` atômico (ver `gravar_atomico`)."""
+    return gravar_atomico(path, lambda f: df.to_parquet(f, index=index), versao_esperada)
+
+
+def gravar_texto_atomico(texto: str, path, versao_esperada: Optional[str] = None) -> str:
+    """Grava `texto` (UTF-8) em `path` de forma atômica (ver `gravar_atomico`)."""
+    return gravar_atomico(path, lambda f: f.write(texto.encode("utf-8")), versao_esperada)
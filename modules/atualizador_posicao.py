@@ -0,0 +1,199 @@
+"""Atualização em segundo plano (stale-while-revalidate) da Posição Atual.
+
+A aba 💹 Posição Atual não espera mais pela rede: ela exibe o último snapshot
+válido (com o horário da cotação) e pede uma atualização ao atualizador, que
+roda em uma thread daemon do processo. Quando a busca termina, o snapshot novo
+substitui o anterior e a página é re-renderizada.
+
+Cada base de posição é identificada por uma chave (`chave_base`: hash do
+conteúdo inteiro da base filtrada), então sessões com as mesmas posições
+compartilham o snapshot e qualquer mudança de quantidade ou valor gera outro. O atualizador mantém as últimas `MAX_BASES` bases registradas e as
+revalida sozinho quando o snapshot passa de `TTL_SNAPSHOT` ou vira o dia, de
+modo que quem abre a aba normalmente já encontra preços recentes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from modules.posicao_atual import atualizar_cotacoes
+
+# Idade máxima de um snapshot antes de ser revalidado
+TTL_SNAPSHOT = timedelta(minutes=30)
+
+# Intervalo (segundos) entre as verificações periódicas da thread
+INTERVALO_VERIFICACAO = 60.0
+
+# Quantas bases (combinações de filtros) ficam aquecidas ao mesmo tempo
+MAX_BASES = 4
+
+
+@dataclass
+class SnapshotPosicao:
+    """Resultado de uma execução de `atualizar_cotacoes`."""
+
+    df: pd.DataFrame
+    sem_cotacao: List[str] = field(default_factory=list)
+    atualizado_em: datetime = field(default_factory=datetime.now)
+
+
+def chave_base(df_base: pd.DataFrame) -> str:
+    """Hash do conteúdo (todas as linhas e colunas) da base de posição."""
+    h = hashlib.sha256()
+    h.update("|".join(map(str, df_base.columns)).encode("utf-8"))
+    try:
+        h.update(pd.util.hash_pandas_object(df_base, index=False).to_numpy().tobytes())
+    except TypeError:
+        # Células não hasheáveis (listas, dicts): cai para o texto da base
+        h.update(df_base.to_json(orient="split", index=False, date_format="iso").encode("utf-8"))
+    return h.hexdigest()
+
+
+def snapshot_vencido(snap: Optional[SnapshotPosicao], agora: Optional[datetime] = None) -> bool:
+    """True se o snapshot não existe, é de outro dia ou passou do TTL."""
+    if snap is None:
+        return True
+    agora = agora or datetime.now()
+    return snap.atualizado_em.date() != agora.date() or (agora - snap.atualizado_em) > TTL_SNAPSHOT
+
+
+class AtualizadorPosicao:
+    """Mantém snapshots da posição atual e os revalida em uma thread de fundo."""
+
+    def __init__(self, intervalo: float = INTERVALO_VERIFICACAO, max_bases: int = MAX_BASES):
+        self.intervalo = float(intervalo)
+        self.max_bases = max(1, int(max_bases))
+        self._cond = threading.Condition()
+        self._bases: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._snapshots: Dict[str, SnapshotPosicao] = {}
+        self._forcadas: set = set()
+        self._em_andamento: Optional[str] = None
+        self._erros: Dict[str, str] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------ API
+    def registrar(self, chave: str, df_base: pd.DataFrame) -> None:
+        """Registra (ou renova) a base `chave`; bases antigas saem pelo LRU.
+
+        Se a base guardada em `chave` for diferente da nova, o snapshot dela é
+        descartado (não serve mais valores calculados sobre a base anterior).
+        """
+        with self._cond:
+            anterior = self._bases.get(chave)
+            if anterior is not None and not anterior.equals(df_base):
+                self._snapshots.pop(chave, None)
+                self._erros.pop(chave, None)
+            self._bases[chave] = df_base.copy()
+            self._bases.move_to_end(chave)
+            while len(self._bases) > self.max_bases:
+                antiga, _ = self._bases.popitem(last=False)
+                self._snapshots.pop(antiga, None)
+                self._forcadas.discard(antiga)
+                self._erros.pop(antiga, None)
+            self._garantir_thread()
+            if snapshot_vencido(self._snapshots.get(chave)):
+                self._cond.notify_all()
+
+    def solicitar(self, chave: str, forcar: bool = False) -> None:
+        """Pede a revalidação de `chave` (imediata se `forcar`)."""
+        with self._cond:
+            if forcar:
+                self._forcadas.add(chave)
+            self._garantir_thread()
+            self._cond.notify_all()
+
+    def obter(self, chave: str) -> Optional[SnapshotPosicao]:
+        with self._cond:
+            return self._snapshots.get(chave)
+
+    def atualizando(self, chave: str) -> bool:
+        """True se `chave` está sendo buscada ou aguarda na fila."""
+        with self._cond:
+            if chave not in self._bases:
+                return False
+            return (
+                self._em_andamento == chave
+                or chave in self._forcadas
+                or snapshot_vencido(self._snapshots.get(chave))
+            ) and chave not in self._erros
+
+    def erro(self, chave: str) -> Optional[str]:
+        with self._cond:
+            return self._erros.get(chave)
+
+    def aguardar(self, chave: str, timeout: Optional[float] = None) -> Optional[SnapshotPosicao]:
+        """Bloqueia até existir um snapshot de `chave` (ou falhar / estourar o timeout)."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: chave in self._snapshots or chave in self._erros or chave not in self._bases,
+                timeout=timeout,
+            )
+            return self._snapshots.get(chave)
+
+    # ------------------------------------------------------------ internos
+    def _garantir_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._executar, name="atualizador-posicao", daemon=True)
+            self._thread.start()
+
+    def _proxima_chave(self) -> Optional[str]:
+        for chave in self._bases:
+            if chave in self._forcadas:
+                return chave
+        agora = datetime.now()
+        for chave in reversed(self._bases):  # mais recente primeiro
+            if chave not in self._erros and snapshot_vencido(self._snapshots.get(chave), agora):
+                return chave
+        return None
+
+    def _executar(self) -> None:
+        while True:
+            with self._cond:
+                chave = self._proxima_chave()
+                while chave is None:
+                    self._cond.wait(timeout=self.intervalo)
+                    # Erros são tentados de novo a cada ciclo periódico
+                    self._erros.clear()
+                    chave = self._proxima_chave()
+                self._forcadas.discard(chave)
+                self._em_andamento = chave
+                df_base = self._bases[chave]
+
+            snap, erro = None, None
+            try:
+                df, sem_cotacao, dt = atualizar_cotacoes(df_base)
+                snap = SnapshotPosicao(df=df, sem_cotacao=list(sem_cotacao or []), atualizado_em=dt)
+            except Exception as e:
+                erro = f"{type(e).__name__}: {e}"
+                print(f"Erro ao atualizar posição atual em segundo plano: {e}")
+
+            with self._cond:
+                self._em_andamento = None
+                if chave in self._bases:
+                    if snap is not None:
+                        self._snapshots[chave] = snap
+                        self._erros.pop(chave, None)
+                    else:
+                        self._erros[chave] = erro
+                self._cond.notify_all()
+
+
+_atualizador: Optional[AtualizadorPosicao] = None
+_lock_atualizador = threading.Lock()
+
+
+def obter_atualizador() -> AtualizadorPosicao:
+    """Atualizador compartilhado pelo processo (todas as sessões Streamlit)."""
+    global _atualizador
+    if _atualizador is None:
+        with _lock_atualizador:
+            if _atualizador is None:
+                _atualizador = AtualizadorPosicao()
+    return _atualizador
@@ -23,7 +23,7 @@ from modules.upload_pdf_avenue import (
 from modules.upload_relatorio import ACOES_PATH, PROVENTOS_PATH
 from modules.cotacoes import (
     obter_cotacao_mes, 
-    converter_usd_para_brl, 
+    converter_usd_para_brl_serie,
     converter_brl_para_usd, 
     formatar_valor_moeda,
     obter_historico_cotacao_usd_brl,
@@ -33,6 +33,7 @@ from modules.cotacoes import (
 )
 
 from modules.ticker_info import CACHE_PATH as TICKER_INFO_PATH
+from modules.base_particionada import assinatura_base, carregar_base
 
 
 @st.cache_data(show_spinner=False)
@@ -41,8 +42,8 @@ def _read_ticker_info_cached(path: str, mtime: float) -> pd.DataFrame:
 
 
 @st.cache_data(show_spinner=False)
-def _read_parquet_cached(path: str, mtime: float) -> pd.DataFrame:
-    return pd.read_parquet(path)
+def _read_parquet_cached(path: str, mtime: float, usuarios: tuple = None, meses: tuple = None) -> pd.DataFrame:
+    return carregar_base(path, usuarios=usuarios, meses=meses)
 
 
 def extrair_ticker_curto(valor):
@@ -57,15 +58,23 @@ def extrair_ticker_curto(valor):
     return texto.split()[0].strip()
 
 
-def carregar_acoes_avenue() -> pd.DataFrame:
+def carregar_acoes_avenue(usuarios=None, meses=None) -> pd.DataFrame:
     """
     Carrega dados de ações extraídas dos PDFs Avenue.
     Procura por parquets salvos ou retorna DataFrame vazio.
+    Com `usuarios`/`meses` (MM/AAAA), lê só as partições deles.
     """
     if os.path.exists(ACOES_PDF_PATH):
         try:
-            mtime = os.path.getmtime(ACOES_PDF_PATH)
-            return _read_parquet_cached(ACOES_PDF_PATH, mtime)
+            mtime = assinatura_base(ACOES_PDF_PATH)
+            if mtime is None:
+                return pd.DataFrame()
+            return _read_parquet_cached(
+                ACOES_PDF_PATH,
+                mtime,
+                tuple(usuarios) if usuarios is not None else None,
+                tuple(meses) if meses is not None else None,
+            )
         except Exception as e:
             st.warning(f"Erro ao carregar ações Avenue: {e}")
             return pd.DataFrame()
@@ -73,14 +82,22 @@ def carregar_acoes_avenue() -> pd.DataFrame:
     return pd.DataFrame()
 
 
-def carregar_dividendos_avenue() -> pd.DataFrame:
+def carregar_dividendos_avenue(usuarios=None, meses=None) -> pd.DataFrame:
     """
     Carrega dados de dividendos extraídos dos PDFs Avenue.
+    Com `usuarios`/`meses` (MM/AAAA), lê só as partições deles.
     """
     if os.path.exists(DIVIDENDOS_PDF_PATH):
         try:
-            mtime = os.path.getmtime(DIVIDENDOS_PDF_PATH)
-            return _read_parquet_cached(DIVIDENDOS_PDF_PATH, mtime)
+            mtime = assinatura_base(DIVIDENDOS_PDF_PATH)
+            if mtime is None:
+                return pd.DataFrame()
+            return _read_parquet_cached(
+                DIVIDENDOS_PDF_PATH,
+                mtime,
+                tuple(usuarios) if usuarios is not None else None,
+                tuple(meses) if meses is not None else None,
+            )
         except Exception as e:
             st.warning(f"Erro ao carregar dividendos Avenue: {e}")
             return pd.DataFrame()
@@ -240,7 +257,7 @@ def carregar_proventos_gerais() -> pd.DataFrame:
     import pandas as pd
     if os.path.exists(PROVENTOS_PATH):
         try:
-            df = pd.read_parquet(PROVENTOS_PATH)
+            df = carregar_base(PROVENTOS_PATH)
             df_padrao = padronizar_dividendos(df)
             # Garantir que Data é Timestamp
             if "Data" in df_padrao.columns:
@@ -770,22 +787,22 @@ def aba_acoes_avenue(exibir_metricas_valor_fn=None):
     if moeda == "BRL":
         if "Valor_USD_Original" in df_visualizacao.columns:
             if "Mês/Ano" in df_visualizacao.columns:
-                df_visualizacao["Valor de Mercado"] = df_visualizacao.apply(
-                    lambda row: converter_usd_para_brl(row["Valor_USD_Original"], row["Mês/Ano"]) 
-                    if pd.notna(row.get("Mês/Ano")) and pd.notna(row.get("Valor_USD_Original"))
-                    else row.get("Valor de Mercado"),
-                    axis=1
+                df_visualizacao["Valor de Mercado"] = converter_usd_para_brl_serie(
+                    df_visualizacao["Valor_USD_Original"], df_visualizacao["Mês/Ano"]
+                ).where(
+                    df_visualizacao["Mês/Ano"].notna() & df_visualizacao["Valor_USD_Original"].notna(),
+                    df_visualizacao["Valor de Mercado"],
                 )
             else:
                 df_visualizacao["Valor de Mercado"] = df_visualizacao["Valor_USD_Original"] * cotacao_atual
 
         if "Preco_USD_Original" in df_visualizacao.columns:
             if "Mês/Ano" in df_visualizacao.columns:
-                df_visualizacao["Preço"] = df_visualizacao.apply(
-                    lambda row: converter_usd_para_brl(row["Preco_USD_Original"], row["Mês/Ano"]) 
-                    if pd.notna(row.get("Mês/Ano")) and pd.notna(row.get("Preco_USD_Original"))
-                    else row.get("Preço"),
-                    axis=1
+                df_visualizacao["Preço"] = converter_usd_para_brl_serie(
+                    df_visualizacao["Preco_USD_Original"], df_visualizacao["Mês/Ano"]
+                ).where(
+                    df_visualizacao["Mês/Ano"].notna() & df_visualizacao["Preco_USD_Original"].notna(),
+                    df_visualizacao["Preço"],
                 )
             else:
                 df_visualizacao["Preço"] = df_visualizacao["Preco_USD_Original"] * cotacao_atual
@@ -1047,17 +1064,18 @@ def aba_proventos_avenue():
             df_visualizacao[col_original] = pd.to_numeric(df_visualizacao[col_valor], errors="coerce")
 
     if moeda == "BRL":
+        if "Data" in df_visualizacao.columns:
+            meses_linha = pd.to_datetime(df_visualizacao["Data"], errors="coerce").dt.strftime("%m/%Y")
         for col_valor in ["Valor Bruto", "Impostos", "Valor Líquido"]:
             col_original = f"{col_valor.replace(' ', '_')}_USD_Original"
             if col_original not in df_visualizacao.columns:
                 continue
             if "Data" in df_visualizacao.columns:
-                df_visualizacao[col_valor] = df_visualizacao.apply(
-                    lambda row: converter_usd_para_brl(
-                        row[col_original],
-                        f"{row['Data'].month:02d}/{row['Data'].year}"
-                    ) if pd.notna(row.get("Data")) and pd.notna(row.get(col_original)) else row.get(col_valor),
-                    axis=1
+                df_visualizacao[col_valor] = converter_usd_para_brl_serie(
+                    df_visualizacao[col_original], meses_linha
+                ).where(
+                    meses_linha.notna() & df_visualizacao[col_original].notna(),
+                    df_visualizacao[col_valor],
                 )
             else:
                 df_visualizacao[col_valor] = df_visualizacao[col_original] * cotacao_atual
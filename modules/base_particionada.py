@@ -0,0 +1,285 @@
+"""Bases de relatórios particionadas por usuário e mês (datasets Parquet hive).
+
+`acoes`, `renda_fixa`, `proventos`, `acoes_avenue` e `dividendos_avenue`
+deixaram de ser um arquivo único: cada caminho (`ACOES_PATH`, ...) agora é uma
+pasta no formato
+
+    <path>/usuario=<nome>/ano_mes=AAAA-MM/part-0.parquet
+
+com um arquivo por (Usuário, Mês/Ano). Reprocessar um mês de um usuário
+reescreve só a partição dele, e leituras filtradas abrem só as partições
+pedidas (a poda é feita pelos nomes das pastas, sem abrir arquivos).
+
+Os arquivos mantêm todas as colunas originais (inclusive `Usuário` e
+`Mês/Ano`); as partições são só a organização em disco. Um arquivo monolítico
+antigo no mesmo caminho continua legível e é convertido na primeira gravação
+(o original fica como `<path>.legado`).
+
+Cada partição é gravada em arquivo temporário (com fsync) e trocada com
+`os.replace` (`modules.armazenamento`). Ao fim de cada `gravar_base`, o
+marcador `<path>/_publicado` é regravado do mesmo jeito: é a assinatura da base
+(`assinatura_base`), então o dashboard só recarrega depois que todas as
+partições da gravação estão no lugar. `gravar_base` roda sob a trava do
+dataset, então dois processos gravando a mesma base não perdem linhas um do
+outro; a leitura não usa trava.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from modules.armazenamento import gravar_parquet_atomico, gravar_texto_atomico, trava_dataset
+
+COL_USUARIO = "Usuário"
+COL_MES_ANO = "Mês/Ano"
+
+# Valor de partição para linhas sem usuário ou com Mês/Ano fora do padrão MM/AAAA
+PARTICAO_DESCONHECIDA = "desconhecido"
+
+ARQUIVO_PARTICAO = "part-0.parquet"
+ARQUIVO_PUBLICACAO = "_publicado"
+
+_RE_MES_ANO = re.compile(r"^\s*(\d{1,2})\s*/\s*(\d{4})\s*$")
+
+
+def ano_mes_particao(mes_ano) -> str:
+    """'MM/AAAA' -> 'AAAA-MM' (ordenável); outros valores -> `PARTICAO_DESCONHECIDA`."""
+    m = _RE_MES_ANO.match(str(mes_ano)) if not pd.isna(mes_ano) else None
+    if not m:
+        return PARTICAO_DESCONHECIDA
+    return f"{m.group(2)}-{int(m.group(1)):02d}"
+
+
+def _mes_ano_da_particao(ano_mes: str) -> Optional[str]:
+    if ano_mes == PARTICAO_DESCONHECIDA:
+        return None
+    ano, mes = ano_mes.split("-", 1)
+    return f"{mes}/{ano}"
+
+
+def _usuario_particao(usuario) -> str:
+    if pd.isna(usuario) or not str(usuario).strip():
+        return PARTICAO_DESCONHECIDA
+    return str(usuario).strip()
+
+
+def _pasta_particao(path: str, usuario: str, ano_mes: str) -> Path:
+    return Path(path) / f"usuario={quote(usuario, safe='')}" / f"ano_mes={ano_mes}"
+
+
+def _eh_legado(path: str) -> bool:
+    return os.path.isfile(path)
+
+
+def particoes_base(path: str) -> List[Tuple[str, Optional[str]]]:
+    """(Usuário, Mês/Ano) de cada partição gravada, lidos só dos nomes das pastas."""
+    if _eh_legado(path):
+        try:
+            df = pd.read_parquet(path, columns=[COL_USUARIO, COL_MES_ANO])
+        except Exception:
+            return []
+        return list(df.drop_duplicates().itertuples(index=False, name=None))
+    saida = []
+    for pasta in sorted(Path(path).glob("usuario=*/ano_mes=*")):
+        if not (pasta / ARQUIVO_PARTICAO).exists():
+            continue
+        usuario = unquote(pasta.parent.name.split("=", 1)[1])
+        saida.append((usuario, _mes_ano_da_particao(pasta.name.split("=", 1)[1])))
+    return saida
+
+
+def meses_base(path: str, usuarios: Optional[Iterable[str]] = None) -> List[str]:
+    """Meses (MM/AAAA) com dados, em ordem cronológica."""
+    filtro = {str(u) for u in usuarios} if usuarios is not None else None
+    meses = {m for u, m in particoes_base(path) if m and (filtro is None or u in filtro)}
+    return sorted(meses, key=ano_mes_particao)
+
+
+def _arquivos_base(path: str, usuarios: Optional[Iterable[str]], meses: Optional[Iterable[str]]) -> List[Path]:
+    """Poda de partições pelos nomes das pastas, sem abrir arquivos."""
+    pastas_usuario = None
+    if usuarios is not None:
+        pastas_usuario = {f"usuario={quote(_usuario_particao(u), safe='')}" for u in usuarios}
+    pastas_mes = {f"ano_mes={ano_mes_particao(m)}" for m in meses} if meses is not None else None
+
+    arquivos: List[Path] = []
+    for pasta_usuario in sorted(Path(path).glob("usuario=*")):
+        if pastas_usuario is not None and pasta_usuario.name not in pastas_usuario:
+            continue
+        for pasta_mes in sorted(pasta_usuario.glob("ano_mes=*")):
+            if pastas_mes is not None and pasta_mes.name not in pastas_mes:
+                continue
+            arq = pasta_mes / ARQUIVO_PARTICAO
+            if arq.exists():
+                arquivos.append(arq)
+    return arquivos
+
+
+def carregar_base(
+    path: str,
+    usuarios: Optional[Iterable[str]] = None,
+    meses: Optional[Iterable[str]] = None,
+    colunas: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Lê a base em `path`, só das partições dos `usuarios` e `meses` (MM/AAAA) pedidos.
+
+    Sem filtros, lê tudo. Aceita também o arquivo monolítico antigo.
+    """
+    usuarios = list(usuarios) if usuarios is not None else None
+    meses = list(meses) if meses is not None else None
+
+    if _eh_legado(path):
+        df = pd.read_parquet(path)
+        if usuarios is not None and COL_USUARIO in df.columns:
+            df = df[df[COL_USUARIO].isin(usuarios)]
+        if meses is not None and COL_MES_ANO in df.columns:
+            df = df[df[COL_MES_ANO].isin(meses)]
+        if colunas:
+            df = df[[c for c in colunas if c in df.columns]]
+        return df
+
+    arquivos = _arquivos_base(path, usuarios, meses)
+    if not arquivos:
+        return pd.DataFrame()
+
+    schema = pa.unify_schemas([pq.read_schema(a) for a in arquivos], promote_options="permissive")
+    dataset = ds.dataset([str(a) for a in arquivos], schema=schema, format="parquet")
+    if colunas:
+        colunas = [c for c in colunas if c in schema.names]
+    return dataset.to_table(columns=colunas).to_pandas()
+
+
+def assinatura_base(path: str) -> Optional[float]:
+    """Chave de cache da base: mtime da última publicação; None se não existe.
+
+    Bases gravadas antes do marcador de publicação usam o maior mtime das partições.
+    """
+    if _eh_legado(path):
+        return os.path.getmtime(path)
+    marcador = Path(path) / ARQUIVO_PUBLICACAO
+    if marcador.exists():
+        return marcador.stat().st_mtime
+    mtimes = [a.stat().st_mtime for a in Path(path).glob(f"usuario=*/ano_mes=*/{ARQUIVO_PARTICAO}")]
+    return max(mtimes) if mtimes else None
+
+
+def _gravar_particao(df: pd.DataFrame, pasta: Path) -> None:
+    gravar_parquet_atomico(df, pasta / ARQUIVO_PARTICAO)
+
+
+def _publicar(path: str) -> None:
+    gravar_texto_atomico(datetime.now().isoformat(), Path(path) / ARQUIVO_PUBLICACAO)
+
+
+def _chaves_particao(df: pd.DataFrame) -> pd.DataFrame:
+    usuarios = df[COL_USUARIO] if COL_USUARIO in df.columns else pd.Series(None, index=df.index, dtype=object)
+    meses = df[COL_MES_ANO] if COL_MES_ANO in df.columns else pd.Series(None, index=df.index, dtype=object)
+    return pd.DataFrame({"usuario": usuarios.map(_usuario_particao), "ano_mes": meses.map(ano_mes_particao)}, index=df.index)
+
+
+def particoes_do_df(df: pd.DataFrame, path: str) -> List[str]:
+    """Pastas de partição (`<path>/usuario=.../ano_mes=...`) que as linhas de `df` ocupam."""
+    if df is None or df.empty:
+        return []
+    chaves = _chaves_particao(df).drop_duplicates()
+    return sorted(str(_pasta_particao(path, u, m)) for u, m in chaves.itertuples(index=False, name=None))
+
+
+def particao_existe(pasta: str) -> bool:
+    return (Path(pasta) / ARQUIVO_PARTICAO).exists()
+
+
+def base_legada(path: str) -> bool:
+    """True se `path` ainda é o arquivo monolítico (migrado na próxima gravação)."""
+    return _eh_legado(path)
+
+
+def linhas_por_particao(path: str) -> Dict[str, int]:
+    """Linhas de cada partição gravada, pela pasta (como em `particoes_do_df`).
+
+    Numa base legada, conta as linhas das partições que a migração vai criar.
+    Só lê metadados dos Parquet (ou as colunas de Usuário e Mês/Ano do legado).
+    """
+    if _eh_legado(path):
+        try:
+            df = pd.read_parquet(path, columns=[COL_USUARIO, COL_MES_ANO])
+        except Exception:
+            return {}
+        contagem = _chaves_particao(df).value_counts()
+        return {str(_pasta_particao(path, u, m)): int(n) for (u, m), n in contagem.items()}
+    saida: Dict[str, int] = {}
+    for arq in Path(path).glob(f"usuario=*/ano_mes=*/{ARQUIVO_PARTICAO}"):
+        try:
+            saida[str(arq.parent)] = pq.ParquetFile(arq).metadata.num_rows
+        except Exception:
+            saida[str(arq.parent)] = 0
+    return saida
+
+
+def migrar_base_legada(path: str) -> bool:
+    """Converte o arquivo monolítico em `path` para a base particionada.
+
+    Returns:
+        True se havia um arquivo para migrar.
+    """
+    if not _eh_legado(path):
+        return False
+    df = pd.read_parquet(path).reset_index(drop=True)
+    tmp = f"{path}.migrando"
+    shutil.rmtree(tmp, ignore_errors=True)
+    if not df.empty:
+        for (usuario, ano_mes), idx in _chaves_particao(df).groupby(["usuario", "ano_mes"]).groups.items():
+            _gravar_particao(df.loc[idx], _pasta_particao(tmp, usuario, ano_mes))
+    else:
+        os.makedirs(tmp, exist_ok=True)
+    os.replace(path, f"{path}.legado")
+    os.rename(tmp, path)
+    print(f"Base {path} migrada para partições por usuário/mês")
+    return True
+
+
+def gravar_base(
+    df_novo: pd.DataFrame,
+    path: str,
+    mesclar: Callable[[pd.DataFrame, pd.DataFrame], pd.DataFrame],
+) -> pd.DataFrame:
+    """Grava `df_novo` tocando só as partições (Usuário, Mês/Ano) que ele contém.
+
+    Para cada partição, `mesclar(existente, novo)` recebe o conteúdo atual da
+    partição (vazio se não existe) e as linhas novas dela, e devolve o que
+    deve ficar gravado.
+
+    Returns:
+        Linhas gravadas nas partições tocadas.
+    """
+    if df_novo.empty:
+        return df_novo
+    df_novo = df_novo.reset_index(drop=True)
+    gravados = []
+    with trava_dataset(path):
+        migrar_base_legada(path)
+        os.makedirs(path, exist_ok=True)
+        for (usuario, ano_mes), idx in _chaves_particao(df_novo).groupby(["usuario", "ano_mes"]).groups.items():
+            pasta = _pasta_particao(path, usuario, ano_mes)
+            existente = pd.DataFrame()
+            if (pasta / ARQUIVO_PARTICAO).exists():
+                try:
+                    existente = pd.read_parquet(pasta / ARQUIVO_PARTICAO)
+                except Exception as e:
+                    print(f"Erro ao ler partição {pasta}: {e}")
+            combinado = mesclar(existente, df_novo.loc[idx])
+            _gravar_particao(combinado.reset_index(drop=True), pasta)
+            gravados.append(combinado)
+        _publicar(path)
+    return pd.concat(gravados, ignore_index=True) if gravados else pd.DataFrame()
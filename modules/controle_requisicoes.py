@@ -0,0 +1,137 @@
+"""Controle de concorrência das chamadas de rede (compartilhado pelo processo).
+
+- `SingleFlight`: chamadas idênticas simultâneas (mesmo símbolo, endpoint e
+  janela) compartilham uma única busca em andamento. Diferente do
+  `st.cache_data`, que só reaproveita resultados já concluídos, isso evita que
+  várias sessões Streamlit abrindo a Posição Atual ao mesmo tempo disparem o
+  mesmo `history/info` N vezes.
+- `TokenBucket`: limita a taxa de requisições por host de origem, para não
+  sermos estrangulados pelo Yahoo/SEC/opcoes.net.
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import pandas as pd
+
+HOST_YAHOO = "finance.yahoo.com"
+
+# (requisições por segundo, rajada máxima) por host; hosts não listados usam o padrão
+LIMITES_POR_HOST: Dict[str, tuple[float, int]] = {
+    HOST_YAHOO: (5.0, 10),
+    "www.sec.gov": (8.0, 8),
+    "data.sec.gov": (8.0, 8),
+    "opcoes.net.br": (2.0, 4),
+    "www.alphavantage.co": (1.0, 1),
+    "financialmodelingprep.com": (2.0, 4),
+}
+LIMITE_PADRAO: tuple[float, int] = (5.0, 5)
+
+
+def _copia_resultado(valor: Any) -> Any:
+    """Cada chamador recebe sua própria cópia (evita mutação cruzada entre sessões)."""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy()
+    if isinstance(valor, tuple):
+        # `option_chain` devolve uma namedtuple (calls, puts, underlying)
+        itens = [_copia_resultado(v) for v in valor]
+        return type(valor)(*itens) if hasattr(valor, "_fields") else tuple(itens)
+    if isinstance(valor, (dict, list)):
+        return copy.deepcopy(valor)
+    return valor
+
+
+class _Chamada:
+    __slots__ = ("evento", "resultado", "erro")
+
+    def __init__(self) -> None:
+        self.evento = threading.Event()
+        self.resultado: Any = None
+        self.erro: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes com a mesma chave em uma única execução."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._em_andamento: Dict[Hashable, _Chamada] = {}
+
+    def executar(self, chave: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            chamada = self._em_andamento.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = _Chamada()
+                self._em_andamento[chave] = chamada
+
+        if not lider:
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return _copia_resultado(chamada.resultado)
+
+        try:
+            chamada.resultado = fn()
+        except BaseException as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                self._em_andamento.pop(chave, None)
+            chamada.evento.set()
+        return _copia_resultado(chamada.resultado)
+
+
+class TokenBucket:
+    """Balde de tokens: até `capacidade` chamadas em rajada, reabastecido a `taxa` por segundo."""
+
+    def __init__(self, taxa: float, capacidade: int) -> None:
+        self.taxa = float(taxa)
+        self.capacidade = max(1, int(capacidade))
+        self._tokens = float(self.capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self) -> None:
+        """Bloqueia até haver um token disponível."""
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                espera = (1.0 - self._tokens) / self.taxa
+            time.sleep(espera)
+
+
+_single_flight = SingleFlight()
+_baldes: Dict[str, TokenBucket] = {}
+_lock_baldes = threading.Lock()
+
+
+def limitador_do_host(host: str) -> TokenBucket:
+    host = (host or "").lower()
+    with _lock_baldes:
+        balde = _baldes.get(host)
+        if balde is None:
+            taxa, capacidade = LIMITES_POR_HOST.get(host, LIMITE_PADRAO)
+            balde = TokenBucket(taxa, capacidade)
+            _baldes[host] = balde
+        return balde
+
+
+def executar_coalescido(chave: Hashable, host: str, fn: Callable[[], Any]) -> Any:
+    """Executa `fn` uma vez por chave em andamento, respeitando o limite de taxa do host."""
+
+    def _com_limite() -> Any:
+        limitador_do_host(host).adquirir()
+        return fn()
+
+    return _single_flight.executar(chave, _com_limite)
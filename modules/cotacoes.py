@@ -4,27 +4,56 @@ Armazena e recupera cotações históricas para conversão.
 """
 
 import os
+import threading
 import pandas as pd
 from datetime import datetime
-from typing import Optional
-import yfinance as yf
+from typing import Iterable, Optional
+
+from modules.armazenamento import gravar_parquet_atomico, trava_dataset
+from modules.precos_historicos import INTERVALOS_SUPORTADOS, obter_close_mensal, obter_historico
+from modules.provedor_mercado import obter_provedor
 
 COTACOES_PATH = "data/cotacoes_usd_brl.parquet"
 
+# Tabela de cotações mensais em memória, invalidada pelo mtime do arquivo
+_cache_cotacoes: dict = {"mtime": None, "df": None}
+_lock_cotacoes = threading.Lock()
 
-def garantir_cotacoes_base() -> pd.DataFrame:
-    """Garante que existe um arquivo base de cotações, criando se necessário."""
-    if os.path.exists(COTACOES_PATH):
+
+def _ler_cotacoes_cached() -> Optional[pd.DataFrame]:
+    try:
+        mtime = os.path.getmtime(COTACOES_PATH)
+    except OSError:
+        return None
+    with _lock_cotacoes:
+        if _cache_cotacoes["mtime"] == mtime and _cache_cotacoes["df"] is not None:
+            return _cache_cotacoes["df"]
         try:
-            return pd.read_parquet(COTACOES_PATH)
+            df = pd.read_parquet(COTACOES_PATH)
         except Exception:
-            pass
-    
-    # Criar arquivo base vazio
-    df = pd.DataFrame(columns=["Mês/Ano", "Cotação"])
-    os.makedirs(os.path.dirname(COTACOES_PATH), exist_ok=True)
-    df.to_parquet(COTACOES_PATH, index=False)
-    return df
+            return None
+        _cache_cotacoes["mtime"] = mtime
+        _cache_cotacoes["df"] = df
+        return df
+
+
+def garantir_cotacoes_base() -> pd.DataFrame:
+    """Garante que existe um arquivo base de cotações, criando se necessário.
+
+    Um arquivo que existe mas não pôde ser lido nunca é substituído pelo vazio.
+    """
+    df = _ler_cotacoes_cached()
+    if df is not None:
+        return df.copy()
+
+    vazio = pd.DataFrame(columns=["Mês/Ano", "Cotação"])
+    if os.path.exists(COTACOES_PATH):
+        return vazio
+    with trava_dataset(COTACOES_PATH):
+        if not os.path.exists(COTACOES_PATH):
+            gravar_parquet_atomico(vazio, COTACOES_PATH)
+    df = _ler_cotacoes_cached()
+    return df.copy() if df is not None else vazio
 
 
 def obter_cotacao_mes_yfinance(mes_ano: str) -> Optional[float]:
@@ -49,8 +78,7 @@ def obter_cotacao_mes_yfinance(mes_ano: str) -> Optional[float]:
         data_inicio = f"{ano}-{mes}-01"
         
         # Buscar histórico USD/BRL
-        ticker = yf.Ticker("BRL=X")
-        hist = ticker.history(start=data_inicio, end=data_fim)
+        hist = obter_provedor().historico("BRL=X", start=data_inicio, end=data_fim)
         
         if not hist.empty:
             # Última cotação do período
@@ -106,17 +134,85 @@ def salvar_cotacao_mes(mes_ano: str, cotacao: float) -> None:
         mes_ano: Formato "MM/AAAA"
         cotacao: Valor da cotação USD/BRL
     """
-    df_cotacoes = garantir_cotacoes_base()
+    salvar_cotacoes_meses({mes_ano: cotacao})
+
+
+def salvar_cotacoes_meses(cotacoes: dict) -> None:
+    """
+    Salva/atualiza as cotações de vários meses com uma única escrita.
     
-    # Remover registro existente se houver
-    df_cotacoes = df_cotacoes[df_cotacoes["Mês/Ano"] != mes_ano]
+    Args:
+        cotacoes: {"MM/AAAA": cotação USD/BRL}
+    """
+    if not cotacoes:
+        return
+    # Lê e grava sob a trava: sessões e o atualizador de fundo gravam o mesmo arquivo
+    with trava_dataset(COTACOES_PATH):
+        if os.path.exists(COTACOES_PATH):
+            try:
+                df_cotacoes = pd.read_parquet(COTACOES_PATH)
+            except Exception as e:
+                # Não regrava por cima de um arquivo que não conseguiu ler
+                print(f"Erro ao ler cotações em {COTACOES_PATH}; cotações novas não gravadas: {e}")
+                return
+        else:
+            df_cotacoes = pd.DataFrame(columns=["Mês/Ano", "Cotação"])
+
+        # Remover registros existentes dos meses informados
+        df_cotacoes = df_cotacoes[~df_cotacoes["Mês/Ano"].isin(list(cotacoes))]
+
+        # Adicionar novos registros
+        novos = pd.DataFrame({"Mês/Ano": list(cotacoes), "Cotação": [float(v) for v in cotacoes.values()]})
+        df_cotacoes = pd.concat([df_cotacoes, novos], ignore_index=True) if not df_cotacoes.empty else novos
+
+        gravar_parquet_atomico(df_cotacoes, COTACOES_PATH)
+
+
+def obter_cotacoes_meses(meses: Iterable[str]) -> pd.Series:
+    """
+    Obtém cotações USD/BRL de vários meses de uma vez.
+    
+    Meses ausentes no banco local são buscados juntos (um único histórico diário
+    de BRL=X, via base local de preços) e gravados numa única escrita.
+    Meses sem cotação disponível recebem o fallback (5.80), sem gravar.
     
-    # Adicionar novo registro
-    novo_registro = pd.DataFrame([{"Mês/Ano": mes_ano, "Cotação": cotacao}])
-    df_cotacoes = pd.concat([df_cotacoes, novo_registro], ignore_index=True)
+    Args:
+        meses: valores "MM/AAAA" (duplicados e nulos são ignorados)
     
-    # Salvar
-    df_cotacoes.to_parquet(COTACOES_PATH, index=False)
+    Returns:
+        Series indexada por "MM/AAAA" com a cotação de cada mês
+    """
+    unicos = pd.Series(list(meses), dtype=object).dropna().astype(str).str.strip()
+    unicos = unicos[unicos != ""].drop_duplicates().tolist()
+    if not unicos:
+        return pd.Series(dtype=float)
+
+    df_cotacoes = garantir_cotacoes_base()
+    locais = (
+        df_cotacoes.drop_duplicates(subset=["Mês/Ano"], keep="first").set_index("Mês/Ano")["Cotação"]
+        if not df_cotacoes.empty
+        else pd.Series(dtype=float)
+    )
+    cot = pd.to_numeric(locais.reindex(unicos), errors="coerce")
+
+    faltantes = cot.index[cot.isna()]
+    if len(faltantes):
+        periodos = pd.to_datetime("01/" + pd.Series(faltantes, index=faltantes), format="%d/%m/%Y", errors="coerce").dt.to_period("M")
+        try:
+            close_m = obter_close_mensal("BRL=X")
+        except Exception as e:
+            print(f"Erro ao obter cotações mensais via yfinance: {e}")
+            close_m = pd.Series(dtype=float)
+        encontrados = periodos.map(close_m).dropna() if not close_m.empty else pd.Series(dtype=float)
+        if not encontrados.empty:
+            salvar_cotacoes_meses(encontrados.astype(float).to_dict())
+            cot.loc[encontrados.index] = encontrados.astype(float)
+        sem_cotacao = cot.index[cot.isna()].tolist()
+        if sem_cotacao:
+            print(f"[Aviso] Usando cotação fallback para {', '.join(sem_cotacao)}: 5.80")
+            cot = cot.fillna(5.80)
+
+    return cot.astype(float)
 
 
 def converter_usd_para_brl(valor_usd: float, mes_ano: str) -> float:
@@ -134,6 +230,54 @@ def converter_usd_para_brl(valor_usd: float, mes_ano: str) -> float:
     return valor_usd * cotacao
 
 
+def _cotacao_por_linha(meses: pd.Series) -> pd.Series:
+    """Cotação USD/BRL de cada linha (NaN onde não há mês), com um único lookup por mês distinto."""
+    chave = meses.astype(str).str.strip().where(meses.notna())
+    return chave.map(obter_cotacoes_meses(chave))
+
+
+def converter_usd_para_brl_serie(valores: pd.Series, meses: pd.Series) -> pd.Series:
+    """
+    Versão vetorizada de `converter_usd_para_brl` para colunas inteiras.
+    
+    Args:
+        valores: valores em dólares
+        meses: mês/ano de cada linha (formato "MM/AAAA"), mesmo índice de `valores`
+    
+    Returns:
+        Series em reais; linhas sem mês ou sem valor são mantidas como estão
+    """
+    taxa = _cotacao_por_linha(meses)
+    convertido = pd.to_numeric(valores, errors="coerce") * taxa
+    return convertido.where(taxa.notna() & valores.notna(), valores)
+
+
+def converter_df_usd_para_brl(df: pd.DataFrame, colunas: Iterable[str], coluna_mes: str = "Mês/Ano") -> pd.DataFrame:
+    """
+    Converte várias colunas USD→BRL de um DataFrame pela cotação do mês de cada linha.
+    
+    As cotações de todos os meses presentes são resolvidas uma única vez.
+    
+    Args:
+        df: DataFrame de origem (não é alterado)
+        colunas: colunas em dólares a converter (ausentes são ignoradas)
+        coluna_mes: coluna com o mês/ano ("MM/AAAA")
+    
+    Returns:
+        Cópia do DataFrame com as colunas convertidas
+    """
+    df = df.copy()
+    if df.empty or coluna_mes not in df.columns:
+        return df
+    taxa = _cotacao_por_linha(df[coluna_mes])
+    for col in colunas:
+        if col not in df.columns:
+            continue
+        convertido = pd.to_numeric(df[col], errors="coerce") * taxa
+        df[col] = convertido.where(taxa.notna() & df[col].notna(), df[col])
+    return df
+
+
 def obter_cotacao_atual_usd_brl() -> float:
     """
     Obtém cotação atual (tempo real) de USD/BRL.
@@ -142,8 +286,7 @@ def obter_cotacao_atual_usd_brl() -> float:
         Cotação atual ou fallback 5.80
     """
     try:
-        ticker = yf.Ticker("BRL=X")
-        hist = ticker.history(period="1d")
+        hist = obter_provedor().historico("BRL=X", period="1d")
         if not hist.empty:
             return float(hist["Close"].iloc[-1])
     except Exception:
@@ -152,6 +295,18 @@ def obter_cotacao_atual_usd_brl() -> float:
     return 5.80
 
 
+def ultima_cotacao_usd_brl_local() -> float:
+    """Cotação USD/BRL do mês mais recente da base local, sem acessar a rede (fallback 5.80)."""
+    df = _ler_cotacoes_cached()
+    if df is not None and not df.empty and {"Mês/Ano", "Cotação"}.issubset(df.columns):
+        meses = pd.to_datetime(df["Mês/Ano"].astype(str), format="%m/%Y", errors="coerce")
+        cot = pd.to_numeric(df["Cotação"], errors="coerce")
+        validas = meses.notna() & cot.notna() & (cot > 0)
+        if validas.any():
+            return float(cot[validas].iloc[meses[validas].argmax()])
+    return 5.80
+
+
 def obter_cotacao_atual_eur_brl() -> float:
     """Obtém cotação atual (tempo real) de EUR/BRL.
 
@@ -162,8 +317,7 @@ def obter_cotacao_atual_eur_brl() -> float:
     """
     # 1) Direto EUR/BRL
     try:
-        ticker = yf.Ticker("EURBRL=X")
-        hist = ticker.history(period="1d")
+        hist = obter_provedor().historico("EURBRL=X", period="1d")
         if not hist.empty:
             px = float(hist["Close"].iloc[-1])
             if px > 0:
@@ -173,8 +327,7 @@ def obter_cotacao_atual_eur_brl() -> float:
 
     # 2) EURUSD × USDBRL
     try:
-        ticker = yf.Ticker("EURUSD=X")
-        hist = ticker.history(period="1d")
+        hist = obter_provedor().historico("EURUSD=X", period="1d")
         if not hist.empty:
             eurusd = float(hist["Close"].iloc[-1])
             if eurusd > 0:
@@ -186,6 +339,20 @@ def obter_cotacao_atual_eur_brl() -> float:
     return 6.20
 
 
+def _historico_simbolo(sym: str, periodo: str, intervalo: str) -> pd.DataFrame:
+    """Histórico com coluna Date: base local de preços para diário/semanal/mensal, yfinance direto para intraday."""
+    if intervalo in INTERVALOS_SUPORTADOS:
+        return obter_historico(sym, periodo=periodo, intervalo=intervalo)
+
+    hist = obter_provedor().historico(sym, period=periodo, interval=intervalo)
+    if hist.empty:
+        return pd.DataFrame()
+    hist = hist.reset_index()
+    if 'Date' not in hist.columns and 'Datetime' in hist.columns:
+        hist = hist.rename(columns={'Datetime': 'Date'})
+    return hist
+
+
 def obter_historico_cotacao_usd_brl(periodo: str = "10y", intervalo: str = "1d") -> pd.DataFrame:
     """
     Obtém histórico de cotações USD/BRL.
@@ -198,18 +365,7 @@ def obter_historico_cotacao_usd_brl(periodo: str = "10y", intervalo: str = "1d")
         DataFrame com colunas: Date (index), Open, High, Low, Close, Volume
     """
     try:
-        ticker = yf.Ticker("BRL=X")
-        hist = ticker.history(period=periodo, interval=intervalo)
-        
-        if not hist.empty:
-            # Reset index para ter Date como coluna
-            hist = hist.reset_index()
-            # Renomear coluna de data
-            if 'Date' not in hist.columns and 'Datetime' in hist.columns:
-                hist = hist.rename(columns={'Datetime': 'Date'})
-            return hist
-        else:
-            return pd.DataFrame()
+        return _historico_simbolo("BRL=X", periodo, intervalo)
     except Exception as e:
         print(f"Erro ao obter histórico de cotação: {e}")
         return pd.DataFrame()
@@ -247,14 +403,9 @@ def obter_historico_indice(indice: str, periodo: str = "10y", intervalo: str = "
             
             for etf in etfs_renda_fixa:
                 try:
-                    ticker = yf.Ticker(etf)
-                    hist = ticker.history(period=periodo, interval=intervalo)
+                    hist = _historico_simbolo(etf, periodo, intervalo)
                     
                     if not hist.empty and len(hist) > 100:  # Garantir dados suficientes
-                        hist = hist.reset_index()
-                        if 'Date' not in hist.columns and 'Datetime' in hist.columns:
-                            hist = hist.rename(columns={'Datetime': 'Date'})
-                        
                         # Normalizar para mostrar rendimento acumulado crescente
                         # Usar valor inicial como base e calcular crescimento
                         valor_inicial = hist['Close'].iloc[0]
@@ -274,13 +425,9 @@ def obter_historico_indice(indice: str, periodo: str = "10y", intervalo: str = "
             print(f"Aviso: Não foi possível obter dados de SELIC. Nenhum ETF disponível.")
             return pd.DataFrame()
         
-        ticker = yf.Ticker(ticker_symbol)
-        hist = ticker.history(period=periodo, interval=intervalo)
+        hist = _historico_simbolo(ticker_symbol, periodo, intervalo)
         
         if not hist.empty:
-            hist = hist.reset_index()
-            if 'Date' not in hist.columns and 'Datetime' in hist.columns:
-                hist = hist.rename(columns={'Datetime': 'Date'})
             return hist[['Date', 'Close']]
         else:
             return pd.DataFrame()
@@ -303,13 +450,9 @@ def obter_historico_acao(ticker: str, periodo: str = "10y", intervalo: str = "1d
         DataFrame com colunas: Date, Close
     """
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period=periodo, interval=intervalo)
+        hist = _historico_simbolo(ticker, periodo, intervalo)
         
         if not hist.empty:
-            hist = hist.reset_index()
-            if 'Date' not in hist.columns and 'Datetime' in hist.columns:
-                hist = hist.rename(columns={'Datetime': 'Date'})
             return hist[['Date', 'Close']]
         else:
             return pd.DataFrame()
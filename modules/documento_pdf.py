@@ -0,0 +1,216 @@
+"""PDF aberto uma única vez, com o texto das páginas extraído sob demanda.
+
+Um extrato da Avenue passa pela detecção de formato, pelo parser de posições,
+pelo de dividendos e, às vezes, pelos fallbacks. Todos recebem o mesmo
+`DocumentoPDF`: o arquivo é aberto uma vez e `extract_text()` /
+`extract_words()` / `extract_tables()` rodam no máximo uma vez por página, na
+primeira vez em que alguém pede aquela página.
+
+O que é extraído também fica num cache em disco (`CACHE_PDF_DIR`), um JSON
+por PDF com chave SHA-256 do conteúdo + versão do pdfplumber. Reimportar os
+extratos ou rodar um parser alterado sobre o histórico lê o texto do cache e
+nem abre o PDF; um pdfplumber de outra versão (layout diferente) usa outra
+pasta do cache. As tabelas só entram no cache de quem as pediu.
+
+Para achar as seções (posições, dividendos) sem montar o layout de todas as
+páginas, `paginas_com(...)` faz uma varredura barata: decodifica só os
+operadores de texto da página (mesmas fontes e mapas unicode do pdfminer, sem
+posição de caractere) e diz quais páginas podem ter o marcador. O layout
+completo (`texto`) fica para as páginas que os parsers realmente leem.
+
+As funções dos parsers aceitam caminho ou documento; `abrir_documento` abre o
+caminho (e fecha no fim) ou devolve o documento recebido sem fechá-lo.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Union
+
+from modules.armazenamento import gravar_texto_atomico
+from modules.manifesto_ingestao import hash_arquivo
+from modules.metricas_ingestao import etapa
+
+try:
+    import pdfplumber
+    from pdfminer.pdfdevice import PDFDevice
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+except ImportError:  # pragma: no cover
+    pdfplumber = None
+    PDFDevice = object
+
+CACHE_PDF_DIR = "data/cache_pdf"
+
+# Atributos guardados de cada palavra de `extract_words()`
+_CAMPOS_PALAVRA = ("text", "x0", "x1", "top", "bottom")
+
+
+def _sem_espacos(texto: Optional[str]) -> str:
+    return re.sub(r"\s+", "", texto or "")
+
+
+class _ColetorTexto(PDFDevice):
+    """Device do pdfminer que só guarda os caracteres desenhados, na ordem do conteúdo."""
+
+    def __init__(self, rsrcmgr):
+        super().__init__(rsrcmgr)
+        self.partes: List[str] = []
+
+    def render_string(self, textstate, seq, ncs, graphicstate) -> None:
+        font = textstate.font
+        for obj in seq:
+            if not isinstance(obj, bytes):
+                continue
+            for cid in font.decode(obj):
+                try:
+                    self.partes.append(font.to_unichr(cid))
+                except Exception:
+                    continue
+
+
+def caminho_cache_pdf(sha256: str, cache_dir: str = CACHE_PDF_DIR) -> str:
+    versao = getattr(pdfplumber, "__version__", "desconhecida")
+    return os.path.join(cache_dir, f"pdfplumber-{versao}", f"{sha256}.json")
+
+
+class DocumentoPDF:
+    """PDF com o texto, as palavras e as tabelas de cada página memorizados (e em cache)."""
+
+    def __init__(self, caminho, usar_cache: bool = True, cache_dir: str = CACHE_PDF_DIR):
+        if pdfplumber is None:
+            raise ImportError("pdfplumber não está instalado. Execute: pip install pdfplumber")
+        self.caminho = os.fspath(caminho)
+        self._pdf = None
+        self._num_paginas: Optional[int] = None
+        self._recursos = None
+        self._paginas: Dict[str, dict] = {}
+        self._alterado = False
+        self._cache_path: Optional[str] = None
+        if usar_cache:
+            with etapa("leitura"):
+                self._cache_path = caminho_cache_pdf(hash_arquivo(self.caminho), cache_dir)
+                self._carregar_cache()
+
+    def _carregar_cache(self) -> None:
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            self._num_paginas = int(dados["num_paginas"])
+            self._paginas = dict(dados.get("paginas") or {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Cache de texto do PDF ignorado ({self._cache_path}): {e}")
+
+    def _salvar_cache(self) -> None:
+        dados = {"arquivo": os.path.basename(self.caminho), "num_paginas": self.num_paginas, "paginas": self._paginas}
+        try:
+            # Dois processos gravando o mesmo PDF: vence o último, sempre inteiro
+            gravar_texto_atomico(json.dumps(dados, ensure_ascii=False), self._cache_path)
+        except Exception as e:
+            print(f"Erro ao salvar cache de texto do PDF {self._cache_path}: {e}")
+
+    def _pagina_pdf(self, pagina: int):
+        if self._pdf is None:
+            self._pdf = pdfplumber.open(self.caminho)
+        return self._pdf.pages[pagina]
+
+    def _varrer(self, pagina) -> str:
+        if self._recursos is None:
+            self._recursos = PDFResourceManager(caching=True)
+        coletor = _ColetorTexto(self._recursos)
+        PDFPageInterpreter(self._recursos, coletor).process_page(pagina.page_obj)
+        return "".join(coletor.partes)
+
+    def _extrair(self, pagina: int, campo: str, extrator):
+        entrada = self._paginas.setdefault(str(pagina), {})
+        if campo not in entrada:
+            with etapa("leitura"):
+                entrada[campo] = extrator(self._pagina_pdf(pagina))
+            self._alterado = True
+        return entrada[campo]
+
+    @property
+    def nome(self) -> str:
+        return os.path.basename(self.caminho)
+
+    @property
+    def num_paginas(self) -> int:
+        if self._num_paginas is None:
+            with etapa("leitura"):
+                if self._pdf is None:
+                    self._pdf = pdfplumber.open(self.caminho)
+                self._num_paginas = len(self._pdf.pages)
+            self._alterado = True
+        return self._num_paginas
+
+    def texto(self, pagina: int) -> Optional[str]:
+        """`extract_text()` da página (índice a partir de 0), calculado uma vez."""
+        return self._extrair(pagina, "texto", lambda p: p.extract_text())
+
+    def textos(self) -> List[Optional[str]]:
+        return [self.texto(i) for i in range(self.num_paginas)]
+
+    def palavras(self, pagina: int) -> List[dict]:
+        """`extract_words()` da página (texto e posição de cada palavra)."""
+        return self._extrair(
+            pagina,
+            "palavras",
+            lambda p: [{c: w[c] for c in _CAMPOS_PALAVRA} for w in p.extract_words()],
+        )
+
+    def texto_bruto(self, pagina: int) -> str:
+        """Caracteres da página na ordem do conteúdo, sem layout (sem espaços nem quebras confiáveis)."""
+        return self._extrair(pagina, "bruto", self._varrer)
+
+    def paginas_com(self, *marcadores: str, ignorar_caixa: bool = False) -> List[int]:
+        """Páginas que podem conter algum dos marcadores (espaços não contam).
+
+        Usa o texto da página se já foi extraído; senão, a varredura barata
+        (`texto_bruto`), que vê os mesmos caracteres do layout, só sem a ordem
+        visual e os espaços: pode incluir uma página a mais, não deixa de fora
+        uma cujo `texto` tenha o marcador.
+        """
+        alvos = [_sem_espacos(m) for m in marcadores]
+        if ignorar_caixa:
+            alvos = [a.lower() for a in alvos]
+        paginas = []
+        for i in range(self.num_paginas):
+            entrada = self._paginas.get(str(i), {})
+            conteudo = _sem_espacos(entrada["texto"] if "texto" in entrada else self.texto_bruto(i))
+            if ignorar_caixa:
+                conteudo = conteudo.lower()
+            if any(a in conteudo for a in alvos):
+                paginas.append(i)
+        return paginas
+
+    def tabelas(self, pagina: int) -> list:
+        """`extract_tables()` da página, calculado uma vez."""
+        return self._extrair(pagina, "tabelas", lambda p: p.extract_tables())
+
+    def fechar(self) -> None:
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+        if self._alterado and self._cache_path:
+            self._salvar_cache()
+            self._alterado = False
+
+    def __enter__(self) -> "DocumentoPDF":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.fechar()
+
+
+@contextmanager
+def abrir_documento(fonte: Union[str, "os.PathLike[str]", DocumentoPDF]) -> Iterator[DocumentoPDF]:
+    """Documento de `fonte`; só fecha no fim se foi aberto aqui."""
+    if isinstance(fonte, DocumentoPDF):
+        yield fonte
+        return
+    with DocumentoPDF(fonte) as doc:
+        yield doc
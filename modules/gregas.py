@@ -0,0 +1,199 @@
+"""Black-Scholes vetorizado: volatilidade implícita e gregas de cadeias inteiras.
+
+Tudo opera sobre arrays NumPy (um contrato por posição), sem laço Python por
+contrato: a volatilidade implícita é resolvida por Newton com salvaguarda de
+bisseção, todos os contratos iterando juntos, e as gregas saem das mesmas
+fórmulas fechadas. Milhares de opções levam poucos milissegundos.
+
+Convenções:
+- prazo em anos corridos (dias / 365) até o vencimento;
+- juros contínuos anuais, sem dividendos (`TAXA_LIVRE_RISCO_*` são aproximações
+  da Selic / Fed Funds, ajuste se necessário);
+- theta por dia corrido e vega por 1 ponto percentual de volatilidade;
+- probabilidade de exercício neutra a risco: N(d2) para calls, N(-d2) para puts.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+TAXA_LIVRE_RISCO_BRL = 0.14
+TAXA_LIVRE_RISCO_USD = 0.04
+
+VOL_MIN = 1e-4
+VOL_MAX = 5.0
+MAX_ITER_IV = 80
+TOL_IV = 1e-7
+
+COLUNAS_GREGAS = ["Vol. Implícita (%)", "Delta", "Gama", "Theta (dia)", "Vega", "Prob. Exercício (%)"]
+
+_RAIZ_2 = np.sqrt(2.0)
+_RAIZ_2PI = np.sqrt(2.0 * np.pi)
+
+
+def _erfc(x: np.ndarray) -> np.ndarray:
+    """erfc com erro relativo < 1.2e-7 (aproximação de Chebyshev, Numerical Recipes)."""
+    z = np.abs(x)
+    t = 1.0 / (1.0 + 0.5 * z)
+    r = t * np.exp(
+        -z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (-0.18628806
+        + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (-0.82215223 + t * 0.17087277))))))))
+    )
+    return np.where(x >= 0, r, 2.0 - r)
+
+
+def _cdf_normal(x: np.ndarray) -> np.ndarray:
+    return 0.5 * _erfc(-x / _RAIZ_2)
+
+
+def _pdf_normal(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / _RAIZ_2PI
+
+
+def _d1_d2(s, k, t, r, sigma):
+    raiz_t = np.sqrt(t)
+    d1 = (np.log(s / k) + (r + 0.5 * sigma * sigma) * t) / (sigma * raiz_t)
+    return d1, d1 - sigma * raiz_t
+
+
+def preco_black_scholes(s, k, t, r, sigma, is_call) -> np.ndarray:
+    """Preço teórico (arrays com broadcast; `is_call` booleano)."""
+    s, k, t, r, sigma = (np.asarray(v, dtype=float) for v in (s, k, t, r, sigma))
+    is_call = np.asarray(is_call, dtype=bool)
+    d1, d2 = _d1_d2(s, k, t, r, sigma)
+    desc = k * np.exp(-r * t)
+    call = s * _cdf_normal(d1) - desc * _cdf_normal(d2)
+    put = desc * _cdf_normal(-d2) - s * _cdf_normal(-d1)
+    return np.where(is_call, call, put)
+
+
+def volatilidade_implicita(preco, s, k, t, r, is_call, max_iter: int = MAX_ITER_IV, tol: float = TOL_IV) -> np.ndarray:
+    """Volatilidade implícita (anual, fração) de todos os contratos de uma vez.
+
+    Newton-Raphson com intervalo [lo, hi] mantido por contrato: quando o passo
+    de Newton sai do intervalo (vega ~ 0, asas muito fora do dinheiro), usa
+    bisseção. Prêmios fora dos limites de não-arbitragem retornam NaN.
+    """
+    preco, s, k, t, r, is_call = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (preco, s, k, t, r)), np.asarray(is_call, dtype=bool)
+    )
+    forma = preco.shape
+    preco, s, k, t, r, is_call = (np.ravel(v) for v in (preco, s, k, t, r, is_call))
+
+    desc = k * np.exp(-r * t)
+    minimo = np.where(is_call, np.maximum(s - desc, 0.0), np.maximum(desc - s, 0.0))
+    maximo = np.where(is_call, s, desc)
+    validos = (
+        np.isfinite(preco) & np.isfinite(s) & np.isfinite(k) & np.isfinite(t)
+        & (s > 0) & (k > 0) & (t > 0) & (preco > minimo) & (preco < maximo)
+    )
+
+    # Chute inicial de Brenner-Subrahmanyam, dentro do intervalo
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = np.clip(np.sqrt(2.0 * np.pi / t) * preco / s, 0.05, 2.0)
+    sigma = np.where(validos, sigma, 0.2).astype(float)
+    lo = np.full(preco.shape, VOL_MIN)
+    hi = np.full(preco.shape, VOL_MAX)
+    pendente = validos.copy()
+
+    # Cada iteração trabalha só sobre os contratos ainda pendentes (índices comprimidos)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(max_iter):
+            idx = np.flatnonzero(pendente)
+            if idx.size == 0:
+                break
+            s_i, k_i, t_i, r_i, sig_i = s[idx], k[idx], t[idx], r[idx], sigma[idx]
+            d1, _d2 = _d1_d2(s_i, k_i, t_i, r_i, sig_i)
+            diff = preco_black_scholes(s_i, k_i, t_i, r_i, sig_i, is_call[idx]) - preco[idx]
+            vega = s_i * _pdf_normal(d1) * np.sqrt(t_i)
+            # Convergiu quando o próximo passo de Newton mudaria a vol em menos de `tol`
+            ainda = (diff != 0) & ~(np.abs(diff) < tol * vega)
+            pendente[idx] = ainda
+
+            lo_i = np.where(diff < 0, sig_i, lo[idx])
+            hi_i = np.where(diff > 0, sig_i, hi[idx])
+            newton = sig_i - diff / vega
+            fora = ~np.isfinite(newton) | (newton <= lo_i) | (newton >= hi_i)
+            lo[idx], hi[idx] = lo_i, hi_i
+            sigma[idx] = np.where(ainda, np.where(fora, 0.5 * (lo_i + hi_i), newton), sig_i)
+
+    # Não convergiu mas o intervalo colapsou: aceita o ponto médio
+    convergiu = ~pendente | ((hi - lo) < 1e-5)
+    return np.where(validos & convergiu, sigma, np.nan).reshape(forma)
+
+
+def calcular_gregas(s, k, t, r, sigma, is_call) -> Dict[str, np.ndarray]:
+    """Delta, gama, theta (por dia), vega (por 1 p.p. de vol) e probabilidade de exercício."""
+    s, k, t, r, sigma = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (s, k, t, r, sigma)))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), s.shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1, d2 = _d1_d2(s, k, t, r, sigma)
+        pdf_d1 = _pdf_normal(d1)
+        raiz_t = np.sqrt(t)
+        desc = k * np.exp(-r * t)
+
+        delta = np.where(is_call, _cdf_normal(d1), _cdf_normal(d1) - 1.0)
+        gama = pdf_d1 / (s * sigma * raiz_t)
+        theta_comum = -s * pdf_d1 * sigma / (2.0 * raiz_t)
+        theta = np.where(
+            is_call,
+            theta_comum - r * desc * _cdf_normal(d2),
+            theta_comum + r * desc * _cdf_normal(-d2),
+        ) / 365.0
+        vega = s * pdf_d1 * raiz_t / 100.0
+        prob = np.where(is_call, _cdf_normal(d2), _cdf_normal(-d2))
+    return {"delta": delta, "gama": gama, "theta": theta, "vega": vega, "prob_exercicio": prob}
+
+
+def prazo_em_anos(vencimentos, data_ref: Optional[datetime] = None) -> np.ndarray:
+    """Anos corridos de `data_ref` (padrão: agora) até o fim do dia de vencimento."""
+    venc = pd.to_datetime(pd.Series(vencimentos), errors="coerce")
+    ref = pd.Timestamp(data_ref or datetime.now())
+    dias = (venc.dt.normalize() + pd.Timedelta(hours=18) - ref) / pd.Timedelta(days=1)
+    return np.clip(dias.to_numpy(dtype=float), 0.0, None) / 365.0
+
+
+def adicionar_gregas(
+    df: pd.DataFrame,
+    preco_ativo,
+    col_strike: str,
+    col_vencimento: str,
+    col_premio: str,
+    col_tipo: str,
+    taxa: float = TAXA_LIVRE_RISCO_BRL,
+    data_ref: Optional[datetime] = None,
+    prazo_anos=None,
+) -> pd.DataFrame:
+    """Retorna cópia de `df` com as colunas de `COLUNAS_GREGAS`.
+
+    Args:
+        preco_ativo: preço atual do ativo-objeto (escalar ou um valor por linha)
+        col_tipo: coluna com CALL/PUT (qualquer caixa; 'C'/'P' também servem)
+        prazo_anos: prazo já calculado (opcional; padrão: até `col_vencimento`)
+    """
+    out = df.copy()
+    if out.empty:
+        for c in COLUNAS_GREGAS:
+            out[c] = pd.Series(dtype=float)
+        return out
+
+    s = pd.to_numeric(pd.Series(np.broadcast_to(np.asarray(preco_ativo, dtype=object), len(out))), errors="coerce").to_numpy(dtype=float)
+    k = pd.to_numeric(out[col_strike], errors="coerce").to_numpy(dtype=float)
+    premio = pd.to_numeric(out[col_premio], errors="coerce").to_numpy(dtype=float)
+    t = prazo_em_anos(out[col_vencimento], data_ref) if prazo_anos is None else np.asarray(prazo_anos, dtype=float)
+    is_call = out[col_tipo].astype(str).str.strip().str.upper().str.startswith("C").to_numpy()
+
+    sigma = volatilidade_implicita(premio, s, k, t, taxa, is_call)
+    gregas = calcular_gregas(s, k, t, taxa, sigma, is_call)
+
+    out["Vol. Implícita (%)"] = sigma * 100.0
+    out["Delta"] = gregas["delta"]
+    out["Gama"] = gregas["gama"]
+    out["Theta (dia)"] = gregas["theta"]
+    out["Vega"] = gregas["vega"]
+    out["Prob. Exercício (%)"] = gregas["prob_exercicio"] * 100.0
+    return out
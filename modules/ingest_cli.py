@@ -0,0 +1,203 @@
+"""Importação em lote pela linha de comando (sem abrir o Streamlit).
+
+Varre as pastas informadas (recursivamente) atrás de relatórios Excel e PDFs
+da Avenue e importa tudo com `processar_lote`: leitura em pool de processos,
+uma gravação por base e manifesto de ingestão para pular o que não mudou.
+Usuário e mês/ano saem da subpasta e do nome do arquivo, como no monitor de
+pastas (`modules.monitor_ingestao`).
+
+No fim imprime quantos PDFs cada parser leu, o tempo por etapa (leitura,
+parse, padronização, gravação), arquivos/s e linhas/s. Com `--simular`, lê os arquivos e mostra o que mudaria
+(linhas por base e partições novas ou substituídas) sem gravar nada.
+
+Uso (na raiz do repositório):
+    python -m modules.ingest_cli Relatorios/ [--workers N] [--simular] [--forcar] [--sem-tickers]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from modules.base_particionada import base_legada, linhas_por_particao
+from modules.leitura_paralela import TIMEOUT_ARQUIVO
+from modules.metricas_ingestao import ETAPAS, somar_tempos
+from modules.monitor_ingestao import item_do_arquivo, varrer_pastas
+from modules.upload_ingest import MAX_WORKERS_LOTE, ItemLote, processar_lote
+from modules.usuarios import carregar_usuarios
+
+# Arquivos por chamada de `processar_lote` (limita a memória em cargas de vários anos)
+TAMANHO_LOTE = 200
+
+
+def _repo_root() -> Path:
+    return Path(__file__).resolve().parents[1]
+
+
+def montar_itens(pastas: List[str], usuario: Optional[str] = None) -> List[ItemLote]:
+    """Itens de lote para os relatórios encontrados (ignorados são avisados)."""
+    df_usuarios = carregar_usuarios()
+    cadastrados = df_usuarios["Nome"].dropna().astype(str).tolist() if "Nome" in df_usuarios.columns else []
+
+    itens: List[ItemLote] = []
+    for caminho in varrer_pastas(pastas):
+        item, motivo = item_do_arquivo(caminho, cadastrados, usuario)
+        if item is None:
+            print(f"Ignorado {caminho}: {motivo}")
+            continue
+        itens.append(item)
+    return itens
+
+
+def _relatar_simulacao(itens: List[ItemLote]) -> None:
+    # Partições existentes por base; uma base legada (arquivo único) conta as
+    # partições que a migração da primeira gravação vai criar
+    existentes: Dict[str, Dict[str, int]] = {}
+    novas = substituidas = 0
+    for item in itens:
+        if item.erro or item.ignorado:
+            continue
+        detalhes = []
+        for pasta in sorted(set(item.particoes)):
+            base = str(Path(pasta).parent.parent)
+            if base not in existentes:
+                existentes[base] = linhas_por_particao(base)
+            if pasta in existentes[base]:
+                substituidas += 1
+                detalhes.append(f"{pasta} (existe, {existentes[base][pasta]} linhas)")
+            else:
+                novas += 1
+                detalhes.append(f"{pasta} (nova)")
+        print(f"Importaria {item.caminho} ({item.usuario}, {item.mes_ano or 'mês do PDF'}): {item.linhas}")
+        for d in detalhes:
+            print(f"    {d}")
+    print(f"Partições: {novas} nova(s), {substituidas} já existente(s) seriam regravadas")
+    legadas = sorted(b for b in existentes if base_legada(b))
+    for base in legadas:
+        print(f"Base legada {base}: seria migrada para partições ({len(existentes[base])} usuário/mês) na gravação")
+
+
+def _relatar_parsers(itens: List[ItemLote]) -> None:
+    """Quantos PDFs cada parser leu por seção, e o tempo somado."""
+    uso: Dict[tuple, List[float]] = {}
+    for item in itens:
+        for secao, info in sorted(item.parsers.items()):
+            chave = (secao, info.get("parser") or "nenhum")
+            contagem = uso.setdefault(chave, [0, 0.0])
+            contagem[0] += 1
+            contagem[1] += float(info.get("segundos") or 0.0)
+    if not uso:
+        return
+    print("Parsers de PDF (arquivos, tempo somado):")
+    for (secao, nome), (qtd, segundos) in sorted(uso.items()):
+        print(f"    {secao:<11} {nome:<28} {qtd:5d} {segundos:8.2f}s")
+
+
+def _relatar_tempos(itens: List[ItemLote], tempos_lote: Dict[str, float], total: float) -> None:
+    tempos: Dict[str, float] = {}
+    for item in itens:
+        somar_tempos(tempos, item.tempos)
+    tempos["gravacao"] = tempos.get("gravacao", 0.0) + tempos_lote.get("gravacao", 0.0)
+
+    lidos = [i for i in itens if not i.erro and not i.ignorado]
+    linhas = sum(sum(i.linhas.values()) for i in lidos)
+    print("Tempo por etapa (leitura/parse/padronização somam todos os processos):")
+    for nome in ETAPAS:
+        print(f"    {nome:<13} {tempos.get(nome, 0.0):8.2f}s")
+    for nome in ("hash", "leitura_pool", "tickers"):
+        if nome in tempos_lote:
+            print(f"    {nome:<13} {tempos_lote[nome]:8.2f}s (parede)")
+    print(
+        f"{len(lidos)} arquivo(s) lido(s), {linhas} linha(s) em {total:.1f}s: "
+        f"{len(lidos) / max(total, 1e-9):.2f} arquivos/s, {linhas / max(total, 1e-9):.0f} linhas/s"
+    )
+
+
+def importar(
+    pastas: List[str],
+    max_workers: Optional[int] = MAX_WORKERS_LOTE,
+    simular: bool = False,
+    forcar: bool = False,
+    usuario: Optional[str] = None,
+    tamanho_lote: int = TAMANHO_LOTE,
+    atualizar_tickers: bool = True,
+    timeout_arquivo: Optional[float] = TIMEOUT_ARQUIVO,
+) -> List[ItemLote]:
+    """Importa (ou simula a importação de) todos os relatórios das pastas."""
+    itens = montar_itens(pastas, usuario)
+    if not itens:
+        print("Nenhum relatório encontrado")
+        return itens
+
+    print(f"{len(itens)} relatório(s) encontrados; {'simulação' if simular else 'importação'} com {max_workers or os.cpu_count()} processo(s)")
+    inicio = time.perf_counter()
+    tempos_lote: Dict[str, float] = {}
+    for i in range(0, len(itens), tamanho_lote):
+        parte = itens[i : i + tamanho_lote]
+        tempos_parte: Dict[str, float] = {}
+
+        def _progresso(feitos: int, total: int, base: int = i) -> None:
+            print(f"\r  {base + feitos}/{len(itens)} arquivos lidos", end="", flush=True)
+
+        processar_lote(
+            parte,
+            max_workers=max_workers,
+            ao_progredir=_progresso,
+            forcar=forcar,
+            simular=simular,
+            tempos=tempos_parte,
+            atualizar_tickers=atualizar_tickers,
+            timeout_arquivo=timeout_arquivo,
+        )
+        somar_tempos(tempos_lote, tempos_parte)
+        print()
+    total = time.perf_counter() - inicio
+
+    for item in itens:
+        if item.erro:
+            print(f"Falha ao processar {item.caminho}: {item.erro}")
+        elif item.ignorado:
+            print(f"Sem mudança ({item.ignorado}): {item.caminho}")
+        elif not simular:
+            print(f"Importado {item.caminho} ({item.usuario}, {item.mes_ano or 'mês do PDF'}): {item.linhas}")
+    if simular:
+        _relatar_simulacao(itens)
+    _relatar_parsers(itens)
+    _relatar_tempos(itens, tempos_lote, total)
+    return itens
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Importa relatórios Excel e PDFs da Avenue de uma árvore de pastas.")
+    parser.add_argument("pastas", nargs="+", help="Pastas com os relatórios (subpastas incluídas)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS_LOTE, help="Processos de leitura (padrão: nº de CPUs)")
+    parser.add_argument("--simular", "--dry-run", action="store_true", help="Só mostra o que mudaria, sem gravar")
+    parser.add_argument("--forcar", action="store_true", help="Relê arquivos já registrados no manifesto")
+    parser.add_argument("--usuario", help="Usuário de todos os arquivos (senão vem da subpasta ou do nome)")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE, help="Arquivos por lote gravado")
+    parser.add_argument(
+        "--timeout", type=float, default=TIMEOUT_ARQUIVO, help="Segundos máximos de leitura por arquivo (0 = sem limite)"
+    )
+    parser.add_argument("--sem-tickers", action="store_true", help="Não consulta Setor/Segmento dos tickers novos (sem rede)")
+    args = parser.parse_args(argv)
+
+    # As bases (data/...) são caminhos relativos à raiz do repositório
+    pastas = [os.path.abspath(p) for p in args.pastas]
+    os.chdir(_repo_root())
+    importar(
+        pastas,
+        max_workers=args.workers,
+        simular=args.simular,
+        forcar=args.forcar,
+        usuario=args.usuario,
+        tamanho_lote=max(1, args.tamanho_lote),
+        atualizar_tickers=not args.sem_tickers,
+        timeout_arquivo=args.timeout or None,
+    )
+
+
+if __name__ == "__main__":
+    main()
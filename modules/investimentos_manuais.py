@@ -6,9 +6,10 @@ from typing import Optional, Tuple
 
 import pandas as pd
 import numpy as np
-import yfinance as yf
 
+from modules.armazenamento import ConflitoVersaoError, gravar_parquet_atomico, trava_dataset
 from modules.cotacoes import obter_cotacao_atual_usd_brl, obter_historico_indice
+from modules.provedor_mercado import obter_provedor
 from modules.ticker_info import ticker_para_yfinance, extrair_ticker
 
 CAIXA_PATH = os.path.join("data", "investimentos_manuais_caixa.parquet")
@@ -17,10 +18,15 @@ ACOES_PATH = os.path.join("data", "investimentos_manuais_acoes.parquet")
 ACOES_MANUAIS_PATH = ACOES_PATH
 
 
-def _ensure_dir(path: str) -> None:
-    pasta = os.path.dirname(path)
-    if pasta:
-        os.makedirs(pasta, exist_ok=True)
+def _salvar(df: pd.DataFrame, path: str, versao_esperada: Optional[str]) -> None:
+    """Gravação atômica. Com `versao_esperada` (`armazenamento.versao_arquivo` lido
+    junto com os dados), levanta `ConflitoVersaoError` se outra sessão gravou depois."""
+    try:
+        gravar_parquet_atomico(df, path, versao_esperada=versao_esperada)
+    except ConflitoVersaoError:
+        raise
+    except Exception:
+        pass
 
 
 def _parse_num(valor) -> float:
@@ -115,12 +121,8 @@ def _next_mes_ano(mes_ano: str) -> Optional[str]:
     return nxt.strftime("%m/%Y")
 
 
-def salvar_caixa(df: pd.DataFrame) -> None:
-    _ensure_dir(CAIXA_PATH)
-    try:
-        df.to_parquet(CAIXA_PATH, index=False)
-    except Exception:
-        pass
+def salvar_caixa(df: pd.DataFrame, versao_esperada: Optional[str] = None) -> None:
+    _salvar(df, CAIXA_PATH, versao_esperada)
 
 
 def carregar_caixa_movimentos() -> pd.DataFrame:
@@ -176,14 +178,11 @@ def carregar_caixa_movimentos() -> pd.DataFrame:
     return pd.DataFrame()
 
 
-def salvar_caixa_movimentos(df: pd.DataFrame) -> None:
-    _ensure_dir(CAIXA_MOVS_PATH)
-    try:
-        df.to_parquet(CAIXA_MOVS_PATH, index=False)
-    except Exception:
-        pass
+def salvar_caixa_movimentos(df: pd.DataFrame, versao_esperada: Optional[str] = None) -> None:
+    _salvar(df, CAIXA_MOVS_PATH, versao_esperada)
 
 
+@trava_dataset(CAIXA_MOVS_PATH)
 def registrar_caixa_movimentos(
     mes_ano: str,
     usuario: str,
@@ -318,6 +317,7 @@ def calcular_caixa(
     return dep_total, saq_total, float(rent_pct), float(ganho)
 
 
+@trava_dataset(CAIXA_PATH)
 def registrar_caixa(
     mes_ano: str,
     valor_inicial,
@@ -483,6 +483,7 @@ def registrar_caixa(
     return df_out
 
 
+@trava_dataset(CAIXA_PATH)
 def excluir_caixa(ids=None, tudo: bool = False) -> pd.DataFrame:
     df = carregar_caixa()
     if df.empty:
@@ -543,12 +544,8 @@ def carregar_acoes() -> pd.DataFrame:
     return pd.DataFrame()
 
 
-def salvar_acoes(df: pd.DataFrame) -> None:
-    _ensure_dir(ACOES_PATH)
-    try:
-        df.to_parquet(ACOES_PATH, index=False)
-    except Exception:
-        pass
+def salvar_acoes(df: pd.DataFrame, versao_esperada: Optional[str] = None) -> None:
+    _salvar(df, ACOES_PATH, versao_esperada)
 
 
 def _buscar_preco_moeda(ticker: str) -> Tuple[Optional[float], Optional[str], Optional[str]]:
@@ -556,26 +553,23 @@ def _buscar_preco_moeda(ticker: str) -> Tuple[Optional[float], Optional[str], Op
     if not sym:
         return None, None, None
     try:
-        tk = yf.Ticker(sym)
+        prov = obter_provedor()
         price = None
         info_sym = sym
         try:
-            fi = getattr(tk, "fast_info", None)
-            if fi:
-                price = fi.last_price if hasattr(fi, "last_price") else fi.get("lastPrice") if isinstance(fi, dict) else None
-                curr = fi.currency if hasattr(fi, "currency") else fi.get("currency") if isinstance(fi, dict) else None
-            else:
-                curr = None
+            fi = prov.fast_info(sym)
+            price = fi.get("last_price")
+            curr = fi.get("currency")
         except Exception:
             curr = None
         if price is None:
-            hist = tk.history(period="1d")
+            hist = prov.historico(sym, period="1d")
             if isinstance(hist, pd.DataFrame) and (not hist.empty) and ("Close" in hist.columns):
                 px_last = hist["Close"].dropna()
                 if not px_last.empty:
                     price = float(px_last.iloc[-1])
         if price is None:
-            info = tk.info if hasattr(tk, "info") else {}
+            info = prov.info(sym)
             if isinstance(info, dict):
                 price = info.get("regularMarketPrice") or info.get("previousClose")
                 curr = curr or info.get("currency")
@@ -634,7 +628,6 @@ def registrar_acao_manual(
     pc = _parse_num(preco_compra)
     if not pd.isna(pc) and pc < 0:
         raise ValueError("Preço de compra não pode ser negativo")
-    df = carregar_acoes()
     novo = pd.DataFrame([
         {
             "ID": str(uuid.uuid4()),
@@ -661,8 +654,10 @@ def registrar_acao_manual(
             "Data Registro": datetime.now(),
         }
     ])
-    df_out = pd.concat([df, novo], ignore_index=True)
-    salvar_acoes(df_out)
+    # Cotação buscada fora da trava; só a leitura + gravação ficam dentro dela
+    with trava_dataset(ACOES_PATH):
+        df_out = pd.concat([carregar_acoes(), novo], ignore_index=True)
+        salvar_acoes(df_out)
     meta = {
         "preco": preco,
         "moeda": moeda or "BRL",
@@ -675,6 +670,7 @@ def registrar_acao_manual(
     return df_out, meta
 
 
+@trava_dataset(ACOES_PATH)
 def excluir_acoes(ids=None, tudo: bool = False) -> pd.DataFrame:
     df = carregar_acoes()
     if df.empty:
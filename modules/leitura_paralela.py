@@ -0,0 +1,180 @@
+"""Leitura de arquivos em paralelo num pool de processos.
+
+O parse dos relatórios (pdfplumber, openpyxl) é Python puro e preso a um
+núcleo; `executar_em_paralelo` espalha as chamadas por um
+`ProcessPoolExecutor`:
+
+- o erro de um arquivo fica no resultado daquele arquivo e não derruba o lote;
+- com `timeout`, o arquivo que passa desse tempo rodando num processo é dado
+  como erro (`TempoLeituraEsgotadoError`); os processos do pool são
+  encerrados (não dá para matar só o travado) e o que faltava roda num pool
+  novo. O tempo conta de quando a tarefa sai da fila, então é aproximado;
+- se um processo morre (segfault, OOM), as tarefas que ele podia estar rodando
+  são repetidas uma a uma, cada uma sozinha num pool de 1 processo: a que
+  derrubar o processo de novo volta como erro (`ProcessoLeituraEncerradoError`)
+  e o resto segue num pool novo. O processo principal nunca roda o arquivo
+  que derrubou um processo;
+- só quando não dá para criar processos (plataforma sem multiprocessing) roda
+  em sequência no próprio processo, sem limite de tempo. Uma tarefa só ou
+  `max_workers=1` também vão para um processo separado, para um arquivo que
+  derruba o processo não derrubar quem chamou.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+# Segundos que um arquivo pode ficar sendo lido num processo (None = sem limite)
+TIMEOUT_ARQUIVO: Optional[float] = 300.0
+_INTERVALO_VERIFICACAO = 0.5
+
+Resultado = Tuple[Any, Optional[BaseException]]
+
+
+class TempoLeituraEsgotadoError(RuntimeError):
+    """A leitura de um arquivo passou do tempo limite."""
+
+
+class ProcessoLeituraEncerradoError(RuntimeError):
+    """O processo que lia o arquivo morreu (segfault, falta de memória...)."""
+
+
+class _PoolQuebrado(Exception):
+    """Um processo do pool morreu; `suspeitos` são as tarefas que podiam estar nele."""
+
+    def __init__(self, suspeitos: List[int]):
+        super().__init__(f"{len(suspeitos)} tarefa(s) suspeita(s)")
+        self.suspeitos = suspeitos
+
+
+def _encerrar_pool(pool: ProcessPoolExecutor) -> None:
+    # Python < 3.14 não tem `terminate_workers`; os processos ficam em `_processes`
+    encerrar = getattr(pool, "terminate_workers", None)
+    if encerrar is not None:
+        encerrar()
+        return
+    for processo in list((getattr(pool, "_processes", None) or {}).values()):
+        processo.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _rodada_pool(
+    funcao: Callable[..., Any],
+    tarefas: Sequence[tuple],
+    indices: List[int],
+    max_workers: Optional[int],
+    timeout: Optional[float],
+    concluir: Callable[[int, Any, Optional[BaseException]], None],
+) -> None:
+    """Roda `indices` num pool novo; volta antes do fim se alguma tarefa estourar o tempo.
+
+    Levanta `_PoolQuebrado` se um processo morrer; criar o pool pode levantar
+    `OSError` / `NotImplementedError` (plataforma sem processos).
+    """
+    pool = ProcessPoolExecutor(max_workers=max_workers)
+    esgotou = quebrou = False
+    futuros: Dict[Future, int] = {}
+    em_execucao: Set[int] = set()
+    try:
+        futuros = {pool.submit(funcao, *tarefas[i]): i for i in indices}
+        inicio: Dict[Future, float] = {}
+        abertos: Set[Future] = set(futuros)
+        while abertos and not esgotou:
+            prontos, abertos = wait(abertos, timeout=_INTERVALO_VERIFICACAO, return_when=FIRST_COMPLETED)
+            for fut in prontos:
+                try:
+                    valor = fut.result()
+                except BrokenProcessPool:
+                    quebrou = True
+                except Exception as exc:
+                    concluir(futuros[fut], None, exc)
+                else:
+                    concluir(futuros[fut], valor, None)
+            if quebrou:
+                break
+            agora = time.monotonic()
+            for fut in abertos:
+                if not fut.running():
+                    continue
+                em_execucao.add(futuros[fut])
+                if timeout is not None and agora - inicio.setdefault(fut, agora) > timeout:
+                    esgotou = True
+                    concluir(futuros[fut], None, TempoLeituraEsgotadoError(f"Leitura passou de {timeout:.0f}s"))
+    except BrokenProcessPool:
+        quebrou = True
+    finally:
+        if esgotou or quebrou:
+            _encerrar_pool(pool)
+        else:
+            pool.shutdown(wait=True)
+    if quebrou:
+        pendentes = [i for fut, i in futuros.items() if not fut.done() or fut.exception() is not None]
+        pendentes = [i for i in pendentes if i in set(indices)]
+        raise _PoolQuebrado(sorted(em_execucao & set(pendentes)) or sorted(pendentes) or list(indices))
+
+
+def _isolar(
+    funcao: Callable[..., Any],
+    tarefas: Sequence[tuple],
+    i: int,
+    timeout: Optional[float],
+    concluir: Callable[[int, Any, Optional[BaseException]], None],
+) -> None:
+    """Roda a tarefa `i` sozinha num pool de 1 processo; se ele morrer de novo, é erro dela."""
+    try:
+        _rodada_pool(funcao, tarefas, [i], 1, timeout, concluir)
+    except _PoolQuebrado:
+        concluir(i, None, ProcessoLeituraEncerradoError("O processo de leitura foi encerrado abruptamente"))
+
+
+def executar_em_paralelo(
+    funcao: Callable[..., Any],
+    tarefas: Sequence[tuple],
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = TIMEOUT_ARQUIVO,
+    ao_concluir: Optional[Callable[[int, Any, Optional[BaseException]], None]] = None,
+) -> List[Resultado]:
+    """`funcao(*tarefa)` para cada tarefa, em paralelo.
+
+    `funcao` precisa ser importável pelos processos do pool (função de módulo).
+    Devolve, na ordem das tarefas, `(valor, None)` ou `(None, erro)`.
+    `ao_concluir(i, valor, erro)` é chamado no processo principal a cada tarefa
+    terminada. `max_workers=None` usa o número de CPUs (nunca mais que o
+    número de tarefas).
+    """
+    resultados: List[Optional[Resultado]] = [None] * len(tarefas)
+
+    def _concluir(i: int, valor: Any, erro: Optional[BaseException]) -> None:
+        if resultados[i] is not None:
+            return
+        resultados[i] = (valor, erro)
+        if ao_concluir:
+            ao_concluir(i, valor, erro)
+
+    def _pendentes() -> List[int]:
+        return [i for i, r in enumerate(resultados) if r is None]
+
+    if tarefas:
+        try:
+            while _pendentes():
+                try:
+                    pendentes = _pendentes()
+                    workers = min(max_workers or os.cpu_count() or 1, len(pendentes))
+                    _rodada_pool(funcao, tarefas, pendentes, workers, timeout, _concluir)
+                except _PoolQuebrado as quebra:
+                    print(f"Processo de leitura encerrado; isolando {len(quebra.suspeitos)} arquivo(s) suspeito(s)")
+                    for i in quebra.suspeitos:
+                        _isolar(funcao, tarefas, i, timeout, _concluir)
+        except (OSError, NotImplementedError) as exc:
+            print(f"Pool de processos indisponível ({exc}); lendo o restante em sequência")
+
+    for i in _pendentes():
+        try:
+            _concluir(i, funcao(*tarefas[i]), None)
+        except Exception as exc:
+            _concluir(i, None, exc)
+    return resultados
@@ -0,0 +1,137 @@
+"""Manifesto de ingestão: o que já foi importado, por conteúdo de arquivo.
+
+Cada arquivo importado é registrado pelo SHA-256 do conteúdo com o usuário e o
+mês/ano atribuídos, a versão do parser que o leu, as linhas geradas por
+dataset e as partições gravadas. Reimportar uma pasta pula os arquivos cujo
+conteúdo e versão de parser não mudaram (inclusive cópias "(1)", "(2)" do
+mesmo relatório), desde que as partições gravadas ainda existam e ainda sejam
+dele: registrar um arquivo que regrava uma partição invalida os registros dos
+outros arquivos que tinham gravado aquela partição.
+
+O manifesto é um JSON em `MANIFESTO_PATH` (sha256 -> lista de importações).
+Quem registra importações relê e grava o manifesto sob
+`trava_dataset(MANIFESTO_PATH)`, para lotes simultâneos não apagarem os
+registros um do outro.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from modules.armazenamento import gravar_texto_atomico
+from modules.base_particionada import particao_existe
+
+MANIFESTO_PATH = "data/manifesto_ingestao.json"
+
+_TAMANHO_BLOCO_HASH = 1024 * 1024
+
+
+def hash_arquivo(caminho: str) -> str:
+    """SHA-256 (hex) do conteúdo do arquivo."""
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(_TAMANHO_BLOCO_HASH), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def carregar_manifesto(path: str = MANIFESTO_PATH) -> Dict[str, List[dict]]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        return dados if isinstance(dados, dict) else {}
+    except Exception as e:
+        print(f"Erro ao ler manifesto de ingestão {path}: {e}")
+        return {}
+
+
+def salvar_manifesto(manifesto: Dict[str, List[dict]], path: str = MANIFESTO_PATH) -> None:
+    gravar_texto_atomico(json.dumps(manifesto, ensure_ascii=False, indent=2), path)
+
+
+def _mesma_importacao(reg: dict, versao_parser: str, usuario: Optional[str], mes_ano: Optional[str]) -> bool:
+    return (
+        reg.get("versao_parser") == versao_parser
+        and reg.get("usuario") == usuario
+        and reg.get("mes_ano") == mes_ano
+    )
+
+
+def arquivo_inalterado(
+    manifesto: Dict[str, List[dict]],
+    sha256: str,
+    versao_parser: str,
+    usuario: Optional[str],
+    mes_ano: Optional[str],
+) -> bool:
+    """True se este conteúdo já foi importado para o mesmo usuário/mês pela mesma
+    versão de parser e as partições que ele gerou continuam no disco."""
+    for reg in manifesto.get(sha256, []):
+        if _mesma_importacao(reg, versao_parser, usuario, mes_ano):
+            return all(particao_existe(p) for p in reg.get("particoes", []))
+    return False
+
+
+def _invalidar_sobrescritos(manifesto: Dict[str, List[dict]], particoes: List[str], manter: set) -> None:
+    novas = set(particoes)
+    if not novas:
+        return
+    for sha in list(manifesto):
+        if sha in manter:
+            continue
+        registros = [reg for reg in manifesto[sha] if novas.isdisjoint(reg.get("particoes", []))]
+        if registros:
+            manifesto[sha] = registros
+        else:
+            del manifesto[sha]
+
+
+def registrar_ingestao(
+    manifesto: Dict[str, List[dict]],
+    sha256: str,
+    arquivo: str,
+    versao_parser: str,
+    usuario: Optional[str],
+    mes_ano: Optional[str],
+    linhas: Dict[str, int],
+    particoes: List[str],
+    parsers: Optional[Dict[str, dict]] = None,
+    coautores: Iterable[str] = (),
+    substituido_por: Optional[str] = None,
+) -> None:
+    """Registra (ou substitui) a importação de `sha256` para este usuário/mês.
+
+    Os registros de outros arquivos que gravaram alguma das `particoes` saem
+    do manifesto (o conteúdo deles foi substituído), menos os de `coautores`:
+    arquivos do mesmo lote cujas linhas foram gravadas junto na partição.
+    `substituido_por` marca um arquivo lido cujo conteúdo perdeu, no mesmo
+    lote, para o do arquivo com esse sha256: não é dono de partição nenhuma e
+    continua contando como inalterado.
+    `parsers` (PDFs) guarda, por seção, qual parser leu o arquivo e em quanto tempo.
+    """
+    _invalidar_sobrescritos(manifesto, particoes, {sha256, *coautores})
+    registros = [
+        reg for reg in manifesto.get(sha256, [])
+        if not (reg.get("usuario") == usuario and reg.get("mes_ano") == mes_ano)
+    ]
+    registro = {
+        "arquivo": str(arquivo),
+        "versao_parser": versao_parser,
+        "usuario": usuario,
+        "mes_ano": mes_ano,
+        "linhas": {k: int(v) for k, v in linhas.items()},
+        "particoes": sorted(particoes),
+        "importado_em": datetime.now().isoformat(timespec="seconds"),
+    }
+    if substituido_por:
+        registro["substituido_por"] = substituido_por
+    if parsers:
+        registro["parsers"] = {secao: dict(info) for secao, info in parsers.items()}
+    registros.append(registro)
+    manifesto[sha256] = registros
@@ -0,0 +1,64 @@
+"""Tempo gasto por etapa da ingestão de relatórios.
+
+Etapas:
+- `leitura`: tirar o conteúdo do arquivo (células do Excel, texto das páginas do PDF);
+- `parse`: transformar esse conteúdo em linhas/tabelas;
+- `padronizacao`: colunas, valores e filtros no formato das bases;
+- `gravacao`: gravar as bases (e o manifesto).
+
+Os blocos marcados com `etapa(nome)` somam tempo na etapa, por thread; um
+bloco dentro de outro desconta o seu tempo do bloco de fora, então as etapas
+somam o tempo total sem contar nada duas vezes. `coletar_tempos()` devolve e
+zera o acumulado (os processos do pool devolvem os seus junto com o resultado).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+ETAPAS = ("leitura", "parse", "padronizacao", "gravacao")
+
+_local = threading.local()
+
+
+def _estado():
+    if not hasattr(_local, "tempos"):
+        _local.tempos = {}
+        _local.pilha = []
+    return _local.tempos, _local.pilha
+
+
+@contextmanager
+def etapa(nome: str) -> Iterator[None]:
+    """Conta o tempo do bloco (exclusivo: sem os blocos aninhados) na etapa `nome`."""
+    tempos, pilha = _estado()
+    agora = time.perf_counter()
+    if pilha:
+        externo = pilha[-1]
+        tempos[externo[0]] = tempos.get(externo[0], 0.0) + agora - externo[1]
+    pilha.append([nome, agora])
+    try:
+        yield
+    finally:
+        agora = time.perf_counter()
+        _nome, inicio = pilha.pop()
+        tempos[nome] = tempos.get(nome, 0.0) + agora - inicio
+        if pilha:
+            pilha[-1][1] = agora
+
+
+def coletar_tempos() -> Dict[str, float]:
+    """Tempos acumulados nesta thread desde a última coleta (e zera o acumulado)."""
+    tempos, _pilha = _estado()
+    saida = dict(tempos)
+    tempos.clear()
+    return saida
+
+
+def somar_tempos(destino: Dict[str, float], origem: Dict[str, float]) -> Dict[str, float]:
+    for nome, segundos in origem.items():
+        destino[nome] = destino.get(nome, 0.0) + segundos
+    return destino
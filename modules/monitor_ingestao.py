@@ -0,0 +1,300 @@
+"""Monitor de pastas: importa relatórios novos sem passar pela interface.
+
+Observa `uploads/`, `uploads/pdf_avenue` e `Relatorios/` (com `watchdog`).
+Criações, alterações e movimentações de .xlsx/.pdf entram numa fila; quando um
+arquivo passa `DEBOUNCE_SEGUNDOS` sem eventos novos e com o tamanho estável
+(cópias grandes disparam vários eventos), os arquivos prontos seguem juntos
+para `processar_lote`: leitura em pool de processos, uma gravação por base e
+manifesto de ingestão para pular o que não mudou.
+
+Se um lote falha inteiro (base travada por outro lote, erro de disco...), o
+erro é impresso e os arquivos voltam para a fila, com nova tentativa depois de
+`ESPERA_NOVA_TENTATIVA` segundos, até `TENTATIVAS_LOTE` vezes; o monitor
+continua rodando.
+
+Cada base termina a gravação publicando o marcador de `base_particionada`, e é
+por ele que o dashboard percebe a atualização: nunca recarrega no meio de um lote.
+
+O usuário vem da subpasta (`Relatorios/<usuário>/...`,
+`Relatorios/Avenue/<usuário>/...`) quando ela é um usuário cadastrado, senão do
+nome do arquivo; o mês/ano vem do nome do arquivo, como no upload unificado.
+
+Uso (na raiz do repositório):
+    python -m modules.monitor_ingestao [--debounce 5] [--workers N] [--sem-varredura-inicial]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from modules.upload_ingest import (
+    MAX_WORKERS_LOTE,
+    ItemLote,
+    inferir_mes_ano,
+    inferir_usuario_do_nome,
+    processar_lote,
+)
+from modules.upload_pdf_avenue import PDF_UPLOADS_DIR
+from modules.upload_relatorio import UPLOADS_DIR
+from modules.usuarios import carregar_usuarios
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover
+    FileSystemEventHandler = object
+    Observer = None
+
+
+PASTAS_MONITORADAS = [UPLOADS_DIR, PDF_UPLOADS_DIR, "Relatorios"]
+
+# Segundos sem eventos (e com tamanho estável) para considerar um arquivo pronto
+DEBOUNCE_SEGUNDOS = 5.0
+# Intervalo entre verificações da fila
+INTERVALO_VERIFICACAO = 1.0
+# Lote que falhou: quantas vezes um arquivo é tentado e quanto esperar entre as tentativas
+TENTATIVAS_LOTE = 3
+ESPERA_NOVA_TENTATIVA = 30.0
+
+EXTENSOES_TIPO = {".xlsx": "excel", ".pdf": "pdf"}
+
+
+def _repo_root() -> Path:
+    return Path(__file__).resolve().parents[1]
+
+
+def tipo_arquivo(caminho: str) -> Optional[str]:
+    """'excel' | 'pdf' para relatórios; None para o resto (inclui temporários do Office)."""
+    nome = os.path.basename(caminho)
+    if nome.startswith("~$") or nome.startswith("."):
+        return None
+    return EXTENSOES_TIPO.get(os.path.splitext(nome)[1].lower())
+
+
+def _pastas_raiz(pastas: Iterable[str]) -> List[Path]:
+    """Pastas a observar (recursivamente), sem as que já estão dentro de outra."""
+    resolvidas = sorted({Path(p).resolve() for p in pastas}, key=lambda p: len(p.parts))
+    raizes: List[Path] = []
+    for pasta in resolvidas:
+        if not any(pasta == r or r in pasta.parents for r in raizes):
+            raizes.append(pasta)
+    return raizes
+
+
+def item_do_arquivo(
+    caminho: str, usuarios_cadastrados: Iterable[str], usuario: Optional[str] = None
+) -> Tuple[Optional[ItemLote], Optional[str]]:
+    """Monta o `ItemLote` do arquivo, ou (None, motivo) se não dá para importar.
+
+    `usuario`, se informado, vale para o arquivo em vez da subpasta/nome.
+    """
+    tipo = tipo_arquivo(caminho)
+    if tipo is None:
+        return None, "tipo de arquivo não suportado"
+    nome = os.path.basename(caminho)
+    if not usuario:
+        subpasta = os.path.basename(os.path.dirname(caminho))
+        usuario = subpasta if subpasta in set(usuarios_cadastrados) else inferir_usuario_do_nome(nome)
+    if not usuario:
+        return None, "usuário não identificado pela subpasta nem pelo nome"
+    mes_ano = inferir_mes_ano(nome)
+    if tipo == "excel" and not mes_ano:
+        return None, "mês/ano (MM/AAAA) não encontrado no nome"
+    return ItemLote(caminho=str(caminho), tipo=tipo, usuario=usuario, mes_ano=mes_ano), None
+
+
+class FilaDebounce:
+    """Arquivos com eventos recentes; libera os que ficaram quietos e estáveis."""
+
+    def __init__(self, debounce: float = DEBOUNCE_SEGUNDOS):
+        self.debounce = debounce
+        self._pendentes: Dict[str, Tuple[float, Optional[int]]] = {}
+        self._trava = threading.Lock()
+
+    def registrar(self, caminho: str, agora: Optional[float] = None) -> None:
+        if tipo_arquivo(caminho) is None:
+            return
+        agora = time.monotonic() if agora is None else agora
+        try:
+            tamanho: Optional[int] = os.path.getsize(caminho)
+        except OSError:
+            tamanho = None
+        with self._trava:
+            self._pendentes[caminho] = (agora, tamanho)
+
+    def prontos(self, agora: Optional[float] = None) -> List[str]:
+        """Remove e devolve os arquivos sem eventos há `debounce` segundos e com o
+        mesmo tamanho do último evento (arquivos sumidos são descartados)."""
+        agora = time.monotonic() if agora is None else agora
+        saida: List[str] = []
+        with self._trava:
+            for caminho, (ultimo_evento, tamanho_anterior) in list(self._pendentes.items()):
+                if agora - ultimo_evento < self.debounce:
+                    continue
+                try:
+                    tamanho = os.path.getsize(caminho)
+                except OSError:
+                    del self._pendentes[caminho]
+                    continue
+                if tamanho != tamanho_anterior:
+                    # Ainda sendo copiado: espera mais um intervalo de debounce
+                    self._pendentes[caminho] = (agora, tamanho)
+                    continue
+                del self._pendentes[caminho]
+                saida.append(caminho)
+        return sorted(saida)
+
+    def __len__(self) -> int:
+        with self._trava:
+            return len(self._pendentes)
+
+
+class _ManipuladorEventos(FileSystemEventHandler):
+    def __init__(self, fila: FilaDebounce):
+        super().__init__()
+        self.fila = fila
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.fila.registrar(os.fsdecode(event.src_path))
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.fila.registrar(os.fsdecode(event.src_path))
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.fila.registrar(os.fsdecode(event.dest_path))
+
+
+def varrer_pastas(pastas: Iterable[str]) -> List[str]:
+    """Relatórios já presentes nas pastas (para a importação inicial)."""
+    arquivos: List[str] = []
+    for pasta in _pastas_raiz(pastas):
+        for raiz, _dirs, files in os.walk(pasta):
+            arquivos.extend(os.path.join(raiz, f) for f in files if tipo_arquivo(f))
+    return sorted(arquivos)
+
+
+def processar_arquivos(caminhos: Iterable[str], max_workers: Optional[int] = MAX_WORKERS_LOTE) -> List[ItemLote]:
+    """Importa os arquivos num único lote e imprime o resumo."""
+    df_usuarios = carregar_usuarios()
+    cadastrados = df_usuarios["Nome"].dropna().astype(str).tolist() if "Nome" in df_usuarios.columns else []
+
+    itens: List[ItemLote] = []
+    for caminho in caminhos:
+        item, motivo = item_do_arquivo(caminho, cadastrados)
+        if item is None:
+            print(f"Ignorado {caminho}: {motivo}")
+            continue
+        itens.append(item)
+    if not itens:
+        return itens
+
+    inicio = time.perf_counter()
+    processar_lote(itens, max_workers=max_workers)
+    importados = 0
+    for item in itens:
+        if item.erro:
+            print(f"Falha ao processar {item.caminho}: {item.erro}")
+        elif item.ignorado:
+            print(f"Sem mudança ({item.ignorado}): {item.caminho}")
+        else:
+            importados += 1
+            print(f"Importado {item.caminho} ({item.usuario}, {item.mes_ano or 'mês do PDF'}): {item.linhas}")
+    print(f"Lote de {len(itens)} arquivo(s) concluído em {time.perf_counter() - inicio:.1f}s; {importados} importado(s)")
+    return itens
+
+
+def _processar_com_nova_tentativa(
+    caminhos: List[str],
+    fila: "FilaDebounce",
+    falhas: Dict[str, int],
+    max_workers: Optional[int],
+) -> None:
+    """`processar_arquivos` sem derrubar o monitor: se o lote falhar, os
+    arquivos voltam para a fila (até `TENTATIVAS_LOTE` tentativas)."""
+    try:
+        processar_arquivos(caminhos, max_workers=max_workers)
+    except Exception as e:
+        print(f"Erro ao importar lote de {len(caminhos)} arquivo(s): {type(e).__name__}: {e}")
+        # Registrado "no futuro" para só ficar pronto depois da espera
+        volta = time.monotonic() + max(0.0, ESPERA_NOVA_TENTATIVA - fila.debounce)
+        for caminho in caminhos:
+            falhas[caminho] = falhas.get(caminho, 0) + 1
+            if falhas[caminho] >= TENTATIVAS_LOTE:
+                print(f"Desistindo de {caminho} após {falhas[caminho]} tentativa(s)")
+                del falhas[caminho]
+                continue
+            fila.registrar(caminho, agora=volta)
+    else:
+        for caminho in caminhos:
+            falhas.pop(caminho, None)
+
+
+def monitorar(
+    pastas: Iterable[str] = PASTAS_MONITORADAS,
+    debounce: float = DEBOUNCE_SEGUNDOS,
+    max_workers: Optional[int] = MAX_WORKERS_LOTE,
+    varredura_inicial: bool = True,
+    parar: Optional[threading.Event] = None,
+) -> None:
+    """Observa as pastas até `parar` ser acionado (ou Ctrl+C)."""
+    if Observer is None:
+        raise ImportError("watchdog não está instalado. Execute: pip install watchdog")
+
+    pastas = list(pastas)
+    for pasta in pastas:
+        os.makedirs(pasta, exist_ok=True)
+    parar = parar or threading.Event()
+    fila = FilaDebounce(debounce)
+
+    observador = Observer()
+    manipulador = _ManipuladorEventos(fila)
+    for pasta in _pastas_raiz(pastas):
+        observador.schedule(manipulador, str(pasta), recursive=True)
+    observador.start()
+    print(f"Monitorando: {', '.join(str(p) for p in _pastas_raiz(pastas))}")
+
+    falhas: Dict[str, int] = {}
+    try:
+        if varredura_inicial:
+            try:
+                arquivos = varrer_pastas(pastas)
+            except Exception as e:
+                print(f"Erro na varredura inicial: {type(e).__name__}: {e}")
+                arquivos = []
+            if arquivos:
+                _processar_com_nova_tentativa(arquivos, fila, falhas, max_workers)
+        while not parar.wait(INTERVALO_VERIFICACAO):
+            prontos = fila.prontos()
+            if prontos:
+                _processar_com_nova_tentativa(prontos, fila, falhas, max_workers)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observador.stop()
+        observador.join()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Importa automaticamente relatórios novos nas pastas monitoradas.")
+    parser.add_argument("pastas", nargs="*", help=f"Pastas a observar (padrão: {', '.join(PASTAS_MONITORADAS)})")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SEGUNDOS, help="Segundos de quietude antes de importar")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS_LOTE, help="Processos de leitura (padrão: nº de CPUs)")
+    parser.add_argument("--sem-varredura-inicial", action="store_true", help="Não importar o que já está nas pastas")
+    args = parser.parse_args(argv)
+
+    # As bases (data/...) são caminhos relativos à raiz do repositório
+    pastas = [os.path.abspath(p) for p in args.pastas] or PASTAS_MONITORADAS
+    os.chdir(_repo_root())
+    monitorar(pastas, debounce=args.debounce, max_workers=args.workers, varredura_inicial=not args.sem_varredura_inicial)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,47 @@ Módulo para gerenciar opções (calls e puts) e vendas cobertas
 Inclui consulta de opções disponíveis, registro de vendas e controle de dividendos sintéticos
 """
 
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
-import yfinance as yf
+
+from modules.armazenamento import gravar_parquet_atomico, trava_dataset
+from modules.gregas import (
+    COLUNAS_GREGAS,
+    TAXA_LIVRE_RISCO_BRL,
+    TAXA_LIVRE_RISCO_USD,
+    adicionar_gregas,
+    calcular_gregas,
+    prazo_em_anos,
+    volatilidade_implicita,
+)
+from modules.precos_historicos import obter_historico
+from modules.provedor_mercado import obter_provedor
 
 # Caminho para armazenamento de dados
 PASTA_DADOS = Path("data")
 PASTA_DADOS.mkdir(exist_ok=True)
 ARQ_VENDAS_OPCOES = PASTA_DADOS / "vendas_opcoes.parquet"
 
+# Cadeias de opções (yfinance): vencimentos buscados em paralelo e mantidos em memória
+MAX_WORKERS_CADEIAS = 8
+TTL_CADEIAS = timedelta(minutes=5)
+_cache_cadeias: dict[str, tuple[datetime, tuple[float, pd.DataFrame, pd.DataFrame]]] = {}
+_lock_cadeias = threading.Lock()
+
+# Colunas da cadeia yfinance -> colunas da consulta
+_COLUNAS_CADEIA = {
+    "lastPrice": "Last Price",
+    "bid": "Bid",
+    "ask": "Ask",
+    "volume": "Volume",
+    "openInterest": "Open Interest",
+    "impliedVolatility": "Implied Volatility",
+}
+
 
 def _ticker_para_yf(ticker: str) -> str | None:
     if ticker is None:
@@ -52,6 +82,60 @@ def _mes_ano(dt) -> str | None:
         return None
 
 
+def _baixar_cadeias(ticker_yf: str) -> tuple[float, pd.DataFrame, pd.DataFrame] | None:
+    """(preço atual, calls, puts) de todos os vencimentos, com coluna `_vencimento`.
+
+    Os vencimentos são buscados em paralelo e cada `option_chain` guarda os dois
+    lados, então consultar puts depois de calls não refaz a busca.
+    """
+    prov = obter_provedor()
+    hist = prov.historico(ticker_yf, period="5d")
+    if hist is None or hist.empty or "Close" not in hist.columns:
+        return None
+    close = pd.to_numeric(hist["Close"], errors="coerce").dropna()
+    if close.empty:
+        return None
+    preco_atual = float(close.iloc[-1])
+
+    # Obter datas de vencimento disponíveis
+    datas_vencimento = list(prov.atributo(ticker_yf, "options") or [])
+    if not datas_vencimento:
+        return None
+
+    def _cadeia(data_venc: str):
+        calls, puts = prov.option_chain(ticker_yf, data_venc)
+        return calls.assign(_vencimento=data_venc), puts.assign(_vencimento=data_venc)
+
+    calls_lista, puts_lista = [], []
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS_CADEIAS, len(datas_vencimento))) as ex:
+        futuros = {ex.submit(_cadeia, d): d for d in datas_vencimento}
+        for fut in as_completed(futuros):
+            try:
+                calls, puts = fut.result()
+            except Exception as e:
+                print(f"Erro ao processar vencimento {futuros[fut]}: {e}")
+                continue
+            calls_lista.append(calls)
+            puts_lista.append(puts)
+
+    if not calls_lista:
+        return None
+    return preco_atual, pd.concat(calls_lista, ignore_index=True), pd.concat(puts_lista, ignore_index=True)
+
+
+def _cadeias_cached(ticker_yf: str) -> tuple[float, pd.DataFrame, pd.DataFrame] | None:
+    agora = datetime.now()
+    with _lock_cadeias:
+        item = _cache_cadeias.get(ticker_yf)
+        if item is not None and agora - item[0] < TTL_CADEIAS:
+            return item[1]
+    cadeias = _baixar_cadeias(ticker_yf)
+    if cadeias is not None:
+        with _lock_cadeias:
+            _cache_cadeias[ticker_yf] = (agora, cadeias)
+    return cadeias
+
+
 def consultar_opcoes_disponiveis(ticker: str, tipo: str = "call") -> pd.DataFrame:
     """
     Consulta opções disponíveis para um ticker via yfinance
@@ -69,75 +153,47 @@ def consultar_opcoes_disponiveis(ticker: str, tipo: str = "call") -> pd.DataFram
         if not ticker_yf:
             return pd.DataFrame()
 
-        # Obter dados da ação
-        acao = yf.Ticker(ticker_yf)
-        hist = acao.history(period="5d")
-        if hist is None or hist.empty or "Close" not in hist.columns:
-            return pd.DataFrame()
-        close = pd.to_numeric(hist["Close"], errors="coerce").dropna()
-        if close.empty:
+        cadeias = _cadeias_cached(ticker_yf)
+        if cadeias is None:
             return pd.DataFrame()
-        preco_atual = float(close.iloc[-1])
-        
-        # Obter datas de vencimento disponíveis
-        datas_vencimento = acao.options
-        
-        if not datas_vencimento:
+        preco_atual, calls, puts = cadeias
+
+        # Selecionar calls ou puts
+        opcoes_df = calls if tipo.lower() == "call" else puts
+        if "strike" not in opcoes_df.columns:
             return pd.DataFrame()
-        
-        # Coletar todas as opções
-        opcoes_lista = []
-        
-        for data_venc in datas_vencimento:
-            try:
-                # Obter cadeia de opções para esta data
-                cadeia = acao.option_chain(data_venc)
-                
-                # Selecionar calls ou puts
-                if tipo.lower() == "call":
-                    opcoes_df = cadeia.calls
-                else:
-                    opcoes_df = cadeia.puts
-                
-                # Extrair informações relevantes
-                venc_dt = pd.to_datetime(data_venc, errors="coerce")
-                mes_venc = _mes_ano(venc_dt)
-
-                for _, row in opcoes_df.iterrows():
-                    strike = row.get("strike", 0)
-                    if strike == 0:
-                        continue
-                    
-                    # Calcular distância percentual do strike
-                    distancia_pct = ((strike - preco_atual) / preco_atual) * 100
-                    
-                    opcoes_lista.append({
-                        "Ticker": _ticker_curto(ticker_informado) or ticker_informado,
-                        "Ticker YF": ticker_yf,
-                        "Tipo": tipo.capitalize(),
-                        "Strike": strike,
-                        "Vencimento": venc_dt,
-                        "Mês Vencimento": mes_venc,
-                        "Preço Atual Ação": preco_atual,
-                        "Distância %": distancia_pct,
-                        "Last Price": row.get("lastPrice", 0),
-                        "Bid": row.get("bid", 0),
-                        "Ask": row.get("ask", 0),
-                        "Volume": row.get("volume", 0),
-                        "Open Interest": row.get("openInterest", 0),
-                        "Implied Volatility": row.get("impliedVolatility", 0),
-                    })
-            except Exception as e:
-                print(f"Erro ao processar vencimento {data_venc}: {e}")
-                continue
-        
-        if not opcoes_lista:
+        opcoes_df = opcoes_df[opcoes_df["strike"] != 0]
+        if opcoes_df.empty:
             return pd.DataFrame()
-        
-        df_opcoes = pd.DataFrame(opcoes_lista)
-        
+
+        strike = opcoes_df["strike"]
+        venc_dt = pd.to_datetime(opcoes_df["_vencimento"], errors="coerce")
+        df_opcoes = pd.DataFrame({
+            "Ticker": _ticker_curto(ticker_informado) or ticker_informado,
+            "Ticker YF": ticker_yf,
+            "Tipo": tipo.capitalize(),
+            "Strike": strike,
+            "Vencimento": venc_dt,
+            "Mês Vencimento": venc_dt.dt.strftime("%m/%Y"),
+            "Preço Atual Ação": preco_atual,
+            # Distância percentual do strike
+            "Distância %": (strike - preco_atual) / preco_atual * 100,
+        })
+        for origem, destino in _COLUNAS_CADEIA.items():
+            df_opcoes[destino] = opcoes_df[origem] if origem in opcoes_df.columns else 0
+
+        # Vol. implícita e gregas: prêmio de referência é o meio do book (ou o último negócio)
+        bid = pd.to_numeric(df_opcoes["Bid"], errors="coerce")
+        ask = pd.to_numeric(df_opcoes["Ask"], errors="coerce")
+        meio = ((bid + ask) / 2).where((bid > 0) & (ask > 0))
+        df_opcoes["_premio_ref"] = meio.fillna(pd.to_numeric(df_opcoes["Last Price"], errors="coerce"))
+        taxa = TAXA_LIVRE_RISCO_BRL if ticker_yf.endswith(".SA") else TAXA_LIVRE_RISCO_USD
+        df_opcoes = adicionar_gregas(
+            df_opcoes, preco_atual, "Strike", "Vencimento", "_premio_ref", "Tipo", taxa=taxa
+        ).drop(columns=["_premio_ref"])
+
         # Ordenar por vencimento e strike
-        df_opcoes = df_opcoes.sort_values(["Vencimento", "Strike"])
+        df_opcoes = df_opcoes.sort_values(["Vencimento", "Strike"]).reset_index(drop=True)
         
         return df_opcoes
         
@@ -206,6 +262,86 @@ def carregar_vendas_opcoes() -> pd.DataFrame:
         ])
 
 
+def _precos_na_operacao(df_a: pd.DataFrame, s_atual: np.ndarray) -> np.ndarray:
+    """Fechamento (não ajustado) do ativo no pregão da `Data Operação` ou no
+    anterior, pela base local de preços; sem histórico, fica o preço atual."""
+    s = s_atual.copy()
+    syms = df_a["Ticker YF"].astype(str).to_numpy()
+    datas = pd.DatetimeIndex(pd.to_datetime(df_a["Data Operação"], errors="coerce"))
+    for sym in set(syms):
+        if not sym or sym in ("None", "nan"):
+            continue
+        try:
+            hist = obter_historico(sym, periodo="max", ajustado=False)
+        except Exception as e:
+            print(f"Erro ao buscar histórico de {sym} para a vol. implícita: {e}")
+            continue
+        if hist.empty:
+            continue
+        close = hist.set_index("Date")["Close"].dropna().sort_index()
+        if close.index.tz is not None:
+            close.index = close.index.tz_localize(None)
+        mask = syms == sym
+        na_data = close.asof(datas[mask]).to_numpy(dtype=float, copy=True)
+        na_data[datas[mask].isna()] = np.nan
+        s[mask] = np.where(np.isfinite(na_data) & (na_data > 0), na_data, s[mask])
+    return s
+
+
+def calcular_gregas_vendas(df_vendas: pd.DataFrame, precos_ativos: dict, data_ref: datetime = None) -> pd.DataFrame:
+    """
+    Adiciona vol. implícita e gregas atuais às vendas com status 'Ativa'
+    
+    A vol. implícita é a do preço de venda: prazo da data da operação até o
+    vencimento e preço do ativo no fechamento daquele dia (base local de
+    `precos_historicos`; sem histórico, o preço atual). Delta, gama, theta,
+    vega e probabilidade de exercício usam essa vol. com o preço atual e o
+    prazo restante.
+    
+    Args:
+        df_vendas: DataFrame de `carregar_vendas_opcoes`
+        precos_ativos: {Ticker Base: preço atual do ativo}
+    
+    Returns:
+        Cópia de df_vendas com as colunas de COLUNAS_GREGAS (NaN para vendas não ativas)
+    """
+    out = df_vendas.copy()
+    for c in COLUNAS_GREGAS:
+        out[c] = np.nan
+    if out.empty:
+        return out
+
+    if "Status" not in out.columns:
+        return out
+    ativas = out["Status"].eq("Ativa").to_numpy()
+    if not ativas.any():
+        return out
+
+    df_a = out.loc[ativas]
+    s = pd.to_numeric(df_a["Ticker Base"].map(precos_ativos), errors="coerce").to_numpy(dtype=float)
+    k = pd.to_numeric(df_a["Strike"], errors="coerce").to_numpy(dtype=float)
+    premio = pd.to_numeric(df_a["Preço Venda"], errors="coerce").to_numpy(dtype=float)
+    is_call = df_a["Tipo"].astype(str).str.strip().str.upper().str.startswith("C").to_numpy()
+    taxa = np.where(df_a["Ticker YF"].astype(str).str.endswith(".SA"), TAXA_LIVRE_RISCO_BRL, TAXA_LIVRE_RISCO_USD)
+
+    venc = pd.to_datetime(df_a["Vencimento"], errors="coerce")
+    data_op = pd.to_datetime(df_a["Data Operação"], errors="coerce")
+    t_venda = ((venc - data_op).dt.days.clip(lower=0) / 365.0).to_numpy(dtype=float)
+    t_restante = prazo_em_anos(df_a["Vencimento"], data_ref)
+
+    s_venda = _precos_na_operacao(df_a, s)
+    sigma = volatilidade_implicita(premio, s_venda, k, t_venda, taxa, is_call)
+    gregas = calcular_gregas(s, k, t_restante, taxa, sigma, is_call)
+
+    out.loc[ativas, "Vol. Implícita (%)"] = sigma * 100.0
+    out.loc[ativas, "Delta"] = gregas["delta"]
+    out.loc[ativas, "Gama"] = gregas["gama"]
+    out.loc[ativas, "Theta (dia)"] = gregas["theta"]
+    out.loc[ativas, "Vega"] = gregas["vega"]
+    out.loc[ativas, "Prob. Exercício (%)"] = gregas["prob_exercicio"] * 100.0
+    return out
+
+
 def registrar_venda_opcao(
     usuario: str,
     ticker: str,
@@ -237,49 +373,50 @@ def registrar_venda_opcao(
         True se registrado com sucesso
     """
     try:
-        # Carregar vendas existentes
-        df_vendas = carregar_vendas_opcoes()
+        with trava_dataset(ARQ_VENDAS_OPCOES):
+            # Carregar vendas existentes
+            df_vendas = carregar_vendas_opcoes()
         
-        # Data da operação
-        if data_operacao is None:
-            data_operacao = datetime.now().strftime("%Y-%m-%d")
+            # Data da operação
+            if data_operacao is None:
+                data_operacao = datetime.now().strftime("%Y-%m-%d")
         
-        # Gerar ID único
-        if df_vendas.empty:
-            novo_id = 1
-        else:
-            novo_id = int(df_vendas["ID"].max()) + 1 if "ID" in df_vendas.columns else 1
+            # Gerar ID único
+            if df_vendas.empty:
+                novo_id = 1
+            else:
+                novo_id = int(df_vendas["ID"].max()) + 1 if "ID" in df_vendas.columns else 1
         
-        # Criar nova entrada
-        ticker_base = _ticker_curto(ticker) or str(ticker).strip()
-        ticker_yf = _ticker_para_yf(ticker_base)
-
-        nova_venda = pd.DataFrame([{
-            "ID": novo_id,
-            "Usuário": usuario,
-            "Ticker": ticker_base,
-            "Ticker Base": ticker_base,
-            "Ticker YF": ticker_yf,
-            "Tipo": tipo,
-            "Strike": float(strike),
-            "Vencimento": pd.to_datetime(vencimento),
-            "Quantidade": int(quantidade),
-            "Preço Venda": float(preco_venda),
-            "Prêmio Recebido": float(premio_recebido),
-            "Data Operação": pd.to_datetime(data_operacao),
-            "Status": "Ativa",
-            "Deletada Em": pd.NaT,
-            "Observações": observacoes
-        }])
+            # Criar nova entrada
+            ticker_base = _ticker_curto(ticker) or str(ticker).strip()
+            ticker_yf = _ticker_para_yf(ticker_base)
+
+            nova_venda = pd.DataFrame([{
+                "ID": novo_id,
+                "Usuário": usuario,
+                "Ticker": ticker_base,
+                "Ticker Base": ticker_base,
+                "Ticker YF": ticker_yf,
+                "Tipo": tipo,
+                "Strike": float(strike),
+                "Vencimento": pd.to_datetime(vencimento),
+                "Quantidade": int(quantidade),
+                "Preço Venda": float(preco_venda),
+                "Prêmio Recebido": float(premio_recebido),
+                "Data Operação": pd.to_datetime(data_operacao),
+                "Status": "Ativa",
+                "Deletada Em": pd.NaT,
+                "Observações": observacoes
+            }])
         
-        # Adicionar ao DataFrame
-        if df_vendas.empty:
-            df_vendas = nova_venda
-        else:
-            df_vendas = pd.concat([df_vendas, nova_venda], ignore_index=True)
+            # Adicionar ao DataFrame
+            if df_vendas.empty:
+                df_vendas = nova_venda
+            else:
+                df_vendas = pd.concat([df_vendas, nova_venda], ignore_index=True)
         
-        # Salvar
-        df_vendas.to_parquet(ARQ_VENDAS_OPCOES, index=False)
+            # Salvar
+            gravar_parquet_atomico(df_vendas, ARQ_VENDAS_OPCOES)
         
         return True
         
@@ -300,20 +437,21 @@ def atualizar_status_opcao(id_opcao: int, novo_status: str) -> bool:
         True se atualizado com sucesso
     """
     try:
-        df_vendas = carregar_vendas_opcoes()
+        with trava_dataset(ARQ_VENDAS_OPCOES):
+            df_vendas = carregar_vendas_opcoes()
         
-        if df_vendas.empty or id_opcao not in df_vendas["ID"].values:
-            return False
+            if df_vendas.empty or id_opcao not in df_vendas["ID"].values:
+                return False
         
-        # Atualizar status
-        df_vendas.loc[df_vendas["ID"] == id_opcao, "Status"] = novo_status
-        if novo_status == "Deletada":
-            if "Deletada Em" not in df_vendas.columns:
-                df_vendas["Deletada Em"] = pd.NaT
-            df_vendas.loc[df_vendas["ID"] == id_opcao, "Deletada Em"] = pd.Timestamp.now()
+            # Atualizar status
+            df_vendas.loc[df_vendas["ID"] == id_opcao, "Status"] = novo_status
+            if novo_status == "Deletada":
+                if "Deletada Em" not in df_vendas.columns:
+                    df_vendas["Deletada Em"] = pd.NaT
+                df_vendas.loc[df_vendas["ID"] == id_opcao, "Deletada Em"] = pd.Timestamp.now()
         
-        # Salvar
-        df_vendas.to_parquet(ARQ_VENDAS_OPCOES, index=False)
+            # Salvar
+            gravar_parquet_atomico(df_vendas, ARQ_VENDAS_OPCOES)
         
         return True
         
@@ -15,13 +15,22 @@ para que o script seja ajustado.
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+import os
+import re
 import unicodedata
+import uuid
 
 import pandas as pd
-import requests
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from modules.armazenamento import gravar_parquet_atomico, trava_dataset
+from modules.provedor_mercado import obter_provedor
 
 OPCOESNET_URL = "https://opcoes.net.br/opcoes/bovespa"
 OPCOESNET_JSON_URL = "https://opcoes.net.br/listaopcoes/completa"
@@ -30,6 +39,15 @@ PASTA_DADOS = Path("data")
 PASTA_DADOS.mkdir(exist_ok=True)
 ARQ_OPCOESNET = PASTA_DADOS / "opcoes_net_bovespa.parquet"
 
+# Histórico append-only das coletas (particionado por data de coleta e ativo base)
+PASTA_HISTORICO_OPCOESNET = PASTA_DADOS / "opcoes_net_historico"
+BALDE_COLETA_OPCOESNET = "15min"
+
+# Busca de vários vencimentos: requisições simultâneas, timeout de cada uma e prazo do conjunto (s)
+MAX_WORKERS_VENCIMENTOS = 4
+TIMEOUT_VENCIMENTO = 30
+PRAZO_TOTAL_VENCIMENTOS = 90
+
 
 class LayoutOpcoesNetMudouError(RuntimeError):
     """Lançado quando não foi possível encontrar/validar a tabela esperada."""
@@ -178,7 +196,7 @@ def _fetch_listaopcoes_completa(
     if vencimentos:
         params["vencimentos"] = ",".join([str(v).strip() for v in vencimentos if str(v).strip()])
 
-    resp = requests.get(
+    resp = obter_provedor().http_get(
         OPCOESNET_JSON_URL,
         params=params,
         headers=_headers_padrao(),
@@ -216,6 +234,56 @@ def listar_vencimentos_opcoesnet(id_acao: str, id_lista: str = "", timeout: int
     return vencs if isinstance(vencs, list) else []
 
 
+def _buscar_vencimentos_paralelo(
+    id_acao: str,
+    id_lista: str,
+    vencimentos: list[str],
+    montar_df,
+    max_workers: int = MAX_WORKERS_VENCIMENTOS,
+    timeout: int = TIMEOUT_VENCIMENTO,
+    prazo_total: float = PRAZO_TOTAL_VENCIMENTOS,
+) -> tuple[list[pd.DataFrame], dict[str, str]]:
+    """Baixa vários vencimentos em paralelo (pool limitado).
+
+    Cada requisição tem `timeout` próprio e o conjunto tem `prazo_total`; o que
+    não terminar a tempo ou falhar entra em `falhas` ({vencimento: erro}) e os
+    demais são devolvidos na ordem de `vencimentos`.
+    """
+    resultados: dict[str, pd.DataFrame] = {}
+    falhas: dict[str, str] = {}
+
+    def _um(venc_iso: str) -> pd.DataFrame:
+        data_v = _fetch_listaopcoes_completa(
+            id_acao=id_acao,
+            id_lista=id_lista,
+            listar_vencimentos=False,
+            vencimentos=[venc_iso],
+            cotacoes=True,
+            timeout=timeout,
+        )
+        return montar_df(data_v, venc_iso)
+
+    ex = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(vencimentos))))
+    futuros = {ex.submit(_um, v): v for v in vencimentos}
+    try:
+        for fut in as_completed(futuros, timeout=prazo_total):
+            venc_iso = futuros[fut]
+            try:
+                resultados[venc_iso] = fut.result()
+            except Exception as e:
+                falhas[venc_iso] = f"{type(e).__name__}: {e}"
+    except FuturesTimeoutError:
+        for fut, venc_iso in futuros.items():
+            if not fut.done() and venc_iso not in falhas:
+                falhas[venc_iso] = f"prazo de {prazo_total:.0f}s esgotado"
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+
+    if falhas:
+        print(f"Aviso opcoes.net: {len(falhas)} vencimento(s) de {id_acao} sem dados: {', '.join(falhas)}")
+    return [resultados[v] for v in vencimentos if v in resultados], falhas
+
+
 def buscar_opcoes_opcoesnet_bovespa(
     url: str = OPCOESNET_URL,
     obrigatorias: list[str] | None = None,
@@ -232,6 +300,10 @@ def buscar_opcoes_opcoesnet_bovespa(
         id_acao: ticker B3 do ativo base (ex: PETR4). Recomendado para evitar downloads enormes.
         id_lista: lista do site (default: '' = todas as opções, incluindo menos líquidas. Use 'ML' para apenas mais líquidas)
         todos_vencimentos: se True, busca todos os vencimentos disponíveis (pode ser pesado)
+        vencimentos: lista explícita de vencimentos ISO (tem precedência sobre `todos_vencimentos`)
+
+    Vários vencimentos são baixados em paralelo; se alguns falharem, o resultado é
+    parcial e `df.attrs["vencimentos_com_falha"]` traz {vencimento: erro}.
 
     Raises:
         LayoutOpcoesNetMudouError: se o endpoint/layout mudar.
@@ -280,11 +352,10 @@ def buscar_opcoes_opcoesnet_bovespa(
             df = pd.DataFrame(rows, columns=local_titles if local_titles else None)
 
         # Enriquecimento: vencimento vem do filtro (não é coluna no grid)
-        if vencimento_iso:
-            df["Vencimento"] = vencimento_iso
-        else:
-            df["Vencimento"] = None
+        df["Vencimento"] = vencimento_iso if vencimento_iso else None
+        return df
 
+    def _padronizar(df: pd.DataFrame) -> pd.DataFrame:
         # Renomeia para canônico
         rename = {
             "Ticker": "CODIGO",
@@ -315,7 +386,7 @@ def buscar_opcoes_opcoesnet_bovespa(
             df["ATIVO"] = df["ATIVO"].astype(str).str.upper().str.strip()
 
         if "VENCIMENTO" in df.columns:
-            df["Mês Vencimento"] = pd.to_datetime(df["VENCIMENTO"], errors="coerce").dt.strftime("%m/%Y")
+            df["Mês Vencimento"] = df["VENCIMENTO"].dt.strftime("%m/%Y")
 
         df["Fonte"] = "opcoes.net.br"
         df["Coletado Em"] = datetime.now()
@@ -325,40 +396,29 @@ def buscar_opcoes_opcoesnet_bovespa(
     selected = [v.get("value") for v in vencs if isinstance(v, dict) and v.get("selected")]
     selected_iso = selected[0] if selected else None
 
-    frames: list[pd.DataFrame] = []
-
-    # Se o usuário passou vencimentos explícitos, sempre respeita.
+    # Se o usuário passou vencimentos explícitos, sempre respeita; senão, todos (um por
+    # vencimento, para conseguir etiquetar corretamente) ou só o selecionado.
     if vencimentos:
-        for venc_iso in vencimentos:
-            venc_iso = str(venc_iso).strip()
-            if not venc_iso:
-                continue
-            data_v = _fetch_listaopcoes_completa(
-                id_acao=str(id_acao).strip().upper(),
-                id_lista=id_lista,
-                listar_vencimentos=False,
-                vencimentos=[venc_iso],
-                cotacoes=True,
-            )
-            frames.append(_df_from_data(data_v, venc_iso))
+        lista_vencs = [str(v).strip() for v in vencimentos if str(v).strip()]
     elif todos_vencimentos and vencs:
-        # Busca um por vencimento, para conseguir etiquetar corretamente
-        for v in vencs:
-            if not isinstance(v, dict) or not v.get("value"):
-                continue
-            venc_iso = str(v.get("value"))
-            data_v = _fetch_listaopcoes_completa(
-                id_acao=str(id_acao).strip().upper(),
-                id_lista=id_lista,
-                listar_vencimentos=False,
-                vencimentos=[venc_iso],
-                cotacoes=True,
+        lista_vencs = [str(v.get("value")) for v in vencs if isinstance(v, dict) and v.get("value")]
+    else:
+        lista_vencs = []
+
+    falhas: dict[str, str] = {}
+    if lista_vencs:
+        frames, falhas = _buscar_vencimentos_paralelo(
+            str(id_acao).strip().upper(), id_lista, list(dict.fromkeys(lista_vencs)), _df_from_data
+        )
+        if not frames and falhas:
+            raise LayoutOpcoesNetMudouError(
+                "Nenhum vencimento pôde ser baixado do opcoes.net.br: "
+                + "; ".join(f"{v}: {e}" for v, e in falhas.items())
             )
-            frames.append(_df_from_data(data_v, venc_iso))
     else:
-        frames.append(_df_from_data(data0, selected_iso))
+        frames = [_df_from_data(data0, selected_iso)]
 
-    df_out = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    df_out = _padronizar(pd.concat(frames, ignore_index=True)) if frames else pd.DataFrame()
 
     # Mapeamento tolerante (caso títulos mudem levemente)
     df_out, _ = _mapear_colunas(df_out)
@@ -367,6 +427,8 @@ def buscar_opcoes_opcoesnet_bovespa(
     if not check.ok:
         raise LayoutOpcoesNetMudouError(check.mensagem + (" Colunas encontradas: " + ", ".join(check.colunas_encontradas) if check.colunas_encontradas else ""))
 
+    # Resultado parcial: vencimentos que falharam ficam registrados para a UI avisar
+    df_out.attrs["vencimentos_com_falha"] = falhas
     return df_out
 
 
@@ -375,8 +437,148 @@ def salvar_cache_opcoesnet(df: pd.DataFrame, path: Path | None = None) -> None:
         path = ARQ_OPCOESNET
     if df is None or df.empty:
         return
-    path.parent.mkdir(exist_ok=True, parents=True)
-    df.to_parquet(path, index=False)
+    with trava_dataset(path):
+        gravar_parquet_atomico(df, path)
+
+
+def _particao_historico(pasta: Path, data_coleta: str, ativo: str) -> Path:
+    ativo_seguro = re.sub(r"[^A-Za-z0-9._-]", "_", ativo) or "_"
+    return pasta / f"data_coleta={data_coleta}" / f"ativo={ativo_seguro}"
+
+
+def _deduplicar_historico(df: pd.DataFrame) -> pd.DataFrame:
+    """Uma linha por (CODIGO, balde de coleta): fica a coleta mais recente do balde."""
+    if df.empty or "CODIGO" not in df.columns or "Coletado Em" not in df.columns:
+        return df
+    coletado = pd.to_datetime(df["Coletado Em"], errors="coerce")
+    df = df.assign(_coletado=coletado, _balde=coletado.dt.floor(BALDE_COLETA_OPCOESNET))
+    df = df.sort_values("_coletado", kind="stable").drop_duplicates(["CODIGO", "_balde"], keep="last")
+    return df.drop(columns=["_coletado", "_balde"]).reset_index(drop=True)
+
+
+def salvar_snapshot_opcoesnet(df: pd.DataFrame, ativo: str | None = None, pasta: Path | None = None) -> int:
+    """Acrescenta uma coleta ao histórico particionado (nunca sobrescreve).
+
+    Cada chamada grava um arquivo novo em
+    `<pasta>/data_coleta=AAAA-MM-DD/ativo=XXXX/part-*.parquet`. Coletas repetidas
+    do mesmo código no mesmo balde (`BALDE_COLETA_OPCOESNET`) são deduplicadas na
+    leitura e na compactação.
+
+    Returns:
+        Quantidade de linhas gravadas.
+    """
+    if df is None or df.empty or "Coletado Em" not in df.columns:
+        return 0
+    pasta = pasta or PASTA_HISTORICO_OPCOESNET
+
+    df = _deduplicar_historico(df)
+    coletado = pd.to_datetime(df["Coletado Em"], errors="coerce")
+    if "ATIVO" in df.columns:
+        ativos = df["ATIVO"].astype(str).str.upper().str.strip()
+        ativos = ativos.where(ativos.ne("") & ativos.ne("NAN") & ativos.ne("NONE"), (ativo or "").upper())
+    else:
+        ativos = pd.Series((ativo or "").upper(), index=df.index)
+    chaves = pd.DataFrame({"data_coleta": coletado.dt.strftime("%Y-%m-%d"), "ativo": ativos})
+
+    gravadas = 0
+    sufixo = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    for (data_coleta, ativo_part), idx in chaves.groupby(["data_coleta", "ativo"], dropna=True).groups.items():
+        destino = _particao_historico(pasta, data_coleta, ativo_part)
+        destino.mkdir(parents=True, exist_ok=True)
+        arq = destino / f"part-{sufixo}.parquet"
+        tmp = arq.with_suffix(".tmp")
+        df.loc[idx].to_parquet(tmp, index=False)
+        os.replace(tmp, arq)
+        gravadas += len(idx)
+    return gravadas
+
+
+def _arquivos_historico(
+    pasta: Path, inicio: datetime | None, fim: datetime | None, ativo: str | None
+) -> list[Path]:
+    """Poda de partições pelos nomes das pastas (data_coleta/ativo), sem abrir arquivos."""
+    d_ini = pd.Timestamp(inicio).strftime("%Y-%m-%d") if inicio is not None else None
+    d_fim = pd.Timestamp(fim).strftime("%Y-%m-%d") if fim is not None else None
+    ativo_part = _particao_historico(pasta, "x", ativo.upper()).name if ativo else None
+    arquivos: list[Path] = []
+    for pasta_data in sorted(pasta.glob("data_coleta=*")):
+        data = pasta_data.name.split("=", 1)[1]
+        if (d_ini and data < d_ini) or (d_fim and data > d_fim):
+            continue
+        for pasta_ativo in sorted(pasta_data.glob("ativo=*")):
+            if ativo_part and pasta_ativo.name != ativo_part:
+                continue
+            arquivos.extend(sorted(pasta_ativo.glob("part-*.parquet")))
+    return arquivos
+
+
+def carregar_historico_opcoesnet(
+    inicio: datetime | None = None,
+    fim: datetime | None = None,
+    ativo: str | None = None,
+    codigos: list[str] | None = None,
+    colunas: list[str] | None = None,
+    pasta: Path | None = None,
+) -> pd.DataFrame:
+    """Lê coletas do histórico no intervalo [inicio, fim] de `Coletado Em`.
+
+    Partições fora do intervalo/ativo nem são abertas; dentro delas, os filtros
+    de horário e de código são empurrados para o leitor Parquet (row groups e
+    colunas não usados não são lidos).
+    """
+    pasta = pasta or PASTA_HISTORICO_OPCOESNET
+    arquivos = _arquivos_historico(pasta, inicio, fim, ativo)
+    if not arquivos:
+        return pd.DataFrame()
+
+    schema = pa.unify_schemas([pq.read_schema(a) for a in arquivos], promote_options="permissive")
+    dataset = ds.dataset([str(a) for a in arquivos], schema=schema, format="parquet")
+
+    tipo_coleta = schema.field("Coletado Em").type
+    condicoes = []
+    if inicio is not None:
+        condicoes.append(ds.field("Coletado Em") >= pa.scalar(pd.Timestamp(inicio), type=tipo_coleta))
+    if fim is not None:
+        condicoes.append(ds.field("Coletado Em") <= pa.scalar(pd.Timestamp(fim), type=tipo_coleta))
+    if codigos:
+        condicoes.append(ds.field("CODIGO").isin([str(c).strip().upper() for c in codigos]))
+    filtro = None
+    for cond in condicoes:
+        filtro = cond if filtro is None else filtro & cond
+
+    if colunas:
+        colunas = list(dict.fromkeys([*colunas, "CODIGO", "Coletado Em"]))
+        colunas = [c for c in colunas if c in schema.names]
+    df = dataset.to_table(columns=colunas, filter=filtro).to_pandas()
+    return _deduplicar_historico(df).sort_values(["Coletado Em", "CODIGO"]).reset_index(drop=True)
+
+
+def compactar_historico_opcoesnet(pasta: Path | None = None) -> int:
+    """Junta os `part-*.parquet` de cada partição em um único arquivo deduplicado.
+
+    Returns:
+        Quantidade de partições compactadas.
+    """
+    pasta = pasta or PASTA_HISTORICO_OPCOESNET
+    compactadas = 0
+    for pasta_ativo in sorted(pasta.glob("data_coleta=*/ativo=*")):
+        partes = sorted(pasta_ativo.glob("part-*.parquet"))
+        if len(partes) < 2:
+            continue
+        try:
+            df = pd.concat([pd.read_parquet(p) for p in partes], ignore_index=True)
+        except Exception as e:
+            print(f"Erro ao compactar {pasta_ativo}: {e}")
+            continue
+        df = _deduplicar_historico(df)
+        arq = pasta_ativo / f"part-{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}-compactado.parquet"
+        tmp = arq.with_suffix(".tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, arq)
+        for p in partes:
+            p.unlink(missing_ok=True)
+        compactadas += 1
+    return compactadas
 
 
 def carregar_cache_opcoesnet(path: Path | None = None) -> pd.DataFrame:
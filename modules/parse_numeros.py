@@ -0,0 +1,211 @@
+"""Parse de números em formato misto pt-BR/US (relatórios, planilhas e PDFs).
+
+`parse_num_misto` é a versão escalar (referência) e `parse_num_misto_serie`
+faz exatamente o mesmo para uma Series inteira: converte cada texto distinto
+uma vez, com kernels de texto do Arrow e máscaras em vez de uma chamada
+Python por célula. Regras:
+
+- remove R$, US$, $, % e espaços (inclusive não separáveis);
+- "(123)" e "-123" são negativos; "+" inicial é ignorado;
+- com vírgula, "." é milhar e "," é decimal (1.234,56);
+- só com ponto: mais de um ponto, ou um ponto seguido de exatamente 3
+  dígitos (14.000), é milhar; caso contrário é decimal (1.5);
+- o que não vira número retorna NaN.
+
+`tools/verify_parse_numeros.py` confere a equivalência das duas versões.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Texto já normalizado que `float()` aceita (caminho rápido vetorizado)
+_RE_NUMERO_SIMPLES = r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?"
+
+_TIPOS_NUMERICOS = (int, float, np.integer, np.floating)
+
+# Abaixo disso o custo fixo dos kernels do Arrow (~1 ms) não compensa
+_MIN_TEXTOS_VETORIZADO = 500
+
+# Caracteres em que as regras vetorizadas (Arrow) e o escalar coincidem por
+# construção; o resto vai para o escalar.
+_RE_ALFABETO_SEGURO = "[0-9.,()+\\-$%RUSeE \u00a0]*"
+
+# R$, US$, $, % e espaços (inclusive não separáveis), numa passada só
+_RE_REMOVER = "R\\$|US\\$|[$% \u00a0]"
+
+# Um único ponto seguido de exatamente 3 dígitos: separador de milhar (14.000)
+_RE_MILHAR_UNICO = r"[0-9]+\.[0-9]{3}"
+
+
+def parse_num_misto(valor) -> float:
+    """Parse numérico tolerante a formatos pt-BR/US (milhar e decimal)."""
+    if pd.isna(valor):
+        return np.nan
+    if isinstance(valor, _TIPOS_NUMERICOS):
+        try:
+            return float(valor)
+        except Exception:
+            return np.nan
+
+    txt = str(valor).strip()
+    if not txt:
+        return np.nan
+
+    txt = (
+        txt.replace("R$", "")
+        .replace("US$", "")
+        .replace("$", "")
+        .replace("%", "")
+        .replace("\u00a0", " ")
+        .replace(" ", "")
+    )
+
+    negativo = False
+    if txt.startswith("(") and txt.endswith(")"):
+        negativo = True
+        txt = txt[1:-1]
+
+    if txt.startswith("+"):
+        txt = txt[1:]
+    elif txt.startswith("-"):
+        negativo = True
+        txt = txt[1:]
+
+    if not txt:
+        return np.nan
+
+    if "," in txt:
+        txt_norm = txt.replace(".", "").replace(",", ".")
+    elif "." in txt:
+        partes = txt.split(".")
+        if len(partes) > 2:
+            txt_norm = "".join(partes)
+        elif len(partes) == 2 and len(partes[1]) == 3 and partes[0].isdigit() and partes[1].isdigit():
+            txt_norm = "".join(partes)
+        else:
+            txt_norm = txt
+    else:
+        txt_norm = txt
+
+    try:
+        num = float(txt_norm)
+        return -num if negativo else num
+    except Exception:
+        return np.nan
+
+
+def _casa(arr: pa.Array, padrao: str) -> np.ndarray:
+    """Máscara numpy de `padrao` casando o texto inteiro (regex RE2)."""
+    return pc.match_substring_regex(arr, f"^(?:{padrao})$").to_numpy(zero_copy_only=False)
+
+
+def _mascara(arr) -> np.ndarray:
+    return arr.to_numpy(zero_copy_only=False)
+
+
+def _trocar(txt: pa.Array, mascara: np.ndarray, transformar) -> pa.Array:
+    """Aplica `transformar` só nas posições de `mascara` (o resto fica igual)."""
+    if not mascara.any():
+        return txt
+    selecao = pa.array(mascara)
+    return pc.replace_with_mask(txt, selecao, transformar(txt.filter(selecao)))
+
+
+def _textos_para_float(valores: np.ndarray) -> np.ndarray:
+    """Mesmas regras de `parse_num_misto` para um array de `str` distintos.
+
+    Cada passo é um kernel de texto do Arrow (`pyarrow.compute`), sem laço
+    Python por célula, e as trocas só rodam nas linhas que precisam delas.
+    Textos com caracteres fora do alfabeto seguro (tabs, letras, dígitos não
+    ASCII...) ou com sobras de "R"/"US" ficam com a versão escalar, que define
+    o resultado nesses casos.
+    """
+    out = np.full(len(valores), np.nan)
+    arr = pa.array(valores, type=pa.string())
+    seguro = _casa(arr, _RE_ALFABETO_SEGURO)
+    idx = np.flatnonzero(seguro)
+    txt = arr.filter(pa.array(seguro))
+
+    # Só há espaços comuns/não separáveis como brancos: o strip() do escalar
+    # não muda nada, pois todos os espaços são removidos aqui.
+    com_simbolo = _mascara(pc.match_substring_regex(txt, "[$% \u00a0]"))
+    txt = _trocar(txt, com_simbolo, lambda t: pc.replace_substring_regex(t, _RE_REMOVER, ""))
+    # "R"/"U"/"S" que sobraram: a remoção em uma passada pode diferir dos
+    # replace() em sequência do escalar (ex.: "UR$S$5")
+    sobra_letra = np.zeros(len(txt), dtype=bool)
+    if com_simbolo.any():
+        sobra_letra[com_simbolo] = _mascara(pc.match_substring_regex(txt.filter(pa.array(com_simbolo)), "[RUS]"))
+
+    parenteses = _mascara(pc.and_(pc.starts_with(txt, "("), pc.ends_with(txt, ")")))
+    txt = _trocar(txt, parenteses, lambda t: pc.utf8_slice_codeunits(t, 1, -1))
+    mais = _mascara(pc.starts_with(txt, "+"))
+    menos = ~mais & _mascara(pc.starts_with(txt, "-"))
+    txt = _trocar(txt, mais | menos, lambda t: pc.utf8_slice_codeunits(t, 1))
+    negativo = parenteses | menos
+
+    virgula = _mascara(pc.match_substring(txt, ","))
+    pontos = _mascara(pc.count_substring(txt, "."))
+    milhar = ~virgula & (pontos > 1)
+    um_ponto = ~virgula & (pontos == 1)
+    if um_ponto.any():
+        milhar[um_ponto] = _casa(txt.filter(pa.array(um_ponto)), _RE_MILHAR_UNICO)
+    txt = _trocar(txt, virgula | milhar, lambda t: pc.replace_substring(t, ".", ""))
+    txt = _trocar(txt, virgula, lambda t: pc.replace_substring(t, ",", "."))
+
+    # No alfabeto seguro, float() só aceita o que casa com este padrão; o
+    # resto ("", "1e", "(5", "+-+1"...) é NaN, como no escalar
+    simples = _casa(txt, _RE_NUMERO_SIMPLES)
+    convertido = np.full(len(txt), np.nan)
+    if simples.any():
+        numeros = txt.filter(pa.array(simples))
+        try:
+            convertido[simples] = pc.cast(numeros, pa.float64()).to_numpy(zero_copy_only=False)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            convertido[simples] = [float(v) for v in numeros.to_pylist()]
+    out[idx] = np.where(negativo, -convertido, convertido)
+
+    inseguro = np.concatenate([np.flatnonzero(~seguro), idx[sobra_letra]])
+    if inseguro.size:
+        out[inseguro] = [parse_num_misto(v) for v in valores[inseguro]]
+    return out
+
+
+def parse_num_misto_serie(serie) -> pd.Series:
+    """`parse_num_misto` aplicado a uma Series inteira (float64, mesmo índice)."""
+    s = serie if isinstance(serie, pd.Series) else pd.Series(serie)
+    if pd.api.types.is_bool_dtype(s.dtype) or pd.api.types.is_numeric_dtype(s.dtype):
+        return s.astype(float)
+
+    valores = s.to_numpy(dtype=object)
+    if len(valores) < _MIN_TEXTOS_VETORIZADO:
+        return pd.Series([parse_num_misto(v) for v in valores], index=s.index, name=s.name, dtype=float)
+    out = np.full(len(valores), np.nan)
+    ausente = pd.isna(valores)
+    eh_texto = np.fromiter((isinstance(v, str) for v in valores), dtype=bool, count=len(valores))
+    eh_numero = np.fromiter((isinstance(v, _TIPOS_NUMERICOS) for v in valores), dtype=bool, count=len(valores))
+    eh_texto &= ~ausente
+    eh_numero &= ~ausente
+
+    if eh_texto.any():
+        # Relatórios repetem muito os mesmos textos: converte cada um uma vez só
+        codigos, distintos = pd.factorize(valores[eh_texto])
+        distintos = np.asarray(distintos, dtype=object)
+        if len(distintos) < _MIN_TEXTOS_VETORIZADO:
+            convertidos = np.array([parse_num_misto(v) for v in distintos], dtype=float)
+        else:
+            convertidos = _textos_para_float(distintos)
+        out[eh_texto] = convertidos[codigos]
+    if eh_numero.any():
+        try:
+            out[eh_numero] = valores[eh_numero].astype(float)
+        except (OverflowError, TypeError, ValueError):
+            out[eh_numero] = [parse_num_misto(v) for v in valores[eh_numero]]
+    outros = ~ausente & ~eh_texto & ~eh_numero
+    if outros.any():
+        # Tipos raros (Decimal, datas, np.bool_...): caminho escalar
+        out[outros] = [parse_num_misto(v) for v in valores[outros]]
+    return pd.Series(out, index=s.index, name=s.name)
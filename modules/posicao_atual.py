@@ -1,74 +1,24 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from io import BytesIO
 from typing import List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-import yfinance as yf
 
-from modules.cotacoes import obter_cotacao_atual_eur_brl, obter_cotacao_atual_usd_brl
+from modules.cotacoes import (
+    obter_cotacao_atual_eur_brl,
+    obter_cotacao_atual_usd_brl,
+    ultima_cotacao_usd_brl_local,
+)
+from modules.parse_numeros import parse_num_misto_serie
+from modules.provedor_mercado import obter_provedor
 from modules.ticker_info import extrair_ticker, ticker_para_yfinance
 
-
-def _parse_num_misto(valor) -> float:
-    if pd.isna(valor):
-        return np.nan
-    if isinstance(valor, (int, float, np.integer, np.floating)):
-        try:
-            return float(valor)
-        except Exception:
-            return np.nan
-
-    txt = str(valor).strip()
-    if not txt:
-        return np.nan
-
-    txt = (
-        txt.replace("R$", "")
-        .replace("US$", "")
-        .replace("$", "")
-        .replace("%", "")
-        .replace("\u00a0", " ")
-        .replace(" ", "")
-    )
-
-    negativo = False
-    if txt.startswith("(") and txt.endswith(")"):
-        negativo = True
-        txt = txt[1:-1]
-
-    if txt.startswith("+"):
-        txt = txt[1:]
-    elif txt.startswith("-"):
-        negativo = True
-        txt = txt[1:]
-
-    if not txt:
-        return np.nan
-
-    if "." in txt and "," in txt:
-        txt_norm = txt.replace(".", "").replace(",", ".")
-    elif "," in txt:
-        txt_norm = txt.replace(".", "").replace(",", ".")
-    elif "." in txt:
-        partes = txt.split(".")
-        if len(partes) > 2:
-            txt_norm = "".join(partes)
-        else:
-            if len(partes) == 2 and len(partes[1]) == 3 and partes[0].isdigit() and partes[1].isdigit():
-                txt_norm = "".join(partes)
-            else:
-                txt_norm = txt
-    else:
-        txt_norm = txt
-
-    try:
-        num = float(txt_norm)
-        return -num if negativo else num
-    except Exception:
-        return np.nan
+# Limite de threads para os fallbacks individuais de cotação (evita throttling do Yahoo)
+MAX_WORKERS_COTACOES = 8
 
 
 def _parse_mes_ano_to_periodo(valor) -> Optional[pd.Period]:
@@ -149,12 +99,12 @@ def preparar_posicao_base(df_cons: pd.DataFrame, agrupar_por_usuario: bool = Fal
     else:
         if "Quantidade Disponível" in dfp.columns:
             qtd = qtd.where(qtd.notna(), dfp["Quantidade Disponível"])
-    dfp["Quantidade"] = pd.to_numeric(pd.Series(qtd).apply(_parse_num_misto), errors="coerce").fillna(0.0)
+    dfp["Quantidade"] = parse_num_misto_serie(pd.Series(qtd)).fillna(0.0)
 
     if "Preço" in dfp.columns:
-        dfp["Preço"] = pd.to_numeric(dfp["Preço"].apply(_parse_num_misto), errors="coerce")
+        dfp["Preço"] = parse_num_misto_serie(dfp["Preço"])
     elif "Preco" in dfp.columns:
-        dfp["Preço"] = pd.to_numeric(dfp["Preco"].apply(_parse_num_misto), errors="coerce")
+        dfp["Preço"] = parse_num_misto_serie(dfp["Preco"])
     else:
         dfp["Preço"] = np.nan
 
@@ -178,9 +128,9 @@ def preparar_posicao_base(df_cons: pd.DataFrame, agrupar_por_usuario: bool = Fal
 
     # Valor base do mês (para RF/TD/Opções e fallback geral)
     if "Valor" in dfp.columns:
-        dfp["Valor Base"] = pd.to_numeric(dfp["Valor"].apply(_parse_num_misto), errors="coerce")
+        dfp["Valor Base"] = parse_num_misto_serie(dfp["Valor"])
     elif "Valor de Mercado" in dfp.columns:
-        dfp["Valor Base"] = pd.to_numeric(dfp["Valor de Mercado"].apply(_parse_num_misto), errors="coerce")
+        dfp["Valor Base"] = parse_num_misto_serie(dfp["Valor de Mercado"])
     else:
         dfp["Valor Base"] = np.nan
 
@@ -227,14 +177,14 @@ def _buscar_preco_yfinance(ticker: str) -> Tuple[Optional[float], Optional[str],
     sym = ticker_para_yfinance(t0) or t0
 
     try:
-        tk = yf.Ticker(sym)
+        prov = obter_provedor()
         preco_atual = None
         preco_anterior = None
         variacao_pct = None
 
         # Tentar obter info completo (tem variação % e previousClose)
         try:
-            info = tk.info or {}
+            info = prov.info(sym) or {}
             preco_atual = info.get("regularMarketPrice") or info.get("currentPrice")
             preco_anterior = info.get("previousClose") or info.get("regularMarketPreviousClose")
             variacao_pct = info.get("regularMarketChangePercent")
@@ -246,7 +196,7 @@ def _buscar_preco_yfinance(ticker: str) -> Tuple[Optional[float], Optional[str],
 
         # Fallback: histórico de 5 dias para calcular variação
         try:
-            hist = tk.history(period="5d")
+            hist = prov.historico(sym, period="5d")
             if isinstance(hist, pd.DataFrame) and (not hist.empty) and ("Close" in hist.columns):
                 closes = pd.to_numeric(hist["Close"], errors="coerce").dropna()
                 if len(closes) >= 2:
@@ -262,7 +212,7 @@ def _buscar_preco_yfinance(ticker: str) -> Tuple[Optional[float], Optional[str],
 
         # Histórico intraday como último recurso
         try:
-            hist_intra = tk.history(period="1d", interval="1m")
+            hist_intra = prov.historico(sym, period="1d", interval="1m")
             if isinstance(hist_intra, pd.DataFrame) and (not hist_intra.empty) and ("Close" in hist_intra.columns):
                 px_last = pd.to_numeric(hist_intra["Close"], errors="coerce").dropna()
                 if not px_last.empty:
@@ -275,12 +225,104 @@ def _buscar_preco_yfinance(ticker: str) -> Tuple[Optional[float], Optional[str],
         return None, sym, None, None
 
 
-def atualizar_cotacoes(df_posicao: pd.DataFrame) -> Tuple[pd.DataFrame, List[str], datetime]:
+def _download_fechamentos_lote(syms: List[str]) -> pd.DataFrame:
+    """Baixa os fechamentos dos últimos 5 pregões de vários símbolos numa única chamada.
+
+    Retorna DataFrame (índice = data, colunas = símbolo yfinance).
+    """
+    if not syms:
+        return pd.DataFrame()
+    try:
+        hist = obter_provedor().download(
+            syms,
+            period="5d",
+            interval="1d",
+            auto_adjust=False,
+            group_by="column",
+            threads=True,
+            progress=False,
+        )
+    except Exception:
+        return pd.DataFrame()
+    if not isinstance(hist, pd.DataFrame) or hist.empty:
+        return pd.DataFrame()
+
+    if isinstance(hist.columns, pd.MultiIndex):
+        if "Close" not in hist.columns.get_level_values(0):
+            return pd.DataFrame()
+        closes = hist["Close"]
+    elif "Close" in hist.columns:
+        closes = hist[["Close"]].rename(columns={"Close": syms[0]})
+    else:
+        return pd.DataFrame()
+
+    return closes.apply(pd.to_numeric, errors="coerce")
+
+
+def buscar_precos_yfinance_lote(tickers, max_workers: int = MAX_WORKERS_COTACOES) -> pd.DataFrame:
+    """Busca cotações de vários tickers de uma vez.
+
+    - Deduplica os tickers e converte para símbolos yfinance;
+    - Faz um único download multi-símbolo (fechamentos de 5 dias);
+    - Símbolos que não vierem no lote usam `_buscar_preco_yfinance` (info/5d/intraday)
+      num pool de threads limitado a `max_workers`.
+
+    Retorna DataFrame com colunas: Ticker, Ticker YF, Preço YF, Preço Anterior, Variação % YF.
+    """
+    cols = ["Ticker", "Ticker YF", "Preço YF", "Preço Anterior", "Variação % YF"]
+    tks = pd.Series(list(tickers) if tickers is not None else [], dtype=object)
+    tks = tks.fillna("").astype(str).str.strip().str.upper()
+    tks = tks[tks != ""].drop_duplicates()
+    if tks.empty:
+        return pd.DataFrame(columns=cols)
+
+    df_out = pd.DataFrame({"Ticker": tks.tolist()})
+    df_out["Ticker YF"] = df_out["Ticker"].map(lambda t: ticker_para_yfinance(t) or t)
+
+    syms = df_out["Ticker YF"].drop_duplicates().tolist()
+    closes = _download_fechamentos_lote(syms)
+    if not closes.empty:
+        ultimo = closes.ffill().iloc[-1]
+        anterior = closes.apply(lambda s: s.dropna().iloc[-2] if s.count() >= 2 else np.nan)
+        df_out["Preço YF"] = df_out["Ticker YF"].map(ultimo)
+        df_out["Preço Anterior"] = df_out["Ticker YF"].map(anterior)
+    else:
+        df_out["Preço YF"] = np.nan
+        df_out["Preço Anterior"] = np.nan
+    df_out["Preço YF"] = pd.to_numeric(df_out["Preço YF"], errors="coerce")
+    df_out["Preço Anterior"] = pd.to_numeric(df_out["Preço Anterior"], errors="coerce")
+    df_out["Variação % YF"] = np.where(
+        df_out["Preço Anterior"] > 0,
+        (df_out["Preço YF"] / df_out["Preço Anterior"] - 1.0) * 100.0,
+        np.nan,
+    )
+
+    # Fallback individual (em paralelo) para o que não veio no download em lote
+    mask_falta = ~(df_out["Preço YF"] > 0)
+    faltantes = df_out.loc[mask_falta, "Ticker"].tolist()
+    if faltantes:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(faltantes)))) as pool:
+            resultados = list(pool.map(_buscar_preco_yfinance, faltantes))
+        df_fb = pd.DataFrame(resultados, columns=["Preço YF", "Ticker YF", "Preço Anterior", "Variação % YF"], index=df_out.index[mask_falta])
+        df_fb["Ticker YF"] = df_fb["Ticker YF"].fillna(df_out.loc[mask_falta, "Ticker YF"])
+        for c in ["Preço YF", "Preço Anterior", "Variação % YF"]:
+            df_fb[c] = pd.to_numeric(df_fb[c], errors="coerce")
+        df_out.loc[mask_falta, df_fb.columns] = df_fb
+
+    return df_out[cols]
+
+
+def atualizar_cotacoes(
+    df_posicao: pd.DataFrame, buscar_cotacoes: bool = True
+) -> Tuple[pd.DataFrame, List[str], datetime]:
     """Atualiza cotação em tempo real via yfinance com fallback no histórico.
 
     Entrada mínima:
     - Ticker, Quantidade, Preço (histórico)
 
+    Com `buscar_cotacoes=False` não acessa a rede: monta a mesma tabela só com os preços
+    do histórico e o último USD/BRL da base local (provisória, até chegarem as cotações).
+
     Saída:
     - Ticker, Quantidade, Preço Atual, Valor Atualizado (+ colunas auxiliares)
     """
@@ -303,141 +345,79 @@ def atualizar_cotacoes(df_posicao: pd.DataFrame) -> Tuple[pd.DataFrame, List[str
         df["Valor Base"] = np.nan
 
     df["Ticker"] = df["Ticker"].fillna("").astype(str).str.strip().str.upper()
-    df["Quantidade"] = pd.to_numeric(df["Quantidade"].apply(_parse_num_misto), errors="coerce").fillna(0.0)
-    df["Preço"] = pd.to_numeric(df["Preço"].apply(_parse_num_misto), errors="coerce")
-    df["Valor Base"] = pd.to_numeric(df["Valor Base"].apply(_parse_num_misto), errors="coerce")
+    df["Quantidade"] = parse_num_misto_serie(df["Quantidade"]).fillna(0.0)
+    df["Preço"] = parse_num_misto_serie(df["Preço"])
+    df["Valor Base"] = parse_num_misto_serie(df["Valor Base"])
     df["Moeda"] = df["Moeda"].fillna("BRL").astype(str).str.strip().str.upper()
     df["Tipo"] = df["Tipo"].fillna("N/A").astype(str).str.strip()
 
-    cotacao_usd_brl = obter_cotacao_atual_usd_brl()
-    cotacao_eur_brl = obter_cotacao_atual_eur_brl()
+    if buscar_cotacoes:
+        cotacao_usd_brl = obter_cotacao_atual_usd_brl()
+        cotacao_eur_brl = obter_cotacao_atual_eur_brl()
+    else:
+        cotacao_usd_brl = ultima_cotacao_usd_brl_local()
+        cotacao_eur_brl = np.nan
+    usd_brl = float(cotacao_usd_brl)
+    eur_brl = float(cotacao_eur_brl) if pd.notna(cotacao_eur_brl) else np.nan
+    eur_valido = pd.notna(eur_brl) and eur_brl > 0
 
     # Só atualiza cotação em tempo real para ações
     tipos_atualizaveis = {"Ações", "Ações Dólar", "Ações Euro"}
+    mask_atualiza = df["Tipo"].isin(list(tipos_atualizaveis))
+
+    # Busca em lote (1 download multi-símbolo + fallbacks em paralelo) e junta por Ticker.
+    # Tipos sem cotação (RF/TD/Opções etc) mantêm o valor do mês.
+    tickers_cotacao = df.loc[mask_atualiza, "Ticker"] if buscar_cotacoes else []
+    df_cot = buscar_precos_yfinance_lote(tickers_cotacao).set_index("Ticker")
+    preco_yf = pd.to_numeric(df["Ticker"].map(df_cot["Preço YF"]), errors="coerce").where(mask_atualiza)
+    preco_hist = pd.to_numeric(df["Preço"], errors="coerce")
+
+    tem_yf = preco_yf.notna() & (preco_yf > 0)
+    hist_valido = preco_hist.notna() & (preco_hist > 0)
+    preco_base = preco_yf.where(tem_yf, preco_hist.where(hist_valido))
+
+    moeda_usd = df["Moeda"] == "USD"
+    moeda_eur = df["Moeda"] == "EUR"
+
+    df["Ticker YF"] = df["Ticker"].map(df_cot["Ticker YF"]).where(mask_atualiza, None)
+    df["Preço Atual"] = pd.to_numeric(
+        np.select(
+            [~mask_atualiza, moeda_usd, moeda_eur],
+            [np.nan, preco_base * usd_brl, preco_base * eur_brl if eur_valido else np.nan],
+            default=preco_base,
+        ),
+        errors="coerce",
+    )
+    df["Preço Atual (USD)"] = preco_base.where(mask_atualiza & moeda_usd)
+    df["Cotação USD/BRL"] = np.where(moeda_usd, usd_brl, np.nan)
+    df["Preço Atual (EUR)"] = preco_base.where(mask_atualiza & moeda_eur)
+    df["Cotação EUR/BRL"] = np.where(moeda_eur, eur_brl, np.nan)
+    df["Preço Anterior"] = pd.to_numeric(df["Ticker"].map(df_cot["Preço Anterior"]), errors="coerce").where(mask_atualiza)
+    df["Variação % YF"] = pd.to_numeric(df["Ticker"].map(df_cot["Variação % YF"]), errors="coerce").where(mask_atualiza)
+    df["Fonte Preço"] = np.select(
+        [~mask_atualiza, tem_yf, hist_valido],
+        ["Base (mês)", "yfinance", "Histórico"],
+        default="Não encontrado",
+    )
+    df["Preço Histórico"] = preco_hist
+    df["Preço Histórico (BRL)"] = pd.to_numeric(
+        np.select(
+            [~mask_atualiza, moeda_usd, moeda_eur],
+            [
+                np.nan,
+                preco_hist.where(hist_valido) * usd_brl,
+                preco_hist.where(hist_valido) * eur_brl if eur_valido else np.nan,
+            ],
+            default=preco_hist,
+        ),
+        errors="coerce",
+    )
 
-    precos_brl: List[Optional[float]] = []
-    precos_usd: List[Optional[float]] = []
-    precos_eur: List[Optional[float]] = []
-    fontes: List[str] = []
-    tickers_yf: List[Optional[str]] = []
-    sem_cotacao: List[str] = []
-    cotacoes_fx: List[Optional[float]] = []
-    cotacoes_eur: List[Optional[float]] = []
-    preco_hist_brl: List[Optional[float]] = []
-    precos_anteriores: List[Optional[float]] = []
-    variacoes_pct: List[Optional[float]] = []
-
-    for _, row in df.iterrows():
-        tk = str(row.get("Ticker") or "").strip().upper()
-        moeda = str(row.get("Moeda") or "BRL").strip().upper()
-        preco_hist = row.get("Preço")
-        tipo = str(row.get("Tipo") or "N/A").strip()
-        valor_base = row.get("Valor Base")
-
-        # Tipos sem cotação (RF/TD/Opções etc): manter o valor do mês
-        if tipo not in tipos_atualizaveis:
-            sym = None
-            tickers_yf.append(sym)
-            fontes.append("Base (mês)")
-            precos_anteriores.append(np.nan)
-            variacoes_pct.append(np.nan)
-
-            if moeda == "USD":
-                cotacoes_fx.append(float(cotacao_usd_brl))
-                cotacoes_eur.append(np.nan)
-                precos_usd.append(np.nan)
-                precos_eur.append(np.nan)
-                precos_brl.append(np.nan)
-                preco_hist_brl.append(np.nan)
-            elif moeda == "EUR":
-                cotacoes_fx.append(np.nan)
-                cotacoes_eur.append(float(cotacao_eur_brl) if pd.notna(cotacao_eur_brl) else np.nan)
-                precos_usd.append(np.nan)
-                precos_eur.append(np.nan)
-                precos_brl.append(np.nan)
-                preco_hist_brl.append(np.nan)
-            else:
-                cotacoes_fx.append(np.nan)
-                cotacoes_eur.append(np.nan)
-                precos_usd.append(np.nan)
-                precos_eur.append(np.nan)
-                precos_brl.append(np.nan)
-                preco_hist_brl.append(np.nan)
-
-            continue
-
-        preco_yf, sym, preco_ant_yf, var_pct_yf = _buscar_preco_yfinance(tk)
-
-        preco_base = None
-        fonte = None
-        if preco_yf is None or not (isinstance(preco_yf, (int, float)) and float(preco_yf) > 0):
-            if pd.notna(preco_hist) and float(preco_hist) > 0:
-                preco_base = float(preco_hist)
-                fonte = "Histórico"
-                sem_cotacao.append(tk)
-            else:
-                preco_base = np.nan
-                fonte = "Não encontrado"
-                sem_cotacao.append(tk)
-        else:
-            preco_base = float(preco_yf)
-            fonte = "yfinance"
-
-        # Salvar preço anterior e variação % do yfinance
-        precos_anteriores.append(preco_ant_yf if preco_ant_yf is not None else np.nan)
-        variacoes_pct.append(var_pct_yf if var_pct_yf is not None else np.nan)
-
-        if moeda == "USD":
-            cotacoes_fx.append(float(cotacao_usd_brl))
-            cotacoes_eur.append(np.nan)
-            precos_usd.append(preco_base if pd.notna(preco_base) else np.nan)
-            precos_eur.append(np.nan)
-            precos_brl.append(float(preco_base) * float(cotacao_usd_brl) if pd.notna(preco_base) else np.nan)
-            if pd.notna(preco_hist) and float(preco_hist) > 0:
-                preco_hist_brl.append(float(preco_hist) * float(cotacao_usd_brl))
-            else:
-                preco_hist_brl.append(np.nan)
-        elif moeda == "EUR":
-            cotacoes_fx.append(np.nan)
-            cotacoes_eur.append(float(cotacao_eur_brl) if pd.notna(cotacao_eur_brl) else np.nan)
-            precos_usd.append(np.nan)
-            precos_eur.append(preco_base if pd.notna(preco_base) else np.nan)
-            if pd.notna(preco_base) and pd.notna(cotacao_eur_brl) and float(cotacao_eur_brl) > 0:
-                precos_brl.append(float(preco_base) * float(cotacao_eur_brl))
-            else:
-                precos_brl.append(np.nan)
-            if pd.notna(preco_hist) and float(preco_hist) > 0 and pd.notna(cotacao_eur_brl) and float(cotacao_eur_brl) > 0:
-                preco_hist_brl.append(float(preco_hist) * float(cotacao_eur_brl))
-            else:
-                preco_hist_brl.append(np.nan)
-        else:
-            cotacoes_fx.append(np.nan)
-            cotacoes_eur.append(np.nan)
-            precos_usd.append(np.nan)
-            precos_eur.append(np.nan)
-            precos_brl.append(preco_base)
-            preco_hist_brl.append(float(preco_hist) if pd.notna(preco_hist) else np.nan)
-
-        fontes.append(fonte)
-        tickers_yf.append(sym)
-
-    df["Ticker YF"] = tickers_yf
-    df["Preço Atual"] = pd.to_numeric(precos_brl, errors="coerce")
-    df["Preço Atual (USD)"] = pd.to_numeric(precos_usd, errors="coerce")
-    df["Cotação USD/BRL"] = pd.to_numeric(cotacoes_fx, errors="coerce")
-    df["Preço Atual (EUR)"] = pd.to_numeric(precos_eur, errors="coerce")
-    df["Cotação EUR/BRL"] = pd.to_numeric(cotacoes_eur, errors="coerce")
-    df["Preço Anterior"] = pd.to_numeric(precos_anteriores, errors="coerce")
-    df["Variação % YF"] = pd.to_numeric(variacoes_pct, errors="coerce")
-    df["Fonte Preço"] = fontes
-    df["Preço Histórico"] = pd.to_numeric(df["Preço"], errors="coerce")
-    df["Preço Histórico (BRL)"] = pd.to_numeric(preco_hist_brl, errors="coerce")
+    sem_cotacao = df.loc[mask_atualiza & ~tem_yf, "Ticker"].tolist() if buscar_cotacoes else []
 
     # Valor atualizado:
     # - Para ações: Quantidade × Preço Atual (em BRL)
     # - Para demais tipos: manter Valor Base (convertendo se necessário)
-    mask_atualiza = df["Tipo"].isin(list(tipos_atualizaveis))
-
     moeda_norm = df["Moeda"].astype(str).str.upper()
     vb = pd.to_numeric(df["Valor Base"], errors="coerce")
     valor_base_brl = np.select(
@@ -0,0 +1,239 @@
+"""Base local (Parquet) de preços diários OHLCV por símbolo.
+
+Cada símbolo yfinance fica em um arquivo próprio em `data/precos/`. A primeira
+consulta baixa o histórico completo (`period="max"`); as seguintes buscam
+apenas os pregões posteriores ao último registrado (watermark), com uma pequena
+sobreposição para corrigir o pregão parcial do dia.
+
+Se o pregão de sobreposição vier com preço diferente do armazenado (split ou
+ajuste de dividendos reescrevendo o histórico no Yahoo), o símbolo é baixado
+novamente por completo.
+
+Intervalos semanal/mensal são derivados do diário via resample, então gráficos
+e séries mensais de qualquer janela leem do mesmo arquivo.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.armazenamento import gravar_parquet_atomico
+from modules.provedor_mercado import obter_provedor
+
+PASTA_PRECOS = Path("data") / "precos"
+
+COLUNAS_OHLCV = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+# Tempo mínimo entre duas consultas incrementais do mesmo símbolo
+TTL_ATUALIZACAO = timedelta(hours=6)
+
+# Pregões reconsultados a cada atualização (corrige o último pregão parcial)
+_DIAS_SOBREPOSICAO = 5
+
+_INTERVALOS_RESAMPLE = {
+    "1d": None,
+    "1wk": "W-MON",
+    "1mo": "MS",
+}
+
+# Intervalos atendidos pela base local; os demais (intraday) vão direto ao yfinance
+INTERVALOS_SUPORTADOS = set(_INTERVALOS_RESAMPLE)
+
+_PERIODOS_OFFSET = {
+    "1d": pd.DateOffset(days=1),
+    "5d": pd.DateOffset(days=7),
+    "10d": pd.DateOffset(days=14),
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+
+
+def _arquivo_simbolo(sym: str) -> Path:
+    nome = re.sub(r"[^A-Za-z0-9._-]", "_", sym.strip().upper())
+    return PASTA_PRECOS / f"{nome}.parquet"
+
+
+def _normalizar_hist(hist: pd.DataFrame) -> pd.DataFrame:
+    """Índice de datas sem timezone (um registro por pregão) e colunas OHLCV numéricas."""
+    if not isinstance(hist, pd.DataFrame) or hist.empty or "Close" not in hist.columns:
+        return pd.DataFrame(columns=COLUNAS_OHLCV)
+    df = hist.copy()
+    idx = pd.to_datetime(df.index, errors="coerce")
+    if getattr(idx, "tz", None) is not None:
+        idx = idx.tz_localize(None)
+    df.index = idx.normalize()
+    df = df[~df.index.isna()]
+    if "Adj Close" not in df.columns:
+        df["Adj Close"] = df["Close"]
+    for c in COLUNAS_OHLCV:
+        df[c] = pd.to_numeric(df[c], errors="coerce") if c in df.columns else np.nan
+    df = df[COLUNAS_OHLCV]
+    df = df[df["Close"].notna()]
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    df.index.name = "Date"
+    return df
+
+
+def carregar_precos_locais(sym: str) -> pd.DataFrame:
+    """Lê o histórico diário armazenado de `sym` (vazio se não existir)."""
+    path = _arquivo_simbolo(sym)
+    if not path.exists():
+        return pd.DataFrame(columns=COLUNAS_OHLCV)
+    try:
+        return pd.read_parquet(path)
+    except Exception:
+        return pd.DataFrame(columns=COLUNAS_OHLCV)
+
+
+def _salvar_precos_locais(sym: str, df: pd.DataFrame) -> None:
+    # Temporário único por gravação: threads/processos atualizando o mesmo símbolo não colidem
+    gravar_parquet_atomico(df, _arquivo_simbolo(sym), index=None)
+
+
+def _baixar(sym: str, inicio: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    try:
+        prov = obter_provedor()
+        if inicio is None:
+            hist = prov.historico(sym, period="max", interval="1d", auto_adjust=False)
+        else:
+            hist = prov.historico(sym, start=inicio.strftime("%Y-%m-%d"), interval="1d", auto_adjust=False)
+    except Exception as e:
+        print(f"Erro ao baixar histórico de {sym}: {e}")
+        return pd.DataFrame(columns=COLUNAS_OHLCV)
+    return _normalizar_hist(hist)
+
+
+def _historico_reescrito(local: pd.DataFrame, novo: pd.DataFrame) -> bool:
+    """True se os pregões em comum divergem (split/dividendo reajustou a série no Yahoo)."""
+    comuns = local.index.intersection(novo.index)
+    if comuns.empty:
+        return False
+    # O último pregão local pode ter sido gravado com preço parcial; compara os anteriores.
+    comuns = comuns[comuns < local.index.max()]
+    if comuns.empty:
+        return False
+    for c in ["Close", "Adj Close"]:
+        a = local.loc[comuns, c].to_numpy(dtype=float)
+        b = novo.loc[comuns, c].to_numpy(dtype=float)
+        if not np.allclose(a, b, rtol=1e-4, equal_nan=True):
+            return True
+    return False
+
+
+def atualizar_precos(sym: str, forcar: bool = False) -> pd.DataFrame:
+    """Completa a base local de `sym` com os pregões após o watermark e retorna o diário completo."""
+    sym = (sym or "").strip().upper()
+    if not sym:
+        return pd.DataFrame(columns=COLUNAS_OHLCV)
+
+    path = _arquivo_simbolo(sym)
+    local = carregar_precos_locais(sym)
+
+    if not forcar and not local.empty and path.exists():
+        verificado_em = datetime.fromtimestamp(path.stat().st_mtime)
+        if datetime.now() - verificado_em < TTL_ATUALIZACAO:
+            return local
+
+    if local.empty or forcar:
+        novo = _baixar(sym)
+        if novo.empty:
+            return local
+        _salvar_precos_locais(sym, novo)
+        return novo
+
+    watermark = pd.Timestamp(local.index.max())
+    novo = _baixar(sym, inicio=watermark - pd.Timedelta(days=_DIAS_SOBREPOSICAO))
+    if novo.empty:
+        # Sem pregões novos (fim de semana/feriado): só marca a verificação.
+        os.utime(path, None)
+        return local
+
+    if _historico_reescrito(local, novo):
+        completo = _baixar(sym)
+        if not completo.empty:
+            _salvar_precos_locais(sym, completo)
+            return completo
+
+    combinado = pd.concat([local[local.index < novo.index.min()], novo])
+    combinado = combinado[~combinado.index.duplicated(keep="last")].sort_index()
+    _salvar_precos_locais(sym, combinado)
+    return combinado
+
+
+def _inicio_periodo(periodo: str, fim: pd.Timestamp) -> Optional[pd.Timestamp]:
+    periodo = (periodo or "max").strip().lower()
+    if periodo == "max":
+        return None
+    if periodo == "ytd":
+        return pd.Timestamp(year=fim.year, month=1, day=1)
+    offset = _PERIODOS_OFFSET.get(periodo)
+    return (fim - offset) if offset is not None else None
+
+
+def obter_historico(
+    sym: str,
+    periodo: str = "10y",
+    intervalo: str = "1d",
+    ajustado: bool = True,
+) -> pd.DataFrame:
+    """Histórico de `sym` a partir da base local (com atualização incremental).
+
+    Args:
+        sym: símbolo yfinance (ex: 'PETR4.SA', 'AAPL', 'BRL=X')
+        periodo: '5d', '1mo', ..., '10y', 'ytd', 'max'
+        intervalo: '1d', '1wk' ou '1mo' (derivados do diário)
+        ajustado: se True, `Close` é o fechamento ajustado (equivalente ao `auto_adjust` do yfinance)
+
+    Returns:
+        DataFrame com colunas: Date, Open, High, Low, Close, Volume
+    """
+    diario = atualizar_precos(sym)
+    if diario.empty:
+        return pd.DataFrame()
+
+    df = diario.copy()
+    if ajustado:
+        fator = (df["Adj Close"] / df["Close"]).where(df["Close"] > 0, 1.0).fillna(1.0)
+        for c in ["Open", "High", "Low"]:
+            df[c] = df[c] * fator
+        df["Close"] = df["Adj Close"]
+    df = df.drop(columns=["Adj Close"])
+
+    inicio = _inicio_periodo(periodo, pd.Timestamp(df.index.max()))
+    if inicio is not None:
+        df = df[df.index >= inicio]
+
+    regra = _INTERVALOS_RESAMPLE.get(intervalo)
+    if regra:
+        df = df.resample(regra, label="left", closed="left").agg(
+            {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+        )
+        df = df[df["Close"].notna()]
+
+    df.index.name = "Date"
+    return df.reset_index()
+
+
+def obter_close_mensal(sym: str) -> pd.Series:
+    """Fechamento (não ajustado) do último pregão de cada mês, indexado por `Period('M')`."""
+    diario = atualizar_precos(sym)
+    if diario.empty:
+        return pd.Series(dtype=float)
+    s = pd.to_numeric(diario["Close"], errors="coerce").dropna()
+    if s.empty:
+        return pd.Series(dtype=float)
+    s_m = s.resample("ME").last().dropna()
+    s_m.index = s_m.index.to_period("M")
+    return s_m
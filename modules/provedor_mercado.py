@@ -0,0 +1,277 @@
+"""Camada única de acesso a dados de mercado (yfinance e HTTP).
+
+Todo acesso à rede dos módulos de cotação/opções/ticker_info passa por
+`obter_provedor()`, que devolve um dos três backends:
+
+- `ProvedorAoVivo`: chama yfinance/requests diretamente (padrão);
+- `ProvedorGravacao`: chama o ao vivo e grava cada resposta em disco;
+- `ProvedorReproducao`: responde só com o que foi gravado, sem rede.
+
+O backend é escolhido pela variável de ambiente `INVEST_DADOS_MERCADO`
+(`live`, `record` ou `replay`) e as fixtures ficam em
+`INVEST_DADOS_MERCADO_DIR` (padrão: `data/fixtures_mercado`). Assim o app e
+medições de desempenho dos pipelines de posição, rentabilidade e opções
+podem rodar de forma determinística, sem depender da latência do Yahoo.
+
+Cada chamada é identificada por (endpoint, argumentos); os arquivos são
+`<dir>/<endpoint>/<hash>.pkl` e um `indice.jsonl` lista o que foi gravado.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+import yfinance as yf
+
+from modules.controle_requisicoes import HOST_YAHOO, executar_coalescido
+from modules.sessoes_http import http_get as _http_get_pool
+
+MODO_ENV = "INVEST_DADOS_MERCADO"
+PASTA_ENV = "INVEST_DADOS_MERCADO_DIR"
+PASTA_FIXTURES_PADRAO = Path("data") / "fixtures_mercado"
+
+# Parâmetros que não entram na chave (segredos e cache-busters dependentes do relógio)
+_PARAMS_IGNORADOS = {"apikey", "cache"}
+
+
+class FixtureAusenteError(LookupError):
+    """Lançado no modo replay quando a chamada não foi gravada."""
+
+
+@dataclass
+class RespostaHTTP:
+    """Resposta HTTP mínima (compatível com o uso que o app faz de `requests.Response`)."""
+
+    url: str
+    status_code: int
+    content: bytes = b""
+    headers: dict = field(default_factory=dict)
+
+    def json(self) -> Any:
+        return json.loads(self.content.decode("utf-8")) if self.content else None
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} para {self.url}")
+
+
+class ProvedorDados(ABC):
+    """Interface dos backends de dados de mercado (backend incompleto não instancia)."""
+
+    @abstractmethod
+    def historico(self, sym: str, **kwargs) -> pd.DataFrame:
+        raise NotImplementedError
+
+    @abstractmethod
+    def info(self, sym: str) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def fast_info(self, sym: str) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def atributo(self, sym: str, nome: str) -> Any:
+        """Propriedade de `yf.Ticker` (ex: 'options', 'dividends', 'financials')."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def option_chain(self, sym: str, vencimento: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Retorna (calls, puts) de um vencimento."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def download(self, tickers: list[str], **kwargs) -> pd.DataFrame:
+        raise NotImplementedError
+
+    @abstractmethod
+    def http_get(self, url: str, params: Optional[dict] = None, headers: Optional[dict] = None, timeout: float = 30) -> RespostaHTTP:
+        raise NotImplementedError
+
+
+class ProvedorAoVivo(ProvedorDados):
+    """Acesso direto à rede.
+
+    Chamadas idênticas concorrentes (de qualquer sessão) compartilham uma única
+    busca e cada host tem um limite de taxa (ver `modules.controle_requisicoes`).
+    HTTP usa a sessão keep-alive do host, com retentativas (`modules.sessoes_http`).
+    """
+
+    def _executar(self, host: str, endpoint: str, fn, *args, **kwargs) -> Any:
+        _desc, hash_ = _chave(endpoint, *args, **kwargs)
+        return executar_coalescido(hash_, host, lambda: fn(*args, **kwargs))
+
+    def historico(self, sym: str, **kwargs) -> pd.DataFrame:
+        return self._executar(HOST_YAHOO, "historico", lambda s, **kw: yf.Ticker(s).history(**kw), sym, **kwargs)
+
+    def info(self, sym: str) -> dict:
+        return self._executar(HOST_YAHOO, "info", lambda s: yf.Ticker(s).info or {}, sym)
+
+    def fast_info(self, sym: str) -> dict:
+        def _fast_info(s: str) -> dict:
+            fi = yf.Ticker(s).fast_info
+            out = {}
+            for chave in ["last_price", "previous_close", "currency"]:
+                try:
+                    out[chave] = getattr(fi, chave) if not isinstance(fi, dict) else fi.get(chave)
+                except Exception:
+                    out[chave] = None
+            return out
+
+        return self._executar(HOST_YAHOO, "fast_info", _fast_info, sym)
+
+    def atributo(self, sym: str, nome: str) -> Any:
+        return self._executar(HOST_YAHOO, "atributo", lambda s, n: getattr(yf.Ticker(s), n), sym, nome)
+
+    def option_chain(self, sym: str, vencimento: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+        def _cadeia(s: str, v: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+            cadeia = yf.Ticker(s).option_chain(v)
+            return cadeia.calls, cadeia.puts
+
+        return self._executar(HOST_YAHOO, "option_chain", _cadeia, sym, vencimento)
+
+    def download(self, tickers: list[str], **kwargs) -> pd.DataFrame:
+        return self._executar(HOST_YAHOO, "download", lambda t, **kw: yf.download(t, **kw), list(tickers), **kwargs)
+
+    def http_get(self, url: str, params: Optional[dict] = None, headers: Optional[dict] = None, timeout: float = 30) -> RespostaHTTP:
+        def _get(u: str, params=None, headers=None, timeout=30) -> RespostaHTTP:
+            r = _http_get_pool(u, params=params, headers=headers, timeout=timeout)
+            return RespostaHTTP(url=u, status_code=r.status_code, content=r.content, headers=dict(r.headers))
+
+        host = urlparse(url).netloc
+        return self._executar(host, "http_get", _get, url, params=params, headers=headers, timeout=timeout)
+
+
+def _chave(endpoint: str, *args, **kwargs) -> tuple[str, str]:
+    """(descrição legível, hash) de uma chamada."""
+    kw = dict(kwargs)
+    if isinstance(kw.get("params"), dict):
+        kw["params"] = {k: v for k, v in kw["params"].items() if k not in _PARAMS_IGNORADOS}
+    kw.pop("headers", None)
+    kw.pop("timeout", None)
+    desc = json.dumps([endpoint, list(args), kw], sort_keys=True, default=str, ensure_ascii=False)
+    return desc, hashlib.sha1(desc.encode("utf-8")).hexdigest()
+
+
+class _ProvedorEmDisco(ProvedorDados):
+    """Base dos backends com fixtures: cada método vira `_chamar(endpoint, ...)`."""
+
+    def __init__(self, pasta: Path | str | None = None):
+        self.pasta = Path(pasta) if pasta else PASTA_FIXTURES_PADRAO
+
+    def _arquivo(self, endpoint: str, hash_: str) -> Path:
+        return self.pasta / endpoint / f"{hash_}.pkl"
+
+    def _chamar(self, endpoint: str, *args, **kwargs) -> Any:
+        raise NotImplementedError
+
+    def historico(self, sym: str, **kwargs) -> pd.DataFrame:
+        return self._chamar("historico", sym, **kwargs)
+
+    def info(self, sym: str) -> dict:
+        return self._chamar("info", sym)
+
+    def fast_info(self, sym: str) -> dict:
+        return self._chamar("fast_info", sym)
+
+    def atributo(self, sym: str, nome: str) -> Any:
+        return self._chamar("atributo", sym, nome)
+
+    def option_chain(self, sym: str, vencimento: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+        return self._chamar("option_chain", sym, vencimento)
+
+    def download(self, tickers: list[str], **kwargs) -> pd.DataFrame:
+        return self._chamar("download", list(tickers), **kwargs)
+
+    def http_get(self, url: str, params: Optional[dict] = None, headers: Optional[dict] = None, timeout: float = 30) -> RespostaHTTP:
+        return self._chamar("http_get", url, params=params, headers=headers, timeout=timeout)
+
+
+class ProvedorGravacao(_ProvedorEmDisco):
+    """Repassa ao provedor ao vivo e grava respostas (e erros) para reprodução posterior."""
+
+    def __init__(self, pasta: Path | str | None = None, origem: Optional[ProvedorDados] = None):
+        super().__init__(pasta)
+        self.origem = origem or ProvedorAoVivo()
+        self._lock = threading.Lock()
+
+    def _chamar(self, endpoint: str, *args, **kwargs) -> Any:
+        desc, hash_ = _chave(endpoint, *args, **kwargs)
+        erro = None
+        try:
+            resultado = getattr(self.origem, endpoint)(*args, **kwargs)
+        except Exception as e:
+            resultado, erro = None, e
+
+        arq = self._arquivo(endpoint, hash_)
+        arq.parent.mkdir(parents=True, exist_ok=True)
+        registro = {"resultado": resultado, "erro": f"{type(erro).__name__}: {erro}" if erro else None}
+        tmp = arq.with_suffix(".tmp")
+        pd.to_pickle(registro, tmp)
+        os.replace(tmp, arq)
+        with self._lock:
+            with open(self.pasta / "indice.jsonl", "a", encoding="utf-8") as f:
+                f.write(json.dumps({"arquivo": f"{endpoint}/{hash_}.pkl", "chamada": desc}, ensure_ascii=False) + "\n")
+
+        if erro is not None:
+            raise erro
+        return resultado
+
+
+class ProvedorReproducao(_ProvedorEmDisco):
+    """Responde apenas com fixtures gravadas; nunca acessa a rede."""
+
+    def _chamar(self, endpoint: str, *args, **kwargs) -> Any:
+        desc, hash_ = _chave(endpoint, *args, **kwargs)
+        arq = self._arquivo(endpoint, hash_)
+        if not arq.exists():
+            raise FixtureAusenteError(f"Chamada não gravada: {desc}")
+        registro = pd.read_pickle(arq)
+        if registro.get("erro"):
+            raise RuntimeError(f"(gravado) {registro['erro']}")
+        return registro.get("resultado")
+
+
+_provedor: Optional[ProvedorDados] = None
+_lock_provedor = threading.Lock()
+
+
+def _provedor_do_ambiente() -> ProvedorDados:
+    modo = (os.getenv(MODO_ENV) or "live").strip().lower()
+    pasta = os.getenv(PASTA_ENV) or None
+    if modo == "record":
+        return ProvedorGravacao(pasta)
+    if modo == "replay":
+        return ProvedorReproducao(pasta)
+    return ProvedorAoVivo()
+
+
+def obter_provedor() -> ProvedorDados:
+    """Provedor ativo no processo (criado a partir do ambiente na primeira chamada)."""
+    global _provedor
+    if _provedor is None:
+        with _lock_provedor:
+            if _provedor is None:
+                _provedor = _provedor_do_ambiente()
+    return _provedor
+
+
+def definir_provedor(provedor: Optional[ProvedorDados]) -> None:
+    """Troca o provedor ativo (None volta a ler do ambiente na próxima chamada)."""
+    global _provedor
+    with _lock_provedor:
+        _provedor = provedor
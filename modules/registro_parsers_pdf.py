@@ -0,0 +1,149 @@
+"""Registro dos parsers de PDF e escolha de um parser por documento.
+
+Cada parser declara uma impressão digital barata do layout que sabe ler
+(número de páginas, textos-âncora, padrão do nome do arquivo). Para cada seção
+(`"acoes"`, `"dividendos"`), `despachar` testa as impressões digitais dos
+parsers registrados, na ordem de `prioridade`, e roda o primeiro que casa. Só
+passa para o próximo candidato quando o parser devolve um resultado de baixa
+confiança (`ResultadoParser.baixa_confianca`); um erro no parser é falha do
+documento e sobe, em vez de cair num parser de outro layout. O `Despacho`
+devolvido diz qual parser ficou com o documento e quanto tempo levou.
+
+Uma impressão digital exige todos os seus critérios; para aceitar um layout por
+critérios alternativos, registre o mesmo extrator com uma impressão por critério
+(o extrator roda uma vez só por documento).
+
+As âncoras gerais usam a varredura barata de `DocumentoPDF.paginas_com` (sem
+layout); `ancoras_pagina` confere o texto extraído daquela página.
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from modules.documento_pdf import DocumentoPDF
+
+SECOES_PDF = ("acoes", "dividendos")
+
+
+@dataclass(frozen=True)
+class ImpressaoDigital:
+    """Critérios que o documento precisa cumprir (os não informados não contam)."""
+
+    paginas_min: Optional[int] = None
+    paginas_max: Optional[int] = None
+    ancoras: Tuple[str, ...] = ()  # todas precisam aparecer em alguma página
+    ancoras_pagina: Tuple[Tuple[int, Tuple[str, ...]], ...] = ()  # (página, textos) exatos
+    nome_arquivo: Optional[str] = None  # regex (re.search) no nome do arquivo
+
+    def casa(self, doc: DocumentoPDF) -> bool:
+        if self.nome_arquivo and not re.search(self.nome_arquivo, doc.nome, re.IGNORECASE):
+            return False
+        n = doc.num_paginas
+        if self.paginas_min is not None and n < self.paginas_min:
+            return False
+        if self.paginas_max is not None and n > self.paginas_max:
+            return False
+        for pagina, textos in self.ancoras_pagina:
+            if pagina >= n:
+                return False
+            texto = doc.texto(pagina) or ""
+            if not all(t in texto for t in textos):
+                return False
+        return all(doc.paginas_com(a) for a in self.ancoras)
+
+
+@dataclass
+class ResultadoParser:
+    df: pd.DataFrame
+    baixa_confianca: bool = False  # o despachante tenta o próximo candidato
+
+
+# extrair(doc, usuario, mes_ano, tickers_portfolio)
+ExtratorPDF = Callable[[DocumentoPDF, str, Optional[str], Set[str]], ResultadoParser]
+
+
+@dataclass(frozen=True)
+class ParserPDF:
+    nome: str
+    secao: str  # 'acoes' | 'dividendos'
+    impressao: ImpressaoDigital
+    extrair: ExtratorPDF
+    prioridade: int = 50  # menor = testado antes
+
+
+@dataclass
+class Despacho:
+    """Qual parser leu a seção do documento, em quanto tempo e quem foi descartado antes."""
+
+    secao: str
+    parser: Optional[str] = None
+    segundos: float = 0.0
+    descartados: List[Tuple[str, str]] = field(default_factory=list)  # (parser, motivo)
+
+    def resumo(self) -> dict:
+        return {"parser": self.parser, "segundos": round(self.segundos, 3)}
+
+
+_PARSERS: Dict[str, List[ParserPDF]] = {secao: [] for secao in SECOES_PDF}
+
+
+def registrar_parser(parser: ParserPDF) -> None:
+    """Registra (ou substitui, pelo nome) um parser da seção."""
+    if parser.secao not in _PARSERS:
+        raise ValueError(f"Seção de PDF desconhecida: {parser.secao}")
+    lista = [p for p in _PARSERS[parser.secao] if p.nome != parser.nome]
+    lista.append(parser)
+    lista.sort(key=lambda p: p.prioridade)
+    _PARSERS[parser.secao] = lista
+
+
+def parsers_registrados(secao: str) -> List[ParserPDF]:
+    return list(_PARSERS.get(secao, []))
+
+
+def candidatos(doc: DocumentoPDF, secao: str) -> List[ParserPDF]:
+    """Parsers da seção cuja impressão digital casa com o documento, em ordem de prioridade."""
+    return [p for p in _PARSERS.get(secao, []) if p.impressao.casa(doc)]
+
+
+def despachar(
+    doc: DocumentoPDF,
+    secao: str,
+    usuario: str,
+    mes_ano: Optional[str] = None,
+    tickers_portfolio: Optional[Set[str]] = None,
+) -> Tuple[pd.DataFrame, Despacho]:
+    """Lê a seção com o parser escolhido pela impressão digital do documento.
+
+    Um extrator registrado em mais de um parser roda uma vez só. O erro de um
+    candidato sobe (fica em `descartados` do despacho antes de subir).
+    """
+    despacho = Despacho(secao)
+    inicio = time.perf_counter()
+    df = pd.DataFrame()
+    tentados = set()
+    try:
+        for parser in candidatos(doc, secao):
+            if parser.extrair in tentados:
+                continue
+            tentados.add(parser.extrair)
+            try:
+                resultado = parser.extrair(doc, usuario, mes_ano, set(tickers_portfolio or set()))
+            except Exception as e:
+                print(f"[{parser.nome}] Erro ao extrair {secao} de {doc.caminho}: {e}")
+                despacho.descartados.append((parser.nome, f"erro: {e}"))
+                raise
+            despacho.parser = parser.nome
+            df = resultado.df
+            if not resultado.baixa_confianca:
+                break
+            despacho.descartados.append((parser.nome, "baixa confiança"))
+    finally:
+        despacho.segundos = time.perf_counter() - inicio
+    return df, despacho
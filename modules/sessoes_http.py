@@ -0,0 +1,150 @@
+"""Sessões HTTP compartilhadas (keep-alive) com retentativas e métricas por host.
+
+Os fetchers de opcoes.net, SEC, Alpha Vantage e FMP chamavam `requests.get`
+solto, abrindo uma conexão TCP+TLS nova a cada requisição. Aqui cada host tem
+uma `requests.Session` com pool de conexões, reaproveitada por todas as
+threads/sessões do processo. Falhas transitórias (conexão, timeout, 429 e 5xx)
+são repetidas com backoff exponencial via tenacity.
+
+`estatisticas_http()` devolve, por host, contagem de requisições, erros,
+retentativas e latência.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import (
+    RetryCallState,
+    Retrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
+
+# Conexões mantidas abertas por host (threads concorrentes acima disso abrem conexões extras)
+TAMANHO_POOL = 8
+
+TENTATIVAS_HTTP = 3
+
+# Status que valem nova tentativa
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+
+class _StatusTransitorio(Exception):
+    def __init__(self, resposta: requests.Response):
+        super().__init__(f"HTTP {resposta.status_code}")
+        self.resposta = resposta
+
+
+@dataclass
+class _MetricasHost:
+    requisicoes: int = 0
+    erros: int = 0
+    retentativas: int = 0
+    latencia_total: float = 0.0
+    latencia_max: float = 0.0
+
+
+_sessoes: Dict[str, requests.Session] = {}
+_metricas: Dict[str, _MetricasHost] = {}
+_lock = threading.Lock()
+
+
+def sessao_do_host(host: str) -> requests.Session:
+    """Sessão (com pool de conexões keep-alive) dedicada a `host`."""
+    host = (host or "").lower()
+    with _lock:
+        sessao = _sessoes.get(host)
+        if sessao is None:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=TAMANHO_POOL)
+            sessao.mount("https://", adaptador)
+            sessao.mount("http://", adaptador)
+            _sessoes[host] = sessao
+        return sessao
+
+
+def _registrar(host: str, latencia: Optional[float] = None, erro: bool = False, retentativa: bool = False) -> None:
+    with _lock:
+        m = _metricas.setdefault(host, _MetricasHost())
+        if latencia is not None:
+            m.requisicoes += 1
+            m.latencia_total += latencia
+            m.latencia_max = max(m.latencia_max, latencia)
+        if erro:
+            m.erros += 1
+        if retentativa:
+            m.retentativas += 1
+
+
+def http_get(
+    url: str,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+    timeout: float = 30,
+    tentativas: int = TENTATIVAS_HTTP,
+) -> requests.Response:
+    """GET pela sessão do host, repetindo falhas transitórias com backoff exponencial.
+
+    Se todas as tentativas terminarem em 429/5xx, a última resposta é devolvida
+    (o chamador decide pelo `status_code`); erros de conexão/timeout são relançados.
+    """
+    host = urlparse(url).netloc.lower()
+    sessao = sessao_do_host(host)
+
+    def _tentativa() -> requests.Response:
+        inicio = time.perf_counter()
+        try:
+            resp = sessao.get(url, params=params, headers=headers, timeout=timeout)
+        except requests.RequestException:
+            _registrar(host, time.perf_counter() - inicio, erro=True)
+            raise
+        _registrar(host, time.perf_counter() - inicio, erro=resp.status_code >= 400)
+        if resp.status_code in STATUS_TRANSITORIOS:
+            raise _StatusTransitorio(resp)
+        return resp
+
+    def _antes_de_dormir(estado: RetryCallState) -> None:
+        _registrar(host, retentativa=True)
+
+    def _esgotado(estado: RetryCallState) -> requests.Response:
+        erro = estado.outcome.exception()
+        if isinstance(erro, _StatusTransitorio):
+            return erro.resposta
+        raise erro
+
+    return Retrying(
+        stop=stop_after_attempt(max(1, int(tentativas))),
+        wait=wait_exponential(multiplier=0.5, max=8),
+        retry=retry_if_exception_type((requests.ConnectionError, requests.Timeout, _StatusTransitorio)),
+        before_sleep=_antes_de_dormir,
+        retry_error_callback=_esgotado,
+    )(_tentativa)
+
+
+def estatisticas_http() -> pd.DataFrame:
+    """Requisições, erros, retentativas e latência (ms) por host desde o início do processo."""
+    with _lock:
+        linhas = [
+            {
+                "Host": host,
+                "Requisições": m.requisicoes,
+                "Erros": m.erros,
+                "Retentativas": m.retentativas,
+                "Latência Média (ms)": (m.latencia_total / m.requisicoes * 1000.0) if m.requisicoes else None,
+                "Latência Máx (ms)": m.latencia_max * 1000.0,
+            }
+            for host, m in sorted(_metricas.items())
+        ]
+    return pd.DataFrame(
+        linhas,
+        columns=["Host", "Requisições", "Erros", "Retentativas", "Latência Média (ms)", "Latência Máx (ms)"],
+    )
@@ -4,8 +4,9 @@ from datetime import datetime
 from typing import Iterable, List, Optional
 
 import pandas as pd
-import requests
-import yfinance as yf
+
+from modules.armazenamento import gravar_parquet_atomico, trava_dataset
+from modules.provedor_mercado import obter_provedor
 
 CACHE_PATH = os.path.join("data", "ticker_info.parquet")
 SEC_TICKER_MAP_PATH = os.path.join("data", "sec_company_tickers.parquet")
@@ -67,9 +68,17 @@ def _load_cache(path: str = CACHE_PATH) -> pd.DataFrame:
 
 
 def _save_cache(df: pd.DataFrame, path: str = CACHE_PATH) -> None:
+    """Grava o cache mesclando com o que está no disco (as linhas de `df` vencem).
+
+    Outra sessão pode ter gravado tickers depois que `df` foi carregado; relendo
+    sob a trava do arquivo, eles não se perdem.
+    """
     try:
-        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-        df.to_parquet(path, index=False)
+        with trava_dataset(path):
+            atual = _load_cache(path)
+            if not atual.empty and "Ticker" in atual.columns and "Ticker" in df.columns:
+                df = pd.concat([atual, df], ignore_index=True).drop_duplicates(subset=["Ticker"], keep="last")
+            gravar_parquet_atomico(df, path)
     except Exception:
         return
 
@@ -82,7 +91,7 @@ def _fetch_alpha_vantage_overview(symbol: str) -> dict:
     try:
         url = "https://www.alphavantage.co/query"
         params = {"function": "OVERVIEW", "symbol": symbol, "apikey": ALPHAVANTAGE_API_KEY}
-        r = requests.get(url, params=params, timeout=8)
+        r = obter_provedor().http_get(url, params=params, timeout=8)
         if r.status_code != 200:
             return {}
         data = r.json() if r.content else {}
@@ -104,7 +113,7 @@ def _fetch_fmp_profile(symbol: str) -> dict:
         return {}
     try:
         url = f"https://financialmodelingprep.com/api/v3/profile/{symbol}"
-        r = requests.get(url, params={"apikey": FMP_API_KEY}, timeout=8)
+        r = obter_provedor().http_get(url, params={"apikey": FMP_API_KEY}, timeout=8)
         if r.status_code != 200:
             return {}
         data = r.json() if r.content else []
@@ -162,8 +171,7 @@ def _load_sec_ticker_map() -> pd.DataFrame:
 
 def _save_sec_ticker_map(df: pd.DataFrame) -> None:
     try:
-        os.makedirs(os.path.dirname(SEC_TICKER_MAP_PATH) or ".", exist_ok=True)
-        df.to_parquet(SEC_TICKER_MAP_PATH, index=False)
+        gravar_parquet_atomico(df, SEC_TICKER_MAP_PATH)
     except Exception:
         return
 
@@ -186,7 +194,7 @@ def _get_sec_cik_for_ticker(ticker: str) -> Optional[str]:
     # Baixa mapa completo (cache local). Fonte: https://www.sec.gov/files/company_tickers.json
     try:
         headers = {"User-Agent": SEC_USER_AGENT, "Accept-Encoding": "gzip, deflate", "Host": "www.sec.gov"}
-        r = requests.get("https://www.sec.gov/files/company_tickers.json", headers=headers, timeout=12)
+        r = obter_provedor().http_get("https://www.sec.gov/files/company_tickers.json", headers=headers, timeout=12)
         if r.status_code != 200:
             return None
         data = r.json()
@@ -230,7 +238,7 @@ def _fetch_sec_company_sic(ticker: str) -> dict:
     try:
         headers = {"User-Agent": SEC_USER_AGENT, "Accept-Encoding": "gzip, deflate", "Host": "data.sec.gov"}
         url = f"https://data.sec.gov/submissions/CIK{cik}.json"
-        r = requests.get(url, headers=headers, timeout=12)
+        r = obter_provedor().http_get(url, headers=headers, timeout=12)
         if r.status_code != 200:
             return {}
         data = r.json() if r.content else {}
@@ -338,18 +346,14 @@ def atualizar_cache_tickers(tickers: Iterable[str], path: str = CACHE_PATH) -> p
     if not syms:
         return cache_df
 
-    try:
-        tk = yf.Tickers(" ".join(syms))
-    except Exception:
-        return cache_df
+    prov = obter_provedor()
 
     novas = []
     for t_raw, sym in mapa_yf.items():
         info = {}
         try:
-            t_obj = tk.tickers.get(sym)
-            if t_obj is not None:
-                info = t_obj.get_info() or {}
+            if sym:
+                info = prov.info(sym) or {}
         except Exception:
             info = {}
 
@@ -418,18 +422,20 @@ def atualizar_cache_tickers(tickers: Iterable[str], path: str = CACHE_PATH) -> p
     return cache_df
 
 
+def tickers_do_df(df: pd.DataFrame) -> List[str]:
+    """Candidatos a ticker de um DataFrame de origem (Ticker > Ativo > Produto)."""
+    if df is None or not isinstance(df, pd.DataFrame) or df.empty:
+        return []
+    # Preferir coluna Ticker quando existe (evita palavras do campo Produto)
+    for col in ["Ticker", "Ativo", "Produto"]:
+        if col in df.columns:
+            return df[col].dropna().astype(str).tolist()
+    return []
+
+
 def atualizar_cache_por_df(df: pd.DataFrame, path: str = CACHE_PATH) -> pd.DataFrame:
     """Extrai tickers de um DataFrame de origem e atualiza o cache."""
     if df is None or not isinstance(df, pd.DataFrame) or df.empty:
         return _load_cache(path)
 
-    candidatos = []
-    # Preferir coluna Ticker quando existe (evita palavras do campo Produto)
-    if "Ticker" in df.columns:
-        candidatos = df["Ticker"].dropna().astype(str).tolist()
-    elif "Ativo" in df.columns:
-        candidatos = df["Ativo"].dropna().astype(str).tolist()
-    elif "Produto" in df.columns:
-        candidatos = df["Produto"].dropna().astype(str).tolist()
-
-    return atualizar_cache_tickers(candidatos, path=path)
+    return atualizar_cache_tickers(tickers_do_df(df), path=path)
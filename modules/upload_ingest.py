@@ -8,23 +8,44 @@ Este módulo centraliza:
 - encaminhamento para os pipelines existentes (com deduplicações/validações atuais)
 
 A página Streamlit deve chamar `processar_uploads`.
+
+Lotes (`processar_lote`) leem os arquivos em paralelo em um pool de
+processos, acumulam os resultados em memória e gravam cada Parquet uma única
+vez, em vez de reler/regravar a base inteira a cada arquivo. O cache de
+Setor/Segmento é atualizado uma vez no fim, só com os tickers do lote.
+Arquivos já importados sem mudança (ver `modules.manifesto_ingestao`) e cópias
+idênticas no mesmo lote não são relidos. Cada item volta com o tempo gasto em
+cada etapa da leitura (ver `modules.metricas_ingestao`).
 """
 
 from __future__ import annotations
 
-import os
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable, List, Optional, Sequence, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 import pandas as pd
 
+from modules.armazenamento import trava_dataset
+from modules.base_particionada import particoes_do_df
+from modules.leitura_paralela import TIMEOUT_ARQUIVO, executar_em_paralelo
+from modules.metricas_ingestao import coletar_tempos, etapa
+from modules.manifesto_ingestao import (
+    MANIFESTO_PATH,
+    arquivo_inalterado,
+    carregar_manifesto,
+    hash_arquivo,
+    registrar_ingestao,
+    salvar_manifesto,
+)
 from modules.usuarios import carregar_usuarios
 from modules.upload_relatorio import (
     ACOES_PATH,
     PROVENTOS_PATH,
     RENDA_FIXA_PATH,
     UPLOADS_DIR,
+    VERSAO_PARSER_EXCEL,
     extrair_mes_ano_nome,
     ler_relatorio_excel,
     salvar_tipo_parquet,
@@ -32,12 +53,31 @@ from modules.upload_relatorio import (
 from modules.upload_pdf_avenue import (
     ACOES_PDF_PATH,
     DIVIDENDOS_PDF_PATH,
+    VERSAO_PARSER_PDF,
     extrair_mes_ano_pdf,
     processar_pdf_individual,
     salvar_acoes_pdf_parquet,
     salvar_dividendos_pdf_parquet,
 )
 
+# Processos de leitura em paralelo (None = número de CPUs)
+MAX_WORKERS_LOTE: Optional[int] = None
+
+CHAVES_SUBSTITUICAO = ["Mês/Ano", "Usuário"]
+
+# Datasets Excel: nome -> (caminho, dedup_subset)
+DATASETS_EXCEL: Dict[str, Tuple[str, List[str]]] = {
+    "acoes": (ACOES_PATH, ["Mês/Ano", "Usuário", "Produto"]),
+    "renda_fixa": (RENDA_FIXA_PATH, ["Mês/Ano", "Usuário", "Produto", "Código"]),
+    "proventos": (PROVENTOS_PATH, ["Mês/Ano", "Usuário", "Produto", "Data de Pagamento", "Valor Líquido"]),
+}
+
+_CAMINHOS_DATASETS: Dict[str, str] = {
+    **{nome: path for nome, (path, _dedup) in DATASETS_EXCEL.items()},
+    "acoes_pdf": ACOES_PDF_PATH,
+    "dividendos_pdf": DIVIDENDOS_PDF_PATH,
+}
+
 
 def _repo_root() -> Path:
     return Path(__file__).resolve().parents[1]
@@ -125,6 +165,7 @@ class ResultadoArquivo:
     linhas_proventos: int = 0
     linhas_dividendos: int = 0
     erro: Optional[str] = None
+    ignorado: Optional[str] = None  # ver ItemLote.ignorado
 
 
 def salvar_upload(
@@ -201,9 +242,255 @@ def processar_pdf(caminho_pdf: Path, usuario: str, mes_ano: Optional[str]) -> Tu
     return total_a, total_d
 
 
+@dataclass
+class ItemLote:
+    """Arquivo já salvo em disco, pronto para leitura no lote."""
+
+    caminho: str
+    tipo: str  # 'pdf' | 'excel'
+    usuario: str
+    mes_ano: Optional[str]
+    linhas: Dict[str, int] = field(default_factory=dict)
+    erro: Optional[str] = None
+    sha256: Optional[str] = None
+    # 'inalterado' (já no manifesto) | 'duplicado' (cópia no lote) | 'substituido' (outro Excel
+    # do lote, depois deste, grava as mesmas partições)
+    ignorado: Optional[str] = None
+    substituido_por: Optional[str] = None  # sha256 do arquivo que ficou com as partições
+    particoes: List[str] = field(default_factory=list)  # partições que o arquivo grava
+    tempos: Dict[str, float] = field(default_factory=dict)  # segundos por etapa da leitura
+    parsers: Dict[str, dict] = field(default_factory=dict)  # PDF: parser e segundos por seção
+
+
+def _ler_arquivo(
+    tipo: str, caminho: str, usuario: str, mes_ano: Optional[str], parsers: Optional[Dict[str, dict]] = None
+) -> Dict[str, pd.DataFrame]:
+    """Lê um arquivo sem gravar nada (roda nos processos do pool)."""
+    if tipo == "excel":
+        df_acoes, df_rf, df_prov = ler_relatorio_excel(str(caminho), usuario, mes_ano)
+        return {"acoes": df_acoes, "renda_fixa": df_rf, "proventos": df_prov}
+    df_acoes_pdf, df_divid_pdf = processar_pdf_individual(
+        str(caminho), usuario=usuario, mes_ano=mes_ano, parsers=parsers
+    )
+    return {"acoes_pdf": df_acoes_pdf, "dividendos_pdf": df_divid_pdf}
+
+
+def _ler_arquivo_medido(
+    tipo: str, caminho: str, usuario: str, mes_ano: Optional[str]
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, float], Dict[str, dict]]:
+    """`_ler_arquivo`, os segundos gastos por etapa (o que não é leitura nem
+    padronização conta como parse) e o parser usado em cada seção do PDF."""
+    parsers: Dict[str, dict] = {}
+    coletar_tempos()
+    with etapa("parse"):
+        frames = _ler_arquivo(tipo, caminho, usuario, mes_ano, parsers)
+    return frames, coletar_tempos(), parsers
+
+
+def _ler_itens(
+    itens: Sequence[ItemLote],
+    max_workers: Optional[int],
+    ao_progredir: Optional[Callable[[int, int], None]],
+    timeout_arquivo: Optional[float] = TIMEOUT_ARQUIVO,
+) -> List[Optional[Dict[str, pd.DataFrame]]]:
+    resultados: List[Optional[Dict[str, pd.DataFrame]]] = [None] * len(itens)
+    feitos = 0
+
+    def _concluir(i: int, medido, erro: Optional[BaseException]) -> None:
+        nonlocal feitos
+        if erro is not None:
+            itens[i].erro = str(erro)
+        else:
+            resultados[i], itens[i].tempos, itens[i].parsers = medido
+        feitos += 1
+        if ao_progredir:
+            ao_progredir(feitos, len(itens))
+
+    executar_em_paralelo(
+        _ler_arquivo_medido,
+        [(it.tipo, it.caminho, it.usuario, it.mes_ano) for it in itens],
+        max_workers=max_workers,
+        timeout=timeout_arquivo,
+        ao_concluir=_concluir,
+    )
+    return resultados
+
+
+def _ultimo_arquivo_por_chave(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatena os frames do lote; se dois arquivos trazem o mesmo (Mês/Ano, Usuário),
+    fica só o do último (como se tivessem sido gravados um após o outro)."""
+    marcados = [df.assign(_ordem_lote=n) for n, df in enumerate(frames)]
+    lote = pd.concat(marcados, ignore_index=True)
+    chaves = [c for c in CHAVES_SUBSTITUICAO if c in lote.columns]
+    if chaves:
+        ultima = lote.groupby(chaves, dropna=False)["_ordem_lote"].transform("max")
+        lote = lote[lote["_ordem_lote"] == ultima]
+    return lote.drop(columns=["_ordem_lote"])
+
+
+def _versao_parser(tipo: str) -> str:
+    return VERSAO_PARSER_EXCEL if tipo == "excel" else VERSAO_PARSER_PDF
+
+
+def processar_lote(
+    itens: Sequence[ItemLote],
+    max_workers: Optional[int] = MAX_WORKERS_LOTE,
+    ao_progredir: Optional[Callable[[int, int], None]] = None,
+    forcar: bool = False,
+    simular: bool = False,
+    tempos: Optional[Dict[str, float]] = None,
+    atualizar_tickers: bool = True,
+    timeout_arquivo: Optional[float] = TIMEOUT_ARQUIVO,
+) -> List[ItemLote]:
+    """Lê os arquivos em paralelo e grava cada dataset uma única vez.
+
+    Preenche `item.linhas` (linhas por dataset), `item.particoes`,
+    `item.tempos` (etapas da leitura), `item.erro` ou `item.ignorado` de cada
+    item. Arquivos já registrados no manifesto de ingestão com o mesmo
+    conteúdo, usuário, mês/ano e versão de parser não são relidos (a menos que
+    `forcar`), nem cópias idênticas dentro do lote. Um Excel cujas partições
+    também são gravadas por um Excel posterior do lote fica como 'substituido'.
+    `ao_progredir(feitos, total)` é chamado no processo principal a cada arquivo lido.
+    Com `simular`, lê tudo mas não grava bases, cache de tickers nem manifesto;
+    sem `atualizar_tickers`, não consulta Setor/Segmento dos tickers novos.
+    Um arquivo que fica mais de `timeout_arquivo` segundos sendo lido no pool
+    volta com `item.erro` (ver `modules.leitura_paralela`).
+    `tempos`, se informado, recebe os segundos de parede das fases do lote no
+    processo principal: 'hash', 'leitura_pool', 'gravacao' e 'tickers'.
+    """
+    itens = list(itens)
+    tempos = {} if tempos is None else tempos
+    if not itens:
+        return itens
+
+    # Manifesto: pula conteúdo já importado (mesmo usuário/mês e versão de parser)
+    inicio = time.perf_counter()
+    manifesto = carregar_manifesto()
+    vistos = set()
+    a_ler: List[ItemLote] = []
+    for item in itens:
+        try:
+            item.sha256 = hash_arquivo(item.caminho)
+        except OSError as exc:
+            item.erro = str(exc)
+            continue
+        chave = (item.sha256, item.usuario, item.mes_ano)
+        if chave in vistos:
+            item.ignorado = "duplicado"
+        elif not forcar and arquivo_inalterado(manifesto, item.sha256, _versao_parser(item.tipo), item.usuario, item.mes_ano):
+            item.ignorado = "inalterado"
+        else:
+            a_ler.append(item)
+        vistos.add(chave)
+    tempos["hash"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    lidos = _ler_itens(a_ler, max_workers, ao_progredir, timeout_arquivo)
+    tempos["leitura_pool"] = time.perf_counter() - inicio
+
+    for item, frames in zip(a_ler, lidos):
+        for nome, df in (frames or {}).items():
+            if df is not None and not df.empty:
+                item.particoes.extend(particoes_do_df(df, _CAMINHOS_DATASETS[nome]))
+
+    # Dois Excel do lote com as mesmas partições: vale o último arquivo inteiro; o
+    # anterior fica registrado como substituído (sem partições), para não voltar
+    # a ser relido e sobrescrever o vencedor na próxima execução.
+    donos: Dict[str, ItemLote] = {}
+    for item, frames in reversed(list(zip(a_ler, lidos))):
+        if frames is None or item.tipo != "excel":
+            continue
+        vencedor = next((donos[p] for p in item.particoes if p in donos), None)
+        if vencedor is not None:
+            item.ignorado = "substituido"
+            item.substituido_por = vencedor.sha256
+            item.particoes = []
+            continue
+        for p in item.particoes:
+            donos[p] = item
+
+    acumulado: Dict[str, List[pd.DataFrame]] = {}
+    for item, frames in zip(a_ler, lidos):
+        if frames is None or item.ignorado:
+            continue
+        for nome, df in frames.items():
+            if df is None or df.empty:
+                continue
+            item.linhas[nome] = len(df)
+            acumulado.setdefault(nome, []).append(df)
+    if simular:
+        return itens
+
+    inicio = time.perf_counter()
+    novos_acoes: List[pd.DataFrame] = []
+    for nome, (path, dedup_subset) in DATASETS_EXCEL.items():
+        if nome not in acumulado:
+            continue
+        df_lote = _ultimo_arquivo_por_chave(acumulado[nome])
+        salvar_tipo_parquet(
+            df_lote,
+            path,
+            chaves_substituicao=CHAVES_SUBSTITUICAO,
+            dedup_subset=dedup_subset,
+            atualizar_tickers=False,
+        )
+        if nome == "acoes":
+            novos_acoes.append(df_lote)
+
+    if "acoes_pdf" in acumulado:
+        df_lote = pd.concat(acumulado["acoes_pdf"], ignore_index=True)
+        salvar_acoes_pdf_parquet(df_lote, ACOES_PDF_PATH, atualizar_tickers=False)
+        novos_acoes.append(df_lote)
+    if "dividendos_pdf" in acumulado:
+        salvar_dividendos_pdf_parquet(pd.concat(acumulado["dividendos_pdf"], ignore_index=True), DIVIDENDOS_PDF_PATH)
+    tempos["gravacao"] = time.perf_counter() - inicio
+
+    # Setor/Segmento: uma única passada, só com os tickers que vieram no lote
+    # (o cache consulta a rede apenas para os que ainda não conhece).
+    inicio = time.perf_counter()
+    try:
+        from modules.ticker_info import atualizar_cache_tickers, tickers_do_df
+
+        candidatos = [t for df_novos in novos_acoes for t in tickers_do_df(df_novos)]
+        if candidatos and atualizar_tickers:
+            atualizar_cache_tickers(candidatos)
+    except Exception as exc:
+        print(f"Erro ao atualizar cache de tickers do lote: {exc}")
+    tempos["tickers"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    if a_ler:
+        # Relê sob a trava: outro lote pode ter registrado arquivos nesse meio tempo
+        # PDFs do lote vão juntos para as partições; nos Excel vence o último arquivo
+        shas_pdf = {it.sha256 for it, frames in zip(a_ler, lidos) if frames is not None and it.tipo == "pdf"}
+        with trava_dataset(MANIFESTO_PATH):
+            manifesto = carregar_manifesto()
+            for item, frames in zip(a_ler, lidos):
+                if frames is None:
+                    continue
+                registrar_ingestao(
+                    manifesto,
+                    item.sha256,
+                    item.caminho,
+                    _versao_parser(item.tipo),
+                    item.usuario,
+                    item.mes_ano,
+                    linhas=item.linhas,
+                    particoes=item.particoes,
+                    parsers=item.parsers or None,
+                    coautores=shas_pdf if item.tipo == "pdf" else (),
+                    substituido_por=item.substituido_por,
+                )
+            salvar_manifesto(manifesto)
+    tempos["gravacao"] += time.perf_counter() - inicio
+
+    return itens
+
+
 def processar_uploads(uploaded_files: Sequence, overwrite: bool) -> List[ResultadoArquivo]:
     """Processa uma lista de uploads (PDF/Excel) com roteamento automático."""
     resultados: List[ResultadoArquivo] = []
+    a_processar: List[Tuple[ResultadoArquivo, ItemLote]] = []
 
     for f in uploaded_files:
         nome = getattr(f, "name", "upload")
@@ -282,20 +569,17 @@ def processar_uploads(uploaded_files: Sequence, overwrite: bool) -> List[Resulta
             usuario=usuario,
             mes_ano=mes_ano,
         )
-
-        try:
-            if tipo == "excel":
-                a, rf, p = processar_excel(caminho_salvo, usuario=usuario, mes_ano=mes_ano)
-                res.linhas_acoes = a
-                res.linhas_rf = rf
-                res.linhas_proventos = p
-            else:
-                a, d = processar_pdf(caminho_salvo, usuario=usuario, mes_ano=mes_ano)
-                res.linhas_acoes = a
-                res.linhas_dividendos = d
-        except Exception as exc:
-            res.erro = str(exc)
-
         resultados.append(res)
+        a_processar.append((res, ItemLote(caminho=str(caminho_salvo), tipo=tipo, usuario=usuario, mes_ano=mes_ano)))
+
+    # Leitura em paralelo e uma gravação por dataset
+    processar_lote([item for _res, item in a_processar], forcar=overwrite)
+    for res, item in a_processar:
+        res.erro = item.erro
+        res.ignorado = item.ignorado
+        res.linhas_acoes = item.linhas.get("acoes", 0) + item.linhas.get("acoes_pdf", 0)
+        res.linhas_rf = item.linhas.get("renda_fixa", 0)
+        res.linhas_proventos = item.linhas.get("proventos", 0)
+        res.linhas_dividendos = item.linhas.get("dividendos_pdf", 0)
 
     return resultados
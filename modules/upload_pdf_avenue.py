@@ -13,6 +13,20 @@ from typing import Dict, List, Optional, Set, Tuple
 
 import pandas as pd
 
+from modules.armazenamento import trava_dataset
+from modules.base_particionada import carregar_base, gravar_base, particoes_do_df
+from modules.manifesto_ingestao import (
+    MANIFESTO_PATH,
+    arquivo_inalterado,
+    carregar_manifesto,
+    hash_arquivo,
+    registrar_ingestao,
+    salvar_manifesto,
+)
+from modules.documento_pdf import DocumentoPDF, abrir_documento
+from modules.leitura_paralela import TIMEOUT_ARQUIVO, executar_em_paralelo
+from modules.registro_parsers_pdf import ImpressaoDigital, ParserPDF, ResultadoParser, despachar, registrar_parser
+
 try:
     import pdfplumber
 except ImportError:  # pragma: no cover
@@ -21,9 +35,13 @@ except ImportError:  # pragma: no cover
 
 PDF_UPLOADS_DIR = "uploads/pdf_avenue"
 PDF_RELATORIOS_DIR = "Relatorios/Avenue"
+# Bases particionadas por usuário/mês (pastas; ver modules.base_particionada)
 ACOES_PDF_PATH = "data/acoes_avenue.parquet"
 DIVIDENDOS_PDF_PATH = "data/dividendos_avenue.parquet"
 
+# Incrementar quando a extração mudar: invalida o manifesto de ingestão dos PDFs
+VERSAO_PARSER_PDF = "1"
+
 
 # ---------------------------------------------------------------------------
 # Utilitários básicos
@@ -240,15 +258,16 @@ def _carregar_tickers_portfolio(usuario: str, mes_ano: Optional[str]) -> Set[str
     if not os.path.exists(ACOES_PDF_PATH):
         return set()
     try:
-        df = pd.read_parquet(ACOES_PDF_PATH)
+        # Só as partições do usuário/mês pedidos
+        df = carregar_base(
+            ACOES_PDF_PATH,
+            usuarios=[usuario] if usuario else None,
+            meses=[mes_ano] if mes_ano else None,
+            colunas=["Ticker"],
+        )
     except Exception:
         return set()
 
-    if not df.empty:
-        if usuario:
-            df = df[df.get("Usuário") == usuario]
-        if mes_ano:
-            df = df[df.get("Mês/Ano") == mes_ano]
     if "Ticker" not in df.columns:
         return set()
     return {
@@ -283,77 +302,93 @@ def _ticker_por_portfolio(
 # Ações
 # ---------------------------------------------------------------------------
 
-def extrair_acoes_pdf(arquivo_pdf: str, usuario: str = "Importado", mes_ano: Optional[str] = None) -> pd.DataFrame:
+def _caminho_pdf(arquivo_pdf) -> str:
+    return arquivo_pdf.caminho if isinstance(arquivo_pdf, DocumentoPDF) else arquivo_pdf
+
+
+def extrair_acoes_pdf(arquivo_pdf, usuario: str = "Importado", mes_ano: Optional[str] = None) -> pd.DataFrame:
     """
-    Extrai posições em ações de um PDF Avenue.
+    Extrai posições em ações de um PDF Avenue (caminho ou DocumentoPDF já aberto).
     
-    ⭐ VERSÃO V4 - Suporta AMBOS os formatos
-    - Formato NOVO: Doc_101579_STATEMENT_...pdf (12+ páginas)
-    - Formato ANTIGO: Stmt_YYYYMMDD.pdf (5 páginas)
-    - Auto-detecta o formato automaticamente
-    - Usa V3 para novo formato, regex para antigo
-    - 100% de precisão em ambos
+    O parser é escolhido pela impressão digital do PDF (ver `_registrar_parsers_avenue`):
+    - Formato ANTIGO: Stmt_YYYYMMDD.pdf (5 páginas), regex do V4
+    - Formato NOVO: Doc_101579_STATEMENT_...pdf (12+ páginas), parser V3
+    - Texto inline do V4 (seção EQUITIES / SECURITIES) e parser legado (texto/tabelas)
+      só se o V3 não achar posições; erro de parser sobe
     """
-    from . import upload_pdf_avenue_v4
-    import os
+    if not os.path.exists(_caminho_pdf(arquivo_pdf)):
+        raise FileNotFoundError(f"Arquivo não encontrado: {_caminho_pdf(arquivo_pdf)}")
     
-    if not os.path.exists(arquivo_pdf):
-        raise FileNotFoundError(f"Arquivo não encontrado: {arquivo_pdf}")
+    with abrir_documento(arquivo_pdf) as doc:
+        df, _despacho = despachar(doc, "acoes", usuario, mes_ano)
+    return df
+
+
+def _padronizar_acoes_v4(acoes: List[Dict]) -> ResultadoParser:
+    from . import upload_pdf_avenue_v4
+
+    df = upload_pdf_avenue_v4.acoes_para_df(acoes)
+    if df.empty:
+        return ResultadoParser(pd.DataFrame())
     
-    try:
-        # Usa o parser v4 que suporta ambos formatos
-        df = upload_pdf_avenue_v4.extrair_acoes_pdf_v4(arquivo_pdf, usuario)
-        
-        # Se vazio, retorna DataFrame com as colunas esperadas
-        if df.empty:
-            return pd.DataFrame()
-        
-        # Garante que as colunas estão no formato esperado
-        colunas_esperadas = [
-            'Produto', 'Ticker', 'Código de Negociação',
-            'Quantidade Disponível', 'Preço de Fechamento', 'Valor', 
-            'Mês/Ano', 'Usuário'
-        ]
-        
-        # Reordena colunas se necessário
-        for col in colunas_esperadas:
-            if col not in df.columns:
-                df[col] = None
-        
-        return df[colunas_esperadas]
-        
-    except Exception as e:
-        # Fallback para versão anterior em caso de erro
-        print(f"[Novo Parser] Erro ao extrair PDF {arquivo_pdf} com v3: {str(e)}")
-        print(f"[Fallback] Tentando com parser antigo...")
-        
-        # Código da versão anterior como fallback
-        if pdfplumber is None:
-            raise ImportError("pdfplumber não está instalado. Execute: pip install pdfplumber")
+    # Garante que as colunas estão no formato esperado
+    colunas_esperadas = [
+        'Produto', 'Ticker', 'Código de Negociação',
+        'Quantidade Disponível', 'Preço de Fechamento', 'Valor', 
+        'Mês/Ano', 'Usuário'
+    ]
+    for col in colunas_esperadas:
+        if col not in df.columns:
+            df[col] = None
+    return ResultadoParser(df[colunas_esperadas])
 
-        mes_ano_pdf = extrair_mes_ano_pdf(os.path.basename(arquivo_pdf))
-        mes_ano_resolvido = mes_ano or mes_ano_pdf or "01/2025"
-        if not mes_ano_pdf:
-            print(f"[Atenção] Não foi possível extrair a data do relatório do nome do arquivo '{arquivo_pdf}'. Usando '{mes_ano_resolvido}'.")
-        acoes: List[Dict] = []
 
-        with pdfplumber.open(arquivo_pdf) as pdf:
-            for page in pdf.pages:
-                texto = page.extract_text()
-                tabelas = page.extract_tables()
+def _acoes_avenue_antigo(doc: DocumentoPDF, usuario: str, mes_ano: Optional[str], _tickers: Set[str]) -> ResultadoParser:
+    from . import upload_pdf_avenue_v4
+
+    return _padronizar_acoes_v4(upload_pdf_avenue_v4.ParseadorAcoesPDFV4(usuario).extrair_formato_antigo(doc))
+
+
+def _acoes_avenue_novo(doc: DocumentoPDF, usuario: str, mes_ano: Optional[str], _tickers: Set[str]) -> ResultadoParser:
+    from . import upload_pdf_avenue_v4
+
+    resultado = _padronizar_acoes_v4(upload_pdf_avenue_v4.ParseadorAcoesPDFV4(usuario).extrair_formato_novo_v3(doc))
+    # Vazio: não achou posições no layout do V3; o texto inline / legado tentam
+    resultado.baixa_confianca = resultado.df.empty
+    return resultado
+
 
-                if tabelas:
-                    for tabela in tabelas:
-                        acoes.extend(_processar_tabela_acoes(tabela, usuario, mes_ano_resolvido))
+def _acoes_avenue_novo_texto(doc: DocumentoPDF, usuario: str, mes_ano: Optional[str], _tickers: Set[str]) -> ResultadoParser:
+    from . import upload_pdf_avenue_v4
+
+    return _padronizar_acoes_v4(upload_pdf_avenue_v4.ParseadorAcoesPDFV4(usuario).extrair_formato_novo_texto(doc))
 
-                if texto and not acoes:
-                    acoes.extend(_extrair_acoes_de_texto(texto, usuario, mes_ano_resolvido))
 
-        if not acoes:
-            return pd.DataFrame()
+def _acoes_legado(doc: DocumentoPDF, usuario: str, mes_ano: Optional[str], _tickers: Set[str]) -> ResultadoParser:
+    """Parser anterior ao V3/V4: linhas de texto e, se não render nada, tabelas."""
+    arquivo_pdf = doc.caminho
+    mes_ano_pdf = extrair_mes_ano_pdf(os.path.basename(arquivo_pdf))
+    mes_ano_resolvido = mes_ano or mes_ano_pdf or "01/2025"
+    if not mes_ano_pdf:
+        print(f"[Atenção] Não foi possível extrair a data do relatório do nome do arquivo '{arquivo_pdf}'. Usando '{mes_ano_resolvido}'.")
+    acoes: List[Dict] = []
+
+    for i in range(doc.num_paginas):
+        texto = doc.texto(i)
+        if texto and not acoes:
+            acoes.extend(_extrair_acoes_de_texto(texto, usuario, mes_ano_resolvido))
 
-        df = pd.DataFrame(acoes)
-        return df.drop_duplicates(subset=["Produto", "Ticker", "Quantidade Disponível"])
+    # Tabelas (caras de detectar) só quando o texto não rendeu nada
+    if not acoes:
+        for i in range(doc.num_paginas):
+            for tabela in doc.tabelas(i) or []:
+                acoes.extend(_processar_tabela_acoes(tabela, usuario, mes_ano_resolvido))
+
+    if not acoes:
+        return ResultadoParser(pd.DataFrame())
+
+    df = pd.DataFrame(acoes)
+    return ResultadoParser(df.drop_duplicates(subset=["Produto", "Ticker", "Quantidade Disponível"]))
 
 
 def _processar_tabela_acoes(tabela: List[List[str]], usuario: str, mes_ano: str) -> List[Dict]:
@@ -472,81 +507,69 @@ def _extrair_acoes_de_texto(texto: str, usuario: str, mes_ano: str) -> List[Dict
 # ---------------------------------------------------------------------------
 
 def extrair_dividendos_pdf(
-    arquivo_pdf: str,
+    arquivo_pdf,
     usuario: str = "Importado",
     mes_ano: Optional[str] = None,
     tickers_portfolio: Optional[Set[str]] = None,
 ) -> pd.DataFrame:
     """
-    Extrai dividendos recebidos de um PDF Avenue.
+    Extrai dividendos recebidos de um PDF Avenue (caminho ou DocumentoPDF já aberto).
     
-    ⭐ VERSÃO MELHORADA (v3) - 100% precisa para extrair todos os dividendos
-    - Suporta múltiplas linhas de descrição
-    - Suporta múltiplas páginas
-    - Tickers corretos (100% de precisão)
-    - Valores com vírgulas parseados corretamente
-    - Compatível com 100% dos PDFs (Giselle e Hudson)
+    O parser é escolhido pela impressão digital do PDF (ver `_registrar_parsers_avenue`):
+    - PDFs com linhas DIVIDEND: parser v3 melhorado (múltiplas linhas de
+      descrição e páginas, valores com vírgula)
+    - Formato ANTIGO (Stmt_YYYYMMDD.pdf) e o que o v3 não ler: parser legado
+      (texto e tabelas, tickers do portfólio)
     """
-    from . import upload_pdf_avenue_dividendos_v3_melhorado
-    import os
-    
     if pdfplumber is None:
         raise ImportError("pdfplumber não está instalado. Execute: pip install pdfplumber")
-    if not os.path.exists(arquivo_pdf):
-        raise FileNotFoundError(f"Arquivo não encontrado: {arquivo_pdf}")
-    
-    mes_ano_resolvido = mes_ano or extrair_mes_ano_pdf(os.path.basename(arquivo_pdf)) or "01/2025"
+    if not os.path.exists(_caminho_pdf(arquivo_pdf)):
+        raise FileNotFoundError(f"Arquivo não encontrado: {_caminho_pdf(arquivo_pdf)}")
     
     try:
-        # Usa o novo parser v3 melhorado
-        df = upload_pdf_avenue_dividendos_v3_melhorado.extrair_dividendos_pdf_v3(arquivo_pdf, usuario_nome=usuario)
-        
-        if not df.empty:
-            # Colunas do novo parser v3
-            colunas_v3 = ["Data Comex", "Produto", "Ticker", "Valor Bruto", "Imposto", "Valor Líquido", "Mês/Ano", "Usuário"]
-            
-            # Mapeia para formato compatível se necessário
-            if all(col in df.columns for col in colunas_v3):
-                return df
-        
-        # Se v3 retornar vazio, tenta fallback
-        if df.empty:
-            raise ValueError("Parser v3 retornou vazio")
-        
+        with abrir_documento(arquivo_pdf) as doc:
+            df, _despacho = despachar(doc, "dividendos", usuario, mes_ano, tickers_portfolio)
         return df
-        
     except Exception as e:
-        # Fallback para versão anterior em caso de erro
-        print(f"[Novo Parser] Erro ao extrair PDF {arquivo_pdf} com v3: {str(e)}")
-        print(f"[Fallback] Tentando com parser antigo...")
-        
-        try:
-            # Executa a lógica antiga
-            portfolio_set = set(tickers_portfolio or set()) | _carregar_tickers_portfolio(usuario, mes_ano_resolvido)
-            dividendos: List[Dict] = []
+        # PDF que nem abre: mesmo retorno de quando nenhum parser lê
+        print(f"Erro ao extrair dividendos de {_caminho_pdf(arquivo_pdf)}: {e}")
+        return pd.DataFrame()
 
-            with pdfplumber.open(arquivo_pdf) as pdf:
-                for page in pdf.pages:
-                    texto = page.extract_text()
-                    tabelas = page.extract_tables()
 
-                    if tabelas:
-                        for tabela in tabelas:
-                            dividendos.extend(_processar_tabela_dividendos(tabela, usuario, mes_ano_resolvido))
+def _dividendos_v3(doc: DocumentoPDF, usuario: str, mes_ano: Optional[str], _tickers: Set[str]) -> ResultadoParser:
+    from . import upload_pdf_avenue_dividendos_v3_melhorado
+
+    df = upload_pdf_avenue_dividendos_v3_melhorado.extrair_dividendos_pdf_v3(doc, usuario_nome=usuario)
+    # Vazio: o PDF tem DIVIDEND mas não no layout do v3; o legado tenta
+    return ResultadoParser(df, baixa_confianca=df.empty)
+
+
+def _dividendos_legado(
+    doc: DocumentoPDF, usuario: str, mes_ano: Optional[str], tickers_portfolio: Set[str]
+) -> ResultadoParser:
+    """Parser anterior ao v3: linhas de texto e, se não render nada, tabelas."""
+    mes_ano_resolvido = mes_ano or extrair_mes_ano_pdf(os.path.basename(doc.caminho)) or "01/2025"
+    portfolio_set = set(tickers_portfolio) | _carregar_tickers_portfolio(usuario, mes_ano_resolvido)
+    dividendos: List[Dict] = []
+
+    for i in range(doc.num_paginas):
+        texto = doc.texto(i)
+        if texto:
+            dividendos.extend(
+                _extrair_dividendos_de_texto(texto, usuario, mes_ano_resolvido, portfolio_set)
+            )
 
-                    if texto:
-                        dividendos.extend(
-                            _extrair_dividendos_de_texto(texto, usuario, mes_ano_resolvido, portfolio_set)
-                        )
+    # Tabelas (caras de detectar) só quando o texto não rendeu nada
+    if not dividendos:
+        for i in range(doc.num_paginas):
+            for tabela in doc.tabelas(i) or []:
+                dividendos.extend(_processar_tabela_dividendos(tabela, usuario, mes_ano_resolvido))
 
-            if not dividendos:
-                return pd.DataFrame()
+    if not dividendos:
+        return ResultadoParser(pd.DataFrame(), baixa_confianca=True)
 
-            df = pd.DataFrame(dividendos)
-            return df.drop_duplicates(subset=["Produto", "Data de Pagamento", "Valor Líquido"])
-        except Exception as fallback_error:
-            print(f"[Fallback] Erro ao extrair: {fallback_error}")
-            return pd.DataFrame()
+    df = pd.DataFrame(dividendos)
+    return ResultadoParser(df.drop_duplicates(subset=["Produto", "Data de Pagamento", "Valor Líquido"]))
 
 
 def _processar_tabela_dividendos(tabela: List[List[str]], usuario: str, mes_ano: str) -> List[Dict]:
@@ -773,21 +796,53 @@ def _extrair_dividendos_de_texto(
     return dividendos
 
 
+# ---------------------------------------------------------------------------
+# Registro dos parsers (ver modules.registro_parsers_pdf)
+# ---------------------------------------------------------------------------
+
+# Extrato antigo: até 5 páginas, resumo e posições na página 2
+IMPRESSAO_AVENUE_ANTIGO = ImpressaoDigital(
+    paginas_max=5,
+    ancoras_pagina=((1, ("PORTFOLIO SUMMARY", "EQUITIES / OPTIONS")),),
+)
+
+
+# Extrato novo: nome Doc_..._STATEMENT_... ou, renomeado, 12+ páginas (qualquer um basta)
+IMPRESSAO_AVENUE_NOVO_NOME = ImpressaoDigital(nome_arquivo=r"Doc_.*STATEMENT")
+IMPRESSAO_AVENUE_NOVO_PAGINAS = ImpressaoDigital(paginas_min=12)
+
+# Texto inline do V4: só lê a seção de posições do extrato novo
+IMPRESSAO_AVENUE_NOVO_TEXTO = ImpressaoDigital(ancoras=("EQUITIES / SECURITIES",))
+
+
+def _registrar_parsers_avenue() -> None:
+    """Ações: ANTIGO (regex V4) > NOVO (V3) > texto inline V4 > legado; os dois
+    últimos só rodam se os anteriores não casarem ou não acharem posições. O
+    legado não tem impressão digital: é o último recurso para layouts
+    desconhecidos. Dividendos: o ANTIGO vai direto ao legado; o v3 só pega PDFs
+    com DIVIDEND e, se não achar nada, cede ao legado."""
+    for parser in (
+        ParserPDF("avenue_antigo_posicoes", "acoes", IMPRESSAO_AVENUE_ANTIGO, _acoes_avenue_antigo, prioridade=10),
+        ParserPDF("avenue_novo_posicoes_v3", "acoes", IMPRESSAO_AVENUE_NOVO_NOME, _acoes_avenue_novo, prioridade=20),
+        ParserPDF("avenue_novo_posicoes_v3_paginas", "acoes", IMPRESSAO_AVENUE_NOVO_PAGINAS, _acoes_avenue_novo, prioridade=21),
+        ParserPDF("avenue_novo_posicoes_texto", "acoes", IMPRESSAO_AVENUE_NOVO_TEXTO, _acoes_avenue_novo_texto, prioridade=30),
+        ParserPDF("legado_posicoes", "acoes", ImpressaoDigital(), _acoes_legado, prioridade=90),
+        ParserPDF("avenue_antigo_dividendos", "dividendos", IMPRESSAO_AVENUE_ANTIGO, _dividendos_legado, prioridade=10),
+        ParserPDF("avenue_novo_dividendos_v3", "dividendos", ImpressaoDigital(ancoras=("DIVIDEND",)), _dividendos_v3, prioridade=20),
+        ParserPDF("legado_dividendos", "dividendos", ImpressaoDigital(), _dividendos_legado, prioridade=90),
+    ):
+        registrar_parser(parser)
+
+
+_registrar_parsers_avenue()
+
+
 # ---------------------------------------------------------------------------
 # Persistência
 # ---------------------------------------------------------------------------
 
-def salvar_acoes_pdf_parquet(df_acoes: pd.DataFrame, path: str = ACOES_PDF_PATH) -> pd.DataFrame:
-    if df_acoes.empty:
-        return df_acoes
-    Path(os.path.dirname(path) or ".").mkdir(parents=True, exist_ok=True)
-    existente = pd.DataFrame()
-    if os.path.exists(path):
-        try:
-            existente = pd.read_parquet(path)
-        except Exception:
-            existente = pd.DataFrame()
-    combinado = pd.concat([existente, df_acoes], ignore_index=True)
+def _mesclar_acoes_pdf(existente: pd.DataFrame, novo: pd.DataFrame) -> pd.DataFrame:
+    combinado = pd.concat([existente, novo], ignore_index=True)
     for col in ["Quantidade Disponível", "Preço de Fechamento", "Valor"]:
         if col in combinado.columns:
             combinado[col] = pd.to_numeric(combinado[col], errors="coerce")
@@ -810,10 +865,18 @@ def salvar_acoes_pdf_parquet(df_acoes: pd.DataFrame, path: str = ACOES_PDF_PATH)
 
     if "_produto_score" in combinado.columns:
         combinado = combinado.drop(columns=["_produto_score"])
+    return combinado
 
-    combinado.to_parquet(path)
+
+def salvar_acoes_pdf_parquet(df_acoes: pd.DataFrame, path: str = ACOES_PDF_PATH, atualizar_tickers: bool = True) -> pd.DataFrame:
+    """Grava ações na base particionada (só as partições usuário/mês do `df_acoes`)."""
+    if df_acoes.empty:
+        return df_acoes
+    combinado = gravar_base(df_acoes, path, _mesclar_acoes_pdf)
 
     # Atualizar cache de Setor/Segmento (yfinance) com tickers Avenue
+    if not atualizar_tickers:
+        return combinado
     try:
         from modules.ticker_info import atualizar_cache_por_df
         atualizar_cache_por_df(combinado)
@@ -822,27 +885,26 @@ def salvar_acoes_pdf_parquet(df_acoes: pd.DataFrame, path: str = ACOES_PDF_PATH)
     return combinado
 
 
-def salvar_dividendos_pdf_parquet(df_dividendos: pd.DataFrame, path: str = DIVIDENDOS_PDF_PATH) -> pd.DataFrame:
-    if df_dividendos.empty:
-        return df_dividendos
-    Path(os.path.dirname(path) or ".").mkdir(parents=True, exist_ok=True)
-    existente = pd.DataFrame()
-    if os.path.exists(path):
-        try:
-            existente = pd.read_parquet(path)
-        except Exception:
-            existente = pd.DataFrame()
-    combinado = pd.concat([existente, df_dividendos], ignore_index=True)
-    combinado = combinado.drop_duplicates(
-        subset=["Mês/Ano", "Usuário", "Produto", "Data de Pagamento", "Valor Líquido"],
-        keep="last",
-    )
+def _mesclar_dividendos_pdf(existente: pd.DataFrame, novo: pd.DataFrame) -> pd.DataFrame:
+    combinado = pd.concat([existente, novo], ignore_index=True)
+    # O parser v3 traz "Data Comex"; o antigo, "Data de Pagamento"
+    subset = [
+        c for c in ["Mês/Ano", "Usuário", "Produto", "Data de Pagamento", "Data Comex", "Valor Líquido"]
+        if c in combinado.columns
+    ]
+    combinado = combinado.drop_duplicates(subset=subset, keep="last")
     if "Valor Líquido" in combinado.columns:
         combinado["Valor Líquido"] = pd.to_numeric(combinado["Valor Líquido"], errors="coerce")
-    combinado.to_parquet(path)
     return combinado
 
 
+def salvar_dividendos_pdf_parquet(df_dividendos: pd.DataFrame, path: str = DIVIDENDOS_PDF_PATH) -> pd.DataFrame:
+    """Grava dividendos na base particionada (só as partições usuário/mês do `df_dividendos`)."""
+    if df_dividendos.empty:
+        return df_dividendos
+    return gravar_base(df_dividendos, path, _mesclar_dividendos_pdf)
+
+
 # ---------------------------------------------------------------------------
 # Processamento em lote
 # ---------------------------------------------------------------------------
@@ -851,41 +913,130 @@ def processar_pdf_individual(
     arquivo_pdf: str,
     usuario: str = "Importado",
     mes_ano: Optional[str] = None,
+    parsers: Optional[Dict[str, dict]] = None,
 ) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """Processa um PDF retornando (acoes, dividendos)."""
-    df_acoes = extrair_acoes_pdf(arquivo_pdf, usuario=usuario, mes_ano=mes_ano)
-    tickers_portfolio = set(df_acoes["Ticker"].dropna().str.upper()) if not df_acoes.empty else set()
-    df_dividendos = extrair_dividendos_pdf(
-        arquivo_pdf,
-        usuario=usuario,
-        mes_ano=mes_ano,
-        tickers_portfolio=tickers_portfolio,
-    )
+    """Processa um PDF retornando (acoes, dividendos).
+
+    O arquivo é aberto uma vez só: os parsers de ações e de dividendos
+    compartilham o texto já extraído de cada página. `parsers`, se informado,
+    recebe por seção o parser usado e os segundos gastos (`Despacho.resumo`).
+    """
+    if not os.path.exists(arquivo_pdf):
+        raise FileNotFoundError(f"Arquivo não encontrado: {arquivo_pdf}")
+    with abrir_documento(arquivo_pdf) as doc:
+        df_acoes, despacho_acoes = despachar(doc, "acoes", usuario, mes_ano)
+        tickers_portfolio = set(df_acoes["Ticker"].dropna().str.upper()) if not df_acoes.empty else set()
+        df_dividendos, despacho_dividendos = despachar(doc, "dividendos", usuario, mes_ano, tickers_portfolio)
+    if parsers is not None:
+        parsers["acoes"] = despacho_acoes.resumo()
+        parsers["dividendos"] = despacho_dividendos.resumo()
     return df_acoes, df_dividendos
 
 
-def processar_pasta_pdfs(pasta_base: str, usuario: str = "Importado") -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """Processa todos os PDFs de uma pasta (e subpastas)."""
+def _ler_pdf_lote(
+    arquivo_pdf: str, usuario: str, mes_ano: Optional[str]
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, dict]]:
+    """`processar_pdf_individual` devolvendo também os parsers usados (roda no pool)."""
+    parsers: Dict[str, dict] = {}
+    df_acoes, df_dividendos = processar_pdf_individual(arquivo_pdf, usuario, mes_ano, parsers)
+    return df_acoes, df_dividendos, parsers
+
+
+def _processar_lista_pdfs(
+    caminhos: List[str],
+    usuario: str,
+    usar_manifesto: bool,
+    max_workers: Optional[int] = None,
+    timeout_arquivo: Optional[float] = TIMEOUT_ARQUIVO,
+    salvar: bool = True,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Lê os PDFs em paralelo, pulando os já importados com o mesmo conteúdo e
+    versão de parser, e grava cada base uma única vez no fim."""
+    manifesto = carregar_manifesto() if usar_manifesto else {}
+    vistos: Set[str] = set()
+    a_ler: List[Tuple[str, Optional[str]]] = []
+    for caminho in caminhos:
+        try:
+            sha = hash_arquivo(caminho) if usar_manifesto else None
+        except OSError as e:
+            print(f"Erro ao ler {caminho}: {e}")
+            continue
+        if sha is not None:
+            if sha in vistos or arquivo_inalterado(manifesto, sha, VERSAO_PARSER_PDF, usuario, None):
+                continue
+            vistos.add(sha)
+        a_ler.append((caminho, sha))
+
+    resultados = executar_em_paralelo(
+        _ler_pdf_lote,
+        [(caminho, usuario, None) for caminho, _sha in a_ler],
+        max_workers=max_workers,
+        timeout=timeout_arquivo,
+    )
+
+    registros = []
     todas_acoes: List[pd.DataFrame] = []
     todos_div: List[pd.DataFrame] = []
-    for raiz, _dirs, files in os.walk(pasta_base):
-        for f in files:
-            if not f.lower().endswith(".pdf"):
-                continue
-            caminho = os.path.join(raiz, f)
-            try:
-                df_a, df_d = processar_pdf_individual(caminho, usuario=usuario, mes_ano=None)
-                if not df_a.empty:
-                    todas_acoes.append(df_a)
-                if not df_d.empty:
-                    todos_div.append(df_d)
-            except Exception:
-                continue
+    for (caminho, sha), (lidos, erro) in zip(a_ler, resultados):
+        if erro is not None:
+            # Um PDF com problema não derruba o lote
+            print(f"Erro ao processar {caminho}: {erro}")
+            continue
+        df_a, df_d, parsers = lidos
+        if not df_a.empty:
+            todas_acoes.append(df_a)
+        if not df_d.empty:
+            todos_div.append(df_d)
+        if sha is not None:
+            registros.append((sha, caminho, df_a, df_d, parsers))
     df_acoes = pd.concat(todas_acoes, ignore_index=True) if todas_acoes else pd.DataFrame()
     df_dividendos = pd.concat(todos_div, ignore_index=True) if todos_div else pd.DataFrame()
+
+    if salvar:
+        salvar_acoes_pdf_parquet(df_acoes, ACOES_PDF_PATH)
+        salvar_dividendos_pdf_parquet(df_dividendos, DIVIDENDOS_PDF_PATH)
+    if registros:
+        # Relê sob a trava: outro lote pode ter registrado arquivos nesse meio tempo
+        with trava_dataset(MANIFESTO_PATH):
+            manifesto = carregar_manifesto()
+            for sha, caminho, df_a, df_d, parsers in registros:
+                registrar_ingestao(
+                    manifesto, sha, caminho, VERSAO_PARSER_PDF, usuario, None,
+                    linhas={"acoes_pdf": len(df_a), "dividendos_pdf": len(df_d)},
+                    particoes=particoes_do_df(df_a, ACOES_PDF_PATH) + particoes_do_df(df_d, DIVIDENDOS_PDF_PATH),
+                    parsers=parsers,
+                    coautores={reg[0] for reg in registros},
+                )
+            salvar_manifesto(manifesto)
     return df_acoes, df_dividendos
 
 
+def processar_pasta_pdfs(
+    pasta_base: str,
+    usuario: str = "Importado",
+    usar_manifesto: bool = True,
+    max_workers: Optional[int] = None,
+    timeout_arquivo: Optional[float] = TIMEOUT_ARQUIVO,
+    salvar: bool = True,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Processa todos os PDFs de uma pasta (e subpastas).
+
+    Os PDFs são lidos em paralelo em `max_workers` processos (None = número de
+    CPUs); um PDF que falha ou passa de `timeout_arquivo` segundos é avisado e
+    pulado, sem interromper os outros. Com `salvar`, ações e dividendos do lote
+    inteiro são gravados numa única chamada a `salvar_acoes_pdf_parquet` /
+    `salvar_dividendos_pdf_parquet`. Com `usar_manifesto`, arquivos já
+    importados (mesmo conteúdo, usuário e versão de parser, partições ainda
+    gravadas) e cópias repetidas são pulados.
+    """
+    caminhos: List[str] = []
+    for raiz, _dirs, files in os.walk(pasta_base):
+        for f in files:
+            if f.lower().endswith(".pdf"):
+                caminhos.append(os.path.join(raiz, f))
+    return _processar_lista_pdfs(caminhos, usuario, usar_manifesto, max_workers, timeout_arquivo, salvar)
+
+
 def listar_pdfs_usuario(usuario: str, raiz_uploads: str = "uploads") -> List[str]:
     caminho_usuario = os.path.join(raiz_uploads, usuario)
     if not os.path.exists(caminho_usuario):
@@ -898,23 +1049,18 @@ def listar_pdfs_usuario(usuario: str, raiz_uploads: str = "uploads") -> List[str
     return sorted(pdfs)
 
 
-def processar_pdfs_usuario(usuario: str, raiz_uploads: str = "uploads") -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """Processa todos os PDFs armazenados para um usuário específico."""
-    pdfs = listar_pdfs_usuario(usuario, raiz_uploads)
-    todas_acoes: List[pd.DataFrame] = []
-    todos_div: List[pd.DataFrame] = []
-    for pdf in pdfs:
-        try:
-            df_a, df_d = processar_pdf_individual(pdf, usuario=usuario, mes_ano=None)
-            if not df_a.empty:
-                todas_acoes.append(df_a)
-            if not df_d.empty:
-                todos_div.append(df_d)
-        except Exception:
-            continue
-    df_acoes = pd.concat(todas_acoes, ignore_index=True) if todas_acoes else pd.DataFrame()
-    df_dividendos = pd.concat(todos_div, ignore_index=True) if todos_div else pd.DataFrame()
-    return df_acoes, df_dividendos
+def processar_pdfs_usuario(
+    usuario: str,
+    raiz_uploads: str = "uploads",
+    usar_manifesto: bool = True,
+    max_workers: Optional[int] = None,
+    timeout_arquivo: Optional[float] = TIMEOUT_ARQUIVO,
+    salvar: bool = True,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Processa todos os PDFs armazenados para um usuário específico (ver `processar_pasta_pdfs`)."""
+    return _processar_lista_pdfs(
+        listar_pdfs_usuario(usuario, raiz_uploads), usuario, usar_manifesto, max_workers, timeout_arquivo, salvar
+    )
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -4,11 +4,12 @@ Extrai todos os dividendos do relatório com tickers e valores corretos
 """
 
 import re
-import pdfplumber
 import pandas as pd
 from typing import Dict, List, Tuple
 from pathlib import Path
 
+from modules.documento_pdf import abrir_documento
+
 
 class ParseadorDividendosPDFV3:
     """Parser melhorado para dividendos do Avenue"""
@@ -222,17 +223,47 @@ class ParseadorDividendosPDFV3:
 
         return dividendos
 
-    def extrair_do_pdf(self, caminho_pdf: str) -> pd.DataFrame:
-        """Extrai dividendos do PDF"""
+    def _linhas_secao_dividendos(self, pdf) -> List[str]:
+        """Linhas das páginas que `_processar_secao_dividendos` usa.
+
+        Antes da primeira página com DIVIDEND não há o que ler; depois da
+        última, só até fechar o último dividendo (linha NON-QUALIFIED), que
+        pode cair na página seguinte. O resultado é o mesmo de passar o PDF
+        inteiro, sem extrair o layout das outras páginas.
+        """
+        paginas = pdf.paginas_com("DIVIDEND")
+        if not paginas:
+            return []
+
+        linhas: List[str] = []
+
+        def _adicionar(i: int) -> None:
+            texto = pdf.texto(i)
+            if texto:
+                linhas.extend(texto.split("\n"))
+
+        def _ultimo_fechado() -> bool:
+            inicios = [j for j, l in enumerate(linhas) if l.strip().startswith("DIVIDEND ")]
+            if not inicios:
+                return True
+            return any(
+                "NON-QUALIFIED" in l or l.strip().startswith("DIVIDEND ")
+                for l in linhas[inicios[-1] + 1 :]
+            )
+
+        for i in range(paginas[0], paginas[-1] + 1):
+            _adicionar(i)
+        proxima = paginas[-1] + 1
+        while proxima < pdf.num_paginas and not _ultimo_fechado():
+            _adicionar(proxima)
+            proxima += 1
+        return linhas
+
+    def extrair_do_pdf(self, caminho_pdf) -> pd.DataFrame:
+        """Extrai dividendos do PDF (caminho ou DocumentoPDF já aberto)"""
         try:
-            with pdfplumber.open(caminho_pdf) as pdf:
-                # Coleta texto de todas as páginas
-                todas_linhas = []
-                for page_num, page in enumerate(pdf.pages):
-                    texto = page.extract_text()
-                    if texto:
-                        linhas = texto.split("\n")
-                        todas_linhas.extend(linhas)
+            with abrir_documento(caminho_pdf) as pdf:
+                todas_linhas = self._linhas_secao_dividendos(pdf)
 
                 # Processa dividendos
                 dividendos = self._processar_secao_dividendos(todas_linhas)
@@ -14,6 +14,8 @@ from typing import Dict, List, Optional, Set, Tuple
 
 import pandas as pd
 
+from modules.documento_pdf import abrir_documento
+
 try:
     import pdfplumber
 except ImportError:
@@ -210,13 +212,14 @@ class AcoesTableParser(AcoesPdfParser):
         if pdfplumber is None:
             raise ImportError("pdfplumber não está instalado")
         
-        with pdfplumber.open(self.arquivo_pdf) as pdf:
-            for page_num, page in enumerate(pdf.pages):
+        with abrir_documento(self.arquivo_pdf) as pdf:
+            candidatas = set(pdf.paginas_com("PORTFOLIO SUMMARY", "EQUITIES / OPTIONS"))
+            for page_num in range(pdf.num_paginas):
                 # Procurar por tabelas nas páginas 2-4 (Portfolio Summary)
-                if page_num < 1 or page_num > 4:
+                if page_num < 1 or page_num > 4 or page_num not in candidatas:
                     continue
                 
-                text = page.extract_text()
+                text = pdf.texto(page_num)
                 if "PORTFOLIO SUMMARY" not in text and "EQUITIES / OPTIONS" not in text:
                     continue
                 
@@ -224,7 +227,7 @@ class AcoesTableParser(AcoesPdfParser):
                 self._processar_por_texto(text)
                 
                 # Depois tentar tabelas como fallback
-                tables = page.extract_tables()
+                tables = pdf.tabelas(page_num) if not self.acoes else None
                 if tables and not self.acoes:
                     for table in tables:
                         self._processar_tabela(table)
@@ -516,18 +519,19 @@ class DividendosTableParser(DividendosPdfParser):
         if pdfplumber is None:
             raise ImportError("pdfplumber não está instalado")
         
-        with pdfplumber.open(self.arquivo_pdf) as pdf:
-            for page_num, page in enumerate(pdf.pages):
+        with abrir_documento(self.arquivo_pdf) as pdf:
+            candidatas = set(pdf.paginas_com("dividend", ignorar_caixa=True))
+            for page_num in range(pdf.num_paginas):
                 # Dividendos geralmente estão nas páginas 4+
-                if page_num < 3:
+                if page_num < 3 or page_num not in candidatas:
                     continue
                 
-                text = page.extract_text()
+                text = pdf.texto(page_num)
                 if "DIVIDEND" not in text and "dividend" not in text.lower():
                     continue
                 
                 # Tentar extrair tabelas
-                tables = page.extract_tables()
+                tables = pdf.tabelas(page_num)
                 if tables:
                     for table in tables:
                         self._processar_tabela(table)
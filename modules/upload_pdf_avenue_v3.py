@@ -12,10 +12,11 @@ Padrões identificados:
 import re
 from pathlib import Path
 from typing import Optional, List, Dict
-import pdfplumber
 import pandas as pd
 from dataclasses import dataclass
 
+from modules.documento_pdf import abrir_documento
+
 
 @dataclass
 class Acao:
@@ -202,20 +203,23 @@ class ParseadorAcoesPDFV3:
         
         return acoes
     
-    def extrair_do_pdf(self, caminho_pdf: str) -> pd.DataFrame:
-        """Extrai todas as ações do PDF"""
+    def extrair_do_pdf(self, caminho_pdf) -> pd.DataFrame:
+        """Extrai todas as ações do PDF (caminho ou DocumentoPDF já aberto)"""
         acoes = []
         
-        with pdfplumber.open(caminho_pdf) as doc:
+        with abrir_documento(caminho_pdf) as doc:
             # Extrai mês/ano do nome do arquivo
-            nome_arquivo = Path(caminho_pdf).name
+            nome_arquivo = Path(doc.caminho).name
             self.mes_ano = self._extrair_mes_ano_do_nome(nome_arquivo)
             
             # Coleta TODOS os textos de EQUITIES em todas as páginas
             secao_equities_completa = ""
             
-            for page_num, page in enumerate(doc.pages):
-                text = page.extract_text()
+            # Antes da primeira página com EQUITIES o laço não faz nada: começa nela
+            candidatas = doc.paginas_com("EQUITIES")
+            inicio = candidatas[0] if candidatas else doc.num_paginas
+            for page_num in range(inicio, doc.num_paginas):
+                text = doc.texto(page_num)
                 
                 # Se encontrou EQUITIES nesta página, extrai tudo
                 if "EQUITIES" in text:
@@ -5,10 +5,11 @@ Parser V4 Corrigido - Suporta AMBOS formatos (Antigo e Novo)
 """
 
 import re
-import pdfplumber
 import pandas as pd
 from typing import Dict, List
 
+from modules.documento_pdf import DocumentoPDF, abrir_documento
+
 
 class ParseadorAcoesPDFV4:
     """Parser que auto-detecta e extrai de ambos formatos"""
@@ -30,24 +31,19 @@ class ParseadorAcoesPDFV4:
         except ValueError:
             return 0.0
 
-    def _detectar_formato(self, pdf_path: str) -> str:
+    def _detectar_formato(self, doc: DocumentoPDF) -> str:
         """Detecta se é ANTIGO (Stmt_YYYYMMDD.pdf) ou NOVO"""
-        with pdfplumber.open(pdf_path) as pdf:
-            # ANTIGO: 5 páginas, "PORTFOLIO SUMMARY" + "EQUITIES / OPTIONS" na pág 2
-            if len(pdf.pages) <= 5:
-                text_p2 = pdf.pages[1].extract_text() if len(pdf.pages) > 1 else ""
-                if "PORTFOLIO SUMMARY" in text_p2 and "EQUITIES / OPTIONS" in text_p2:
-                    return "ANTIGO"
-            
-            # NOVO: "EQUITIES / SECURITIES" em página 3+
-            for page in pdf.pages[2:]:
-                text = page.extract_text()
-                if "EQUITIES" in text and "SECURITIES" in text:
-                    return "NOVO"
+        # ANTIGO: 5 páginas, "PORTFOLIO SUMMARY" + "EQUITIES / OPTIONS" na pág 2
+        if doc.num_paginas <= 5:
+            text_p2 = doc.texto(1) if doc.num_paginas > 1 else ""
+            if "PORTFOLIO SUMMARY" in text_p2 and "EQUITIES / OPTIONS" in text_p2:
+                return "ANTIGO"
         
+        # NOVO: "EQUITIES / SECURITIES" em página 3+ (ou qualquer outro PDF:
+        # procurar a seção não muda a resposta, então nem se extrai o texto)
         return "NOVO"
 
-    def _extrair_formato_antigo(self, pdf_path: str) -> List[Dict]:
+    def extrair_formato_antigo(self, doc: DocumentoPDF) -> List[Dict]:
         """
         Extrai ações do formato antigo (Stmt_YYYYMMDD.pdf)
         Estrutura: DESCRIÇÃO TICKER CUSIP_TYPE QTY PREÇO $ VALOR ...
@@ -55,162 +51,171 @@ class ParseadorAcoesPDFV4:
         """
         acoes = []
         
-        with pdfplumber.open(pdf_path) as pdf:
-            if len(pdf.pages) < 2:
-                return acoes
-            
-            text = pdf.pages[1].extract_text()
-            linhas = text.split('\n')
+        if doc.num_paginas < 2:
+            return acoes
+        
+        text = doc.texto(1)
+        linhas = text.split('\n')
             
-            em_secao = False
-            for linha in linhas:
-                if "EQUITIES / OPTIONS" in linha:
-                    em_secao = True
-                    continue
+        em_secao = False
+        for linha in linhas:
+            if "EQUITIES / OPTIONS" in linha:
+                em_secao = True
+                continue
                 
-                if not em_secao:
-                    continue
+            if not em_secao:
+                continue
                 
-                if "Total Equities" in linha or "Total Cash" in linha:
-                    break
+            if "Total Equities" in linha or "Total Cash" in linha:
+                break
                 
-                if not linha.strip():
-                    continue
+            if not linha.strip():
+                continue
                 
-                # Regex: (.+?) = descrição, ([A-Z]{2,5}) = ticker, ([A-Z]) = cusip type,
-                #        ([\d.]+) = quantidade, ([\d.]+) = preço
-                match = re.search(r'(.+?)\s+([A-Z]{2,5})\s+([A-Z])\s+([\d.]+)\s+([\d.]+)', linha)
+            # Regex: (.+?) = descrição, ([A-Z]{2,5}) = ticker, ([A-Z]) = cusip type,
+            #        ([\d.]+) = quantidade, ([\d.]+) = preço
+            match = re.search(r'(.+?)\s+([A-Z]{2,5})\s+([A-Z])\s+([\d.]+)\s+([\d.]+)', linha)
                 
-                if match:
-                    try:
-                        descricao = match.group(1).strip()
-                        ticker = match.group(2).strip()
-                        cusip_type = match.group(3).strip()
-                        quantidade = float(match.group(4))
-                        preco = float(match.group(5))
+            if match:
+                try:
+                    descricao = match.group(1).strip()
+                    ticker = match.group(2).strip()
+                    cusip_type = match.group(3).strip()
+                    quantidade = float(match.group(4))
+                    preco = float(match.group(5))
                         
-                        # Valor está após o próximo $
-                        valor_match = re.search(r'\$\s*([\d.]+)', linha[match.end():])
-                        valor = float(valor_match.group(1)) if valor_match else 0.0
+                    # Valor está após o próximo $
+                    valor_match = re.search(r'\$\s*([\d.]+)', linha[match.end():])
+                    valor = float(valor_match.group(1)) if valor_match else 0.0
                         
-                        acao = {
-                            "Produto": descricao,
-                            "Ticker": ticker,
-                            "Código de Negociação": ticker,
-                            "Quantidade Disponível": quantidade,
-                            "Preço de Fechamento": preco,
-                            "Valor": valor,
-                            "Mês/Ano": "01/2025",
-                            "Usuário": self.usuario_nome
-                        }
-                        acoes.append(acao)
-                    except (ValueError, AttributeError):
-                        continue
+                    acao = {
+                        "Produto": descricao,
+                        "Ticker": ticker,
+                        "Código de Negociação": ticker,
+                        "Quantidade Disponível": quantidade,
+                        "Preço de Fechamento": preco,
+                        "Valor": valor,
+                        "Mês/Ano": "01/2025",
+                        "Usuário": self.usuario_nome
+                    }
+                    acoes.append(acao)
+                except (ValueError, AttributeError):
+                    continue
+        
+        return acoes
+
+    def extrair_formato_novo_v3(self, doc: DocumentoPDF) -> List[Dict]:
+        """Extrai ações do formato novo usando o parser V3 (erros sobem)"""
+        from modules.upload_pdf_avenue_v3 import ParseadorAcoesPDFV3
+        
+        acoes = []
+        parser_v3 = ParseadorAcoesPDFV3("01/2025", self.usuario_nome)
+        df_v3 = parser_v3.extrair_do_pdf(doc)
+        
+        # Converter DataFrame V3 para lista de dicts V4
+        if not df_v3.empty:
+            for _, row in df_v3.iterrows():
+                acao = {
+                    "Produto": str(row.get("Produto", "")),
+                    "Ticker": str(row.get("Ticker", "")),
+                    "Código de Negociação": str(row.get("Ticker", "")),
+                    "Quantidade Disponível": float(row.get("Quantidade Disponível", 0)),
+                    "Preço de Fechamento": float(row.get("Preço de Fechamento", 0)),
+                    "Valor": float(row.get("Valor", 0)),
+                    "Mês/Ano": str(row.get("Mês/Ano", "01/2025")),
+                    "Usuário": self.usuario_nome
+                }
+                acoes.append(acao)
         
         return acoes
 
-    def _extrair_formato_novo(self, pdf_path: str) -> List[Dict]:
+    def _extrair_formato_novo(self, doc: DocumentoPDF) -> List[Dict]:
         """
         Extrai ações do formato novo usando o parser V3
         Se V3 não disponível, usa fallback inline
         """
-        acoes = []
-        
         try:
-            # Tentar importar e usar o parser V3 que já funciona bem
-            from modules.upload_pdf_avenue_v3 import ParseadorAcoesPDFV3
-            
-            parser_v3 = ParseadorAcoesPDFV3("01/2025", self.usuario_nome)
-            df_v3 = parser_v3.extrair_do_pdf(pdf_path)
-            
-            # Converter DataFrame V3 para lista de dicts V4
-            if not df_v3.empty:
-                for _, row in df_v3.iterrows():
-                    acao = {
-                        "Produto": str(row.get("Produto", "")),
-                        "Ticker": str(row.get("Ticker", "")),
-                        "Código de Negociação": str(row.get("Ticker", "")),
-                        "Quantidade Disponível": float(row.get("Quantidade Disponível", 0)),
-                        "Preço de Fechamento": float(row.get("Preço de Fechamento", 0)),
-                        "Valor": float(row.get("Valor", 0)),
-                        "Mês/Ano": str(row.get("Mês/Ano", "01/2025")),
-                        "Usuário": self.usuario_nome
-                    }
-                    acoes.append(acao)
-            
-            return acoes
+            return self.extrair_formato_novo_v3(doc)
         except Exception as e:
             pass  # Passe para fallback
         
+        return self.extrair_formato_novo_texto(doc)
+
+    def extrair_formato_novo_texto(self, doc: DocumentoPDF) -> List[Dict]:
+        """Extração inline do formato novo (tickers conhecidos na seção EQUITIES / SECURITIES)"""
+        acoes = []
+        
         # Fallback: extração inline do formato novo
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                todas_linhas = []
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        linhas = text.split('\n')
-                        todas_linhas.extend(linhas)
+            todas_linhas = []
+            for text in doc.textos():
+                if text:
+                    linhas = text.split('\n')
+                    todas_linhas.extend(linhas)
                 
-                em_equities = False
-                for linha in todas_linhas:
-                    if "EQUITIES / SECURITIES" in linha:
-                        em_equities = True
-                        continue
+            em_equities = False
+            for linha in todas_linhas:
+                if "EQUITIES / SECURITIES" in linha:
+                    em_equities = True
+                    continue
                     
-                    if not em_equities:
-                        continue
+                if not em_equities:
+                    continue
                     
-                    if "Total Equities" in linha or "Total Portfolio" in linha:
-                        break
+                if "Total Equities" in linha or "Total Portfolio" in linha:
+                    break
                     
-                    if not linha.strip() or "---" in linha or "SYMBOL" in linha:
-                        continue
+                if not linha.strip() or "---" in linha or "SYMBOL" in linha:
+                    continue
                     
-                    # Procurar ticker
-                    ticker_match = re.search(r'\b([A-Z]{2,5})\b', linha)
-                    if ticker_match:
-                        ticker = ticker_match.group(1)
+                # Procurar ticker
+                ticker_match = re.search(r'\b([A-Z]{2,5})\b', linha)
+                if ticker_match:
+                    ticker = ticker_match.group(1)
                         
-                        if ticker in self.TICKERS_CONHECIDOS:
-                            numeros = re.findall(r'[\d.]+', linha)
+                    if ticker in self.TICKERS_CONHECIDOS:
+                        numeros = re.findall(r'[\d.]+', linha)
                             
-                            if len(numeros) >= 2:
-                                try:
-                                    acao = {
-                                        "Produto": linha.split(ticker)[0].strip() or ticker,
-                                        "Ticker": ticker,
-                                        "Código de Negociação": ticker,
-                                        "Quantidade Disponível": self._limpar_valor(numeros[0]),
-                                        "Preço de Fechamento": self._limpar_valor(numeros[1]) if len(numeros) > 1 else 0.0,
-                                        "Valor": self._limpar_valor(numeros[-1]),
-                                        "Mês/Ano": "01/2025",
-                                        "Usuário": self.usuario_nome
-                                    }
-                                    if acao["Valor"] > 0:
-                                        acoes.append(acao)
-                                except (ValueError, IndexError):
-                                    continue
+                        if len(numeros) >= 2:
+                            try:
+                                acao = {
+                                    "Produto": linha.split(ticker)[0].strip() or ticker,
+                                    "Ticker": ticker,
+                                    "Código de Negociação": ticker,
+                                    "Quantidade Disponível": self._limpar_valor(numeros[0]),
+                                    "Preço de Fechamento": self._limpar_valor(numeros[1]) if len(numeros) > 1 else 0.0,
+                                    "Valor": self._limpar_valor(numeros[-1]),
+                                    "Mês/Ano": "01/2025",
+                                    "Usuário": self.usuario_nome
+                                }
+                                if acao["Valor"] > 0:
+                                    acoes.append(acao)
+                            except (ValueError, IndexError):
+                                continue
         except Exception as e:
             print(f"❌ Erro no fallback: {e}")
         
         return acoes
 
-    def extrair(self, pdf_path: str) -> List[Dict]:
-        """Extrai ações detectando automaticamente o formato"""
-        formato = self._detectar_formato(pdf_path)
-        
-        if formato == "ANTIGO":
-            return self._extrair_formato_antigo(pdf_path)
-        else:
-            return self._extrair_formato_novo(pdf_path)
+    def extrair(self, pdf) -> List[Dict]:
+        """Extrai ações detectando automaticamente o formato (caminho ou DocumentoPDF)"""
+        with abrir_documento(pdf) as doc:
+            formato = self._detectar_formato(doc)
+            
+            if formato == "ANTIGO":
+                return self.extrair_formato_antigo(doc)
+            else:
+                return self._extrair_formato_novo(doc)
 
 
-def extrair_acoes_pdf_v4(pdf_path: str, usuario: str = "Importado") -> pd.DataFrame:
+def extrair_acoes_pdf_v4(pdf_path, usuario: str = "Importado") -> pd.DataFrame:
     """Função pública para extrair ações de qualquer formato"""
     parser = ParseadorAcoesPDFV4(usuario)
-    acoes = parser.extrair(pdf_path)
-    
+    return acoes_para_df(parser.extrair(pdf_path))
+
+
+def acoes_para_df(acoes: List[Dict]) -> pd.DataFrame:
+    """Lista de ações do parser V4 como DataFrame nas colunas padrão"""
     if acoes:
         df = pd.DataFrame(acoes)
         colunas_ordem = ["Produto", "Ticker", "Código de Negociação", 
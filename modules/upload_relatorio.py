@@ -1,60 +1,27 @@
 import os
 import re
+import numpy as np
 import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
 
+from modules.base_particionada import gravar_base
+from modules.metricas_ingestao import etapa
+from modules.parse_numeros import parse_num_misto_serie
 
-def _parse_num_misto(valor):
-    """Parse numérico tolerante a formatos pt-BR/US (milhar e decimal)."""
-    if pd.isna(valor):
-        return None
-    if isinstance(valor, (int, float)):
-        return float(valor)
-    txt = str(valor).strip()
-    if not txt:
-        return None
-    txt = txt.replace("R$", "").replace("US$", "").replace("$", "")
-    txt = txt.replace("%", "").replace("\u00a0", " ").replace(" ", "")
-    negativo = False
-    if txt.startswith("(") and txt.endswith(")"):
-        negativo = True
-        txt = txt[1:-1]
-    if txt.startswith("+"):
-        txt = txt[1:]
-    elif txt.startswith("-"):
-        negativo = True
-        txt = txt[1:]
-
-    if not txt:
-        return None
-
-    if "." in txt and "," in txt:
-        txt_norm = txt.replace(".", "").replace(",", ".")
-    elif "," in txt:
-        txt_norm = txt.replace(".", "").replace(",", ".")
-    elif "." in txt:
-        partes = txt.split(".")
-        if len(partes) > 2:
-            txt_norm = "".join(partes)
-        else:
-            if len(partes) == 2 and len(partes[1]) == 3 and partes[0].isdigit() and partes[1].isdigit():
-                txt_norm = "".join(partes)
-            else:
-                txt_norm = txt
-    else:
-        txt_norm = txt
-
-    try:
-        num = float(txt_norm)
-        return -num if negativo else num
-    except Exception:
-        return None
 
 PARQUET_PATH = "data/historico_investimentos.parquet"
+# Bases particionadas por usuário/mês (pastas; ver modules.base_particionada)
 ACOES_PATH = "data/acoes.parquet"
 RENDA_FIXA_PATH = "data/renda_fixa.parquet"
 PROVENTOS_PATH = "data/proventos.parquet"
 UPLOADS_DIR = "uploads"
 
+# Incrementar quando a leitura do Excel mudar: invalida o manifesto de ingestão
+VERSAO_PARSER_EXCEL = "1"
+
 
 def garantir_colunas(df: pd.DataFrame, colunas):
     df = df.copy()
@@ -71,8 +38,7 @@ def coerci_numericos(df: pd.DataFrame, palavras=None) -> pd.DataFrame:
     for col in df.columns:
         col_lower = str(col).lower()
         if any(p in col_lower for p in palavras):
-            df[col] = df[col].apply(_parse_num_misto)
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+            df[col] = parse_num_misto_serie(df[col])
     return df
 
 
@@ -157,13 +123,18 @@ def classificar_sheet(nome: str, df: pd.DataFrame):
     return "prov"
 
 
+_RE_TOTAL = re.compile(r"\b(?:sub)?total\b")
+
+
 def remover_totais_e_vazios(df: pd.DataFrame, colunas_essenciais) -> pd.DataFrame:
     df = df.copy()
     # Remove qualquer linha que traga palavras de totalização em qualquer coluna
-    mask_total = df.apply(
-        lambda row: any(re.search(r"\b(sub)?total\b", str(val).lower()) for val in row), axis=1
-    )
-    df = df[~mask_total]
+    # (todas as células de texto de uma vez; colunas numéricas/datas não podem conter o texto)
+    texto = df.select_dtypes(exclude=["number", "datetime", "bool"])
+    if texto.shape[1] and len(df):
+        celulas = pd.Series(texto.to_numpy().ravel(), dtype=object).astype(str).str.lower()
+        achou = celulas.str.contains(_RE_TOTAL, na=False).to_numpy().reshape(texto.shape)
+        df = df[~achou.any(axis=1)]
 
     # Exige valor presente nas colunas essenciais (evita linhas de total com produto vazio)
     if colunas_essenciais:
@@ -189,15 +160,13 @@ def criar_coluna_valor_renda_fixa(df: pd.DataFrame) -> pd.DataFrame:
     if "Valor Atualizado CURVA" in df.columns:
         mask = df["Valor"].isna() | (df["Valor"] == "") | (df["Valor"] == "-")
         df.loc[mask, "Valor"] = df.loc[mask, "Valor Atualizado CURVA"]
-    df["Valor"] = df["Valor"].apply(_parse_num_misto)
-    df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce")
+    df["Valor"] = parse_num_misto_serie(df["Valor"])
     return df
 
 
 def criar_coluna_valor_acoes(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
-    df["Valor"] = df.get("Valor Atualizado").apply(_parse_num_misto)
-    df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce")
+    df["Valor"] = parse_num_misto_serie(df.get("Valor Atualizado"))
     return df
 
 
@@ -205,8 +174,7 @@ def filtrar_linhas_ativas(df: pd.DataFrame, coluna_valor: str) -> pd.DataFrame:
     df = df.copy()
     if coluna_valor not in df.columns:
         return df.iloc[0:0]
-    df[coluna_valor] = df[coluna_valor].apply(_parse_num_misto)
-    df[coluna_valor] = pd.to_numeric(df[coluna_valor], errors="coerce")
+    df[coluna_valor] = parse_num_misto_serie(df[coluna_valor])
     df = df[df[coluna_valor].notnull() & (df[coluna_valor] > 0)]
     return df
 
@@ -222,118 +190,178 @@ def filtrar_proventos(df: pd.DataFrame, colunas_essenciais) -> pd.DataFrame:
         ):
             df = df.iloc[:-1]
     if "Valor Líquido" in df.columns:
-        df["Valor Líquido"] = df["Valor Líquido"].apply(_parse_num_misto)
-        df["Valor Líquido"] = pd.to_numeric(df["Valor Líquido"], errors="coerce")
+        df["Valor Líquido"] = parse_num_misto_serie(df["Valor Líquido"])
         df = df[df["Valor Líquido"].notnull() & (df["Valor Líquido"] > 0)]
 
     for col in ["Quantidade", "Preço unitário", "Preco unitario"]:
         if col in df.columns:
-            df[col] = df[col].apply(_parse_num_misto)
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+            df[col] = parse_num_misto_serie(df[col])
     return df
 
 
+def _valor_celula(cell):
+    """Mesma conversão do leitor openpyxl do pandas (vazio -> '', inteiros como int)."""
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        return val if val == cell.value else float(cell.value)
+    return cell.value
+
+
+def ler_celulas_excel(file) -> dict:
+    """Lê todas as abas uma única vez (openpyxl read-only) como listas de linhas.
+
+    Linhas/células vazias no fim são removidas e as linhas completadas com ''
+    até a largura máxima, como faz o `pd.read_excel`.
+    """
+    if hasattr(file, "seek"):
+        file.seek(0)
+    wb = load_workbook(file, read_only=True, data_only=True, keep_links=False)
+    try:
+        abas = {}
+        for ws in wb.worksheets:
+            ws.reset_dimensions()
+            linhas = []
+            ultima_com_dados = -1
+            for i, row in enumerate(ws.rows):
+                valores = [_valor_celula(c) for c in row]
+                while valores and valores[-1] == "":
+                    valores.pop()
+                if valores:
+                    ultima_com_dados = i
+                linhas.append(valores)
+            linhas = linhas[: ultima_com_dados + 1]
+            if linhas:
+                largura = max(len(r) for r in linhas)
+                linhas = [r + [""] * (largura - len(r)) for r in linhas]
+            abas[ws.title] = linhas
+        return abas
+    finally:
+        wb.close()
+
+
+def dataframe_de_celulas(linhas: list, header: int = 0, dtype=None) -> pd.DataFrame:
+    """DataFrame de uma aba já lida (equivalente a `pd.read_excel(..., header=, dtype=)`)."""
+    if not linhas or header >= len(linhas):
+        return pd.DataFrame()
+    try:
+        return TextParser(
+            [list(r) for r in linhas],
+            header=header,
+            dtype=dtype,
+            skip_blank_lines=False,
+        ).read()
+    except EmptyDataError:
+        return pd.DataFrame()
+
+
 def ler_relatorio_excel(file, usuario: str, mes_ano: str):
-    xls = pd.ExcelFile(file)
     df_acoes_lista = []
     df_rf_lista = []
     df_prov_lista = []
 
-    for nome in xls.sheet_names:
-        df_tmp = pd.read_excel(xls, sheet_name=nome, header=None)
-        header_row = detectar_header(df_tmp, ["produto", "valor", "quantidade", "codigo", "pagamento", "provento"])
+    # Cada aba é lida do arquivo uma única vez; cabeçalho, visão tipada e visão
+    # texto (proventos) saem das mesmas células em memória.
+    with etapa("leitura"):
+        abas = ler_celulas_excel(file)
+    for nome, linhas in abas.items():
+        header_row = detectar_header(pd.DataFrame(linhas[:8]), ["produto", "valor", "quantidade", "codigo", "pagamento", "provento"])
         if header_row is None:
             header_row = 0
-        df_sheet = pd.read_excel(xls, sheet_name=nome, header=header_row)
+        df_sheet = dataframe_de_celulas(linhas, header=header_row)
         df_sheet = limpar_colunas_duplicadas(df_sheet)
         tipo = classificar_sheet(nome, df_sheet)
 
-        # Para proventos, reler como texto para não perder milhares (ex.: '1.500' -> 1500)
+        # Para proventos, usar a visão texto para não perder milhares (ex.: '1.500' -> 1500)
         if tipo == "prov":
-            df_sheet = pd.read_excel(xls, sheet_name=nome, header=header_row, dtype=str)
+            df_sheet = dataframe_de_celulas(linhas, header=header_row, dtype=str)
             df_sheet = limpar_colunas_duplicadas(df_sheet)
 
-        if tipo == "rf":
-            df_rf = df_sheet
-            colunas_essenciais_rf = [
-                "Produto", "Instituição", "Emissor", "Código", "Indexador", "Tipo de regime", "Data de Emissão", "Vencimento",
-                "Quantidade", "Quantidade Disponível", "Quantidade Indisponível", "Motivo", "Contraparte",
-                "Preço Atualizado MTM", "Valor Atualizado MTM", "Preço Atualizado CURVA", "Valor Atualizado CURVA"
-            ]
-            for col in colunas_essenciais_rf:
-                if col not in df_rf.columns:
-                    for c in df_rf.columns:
-                        if col.lower() in str(c).lower():
-                            df_rf[col] = df_rf[c]
-            df_rf = garantir_colunas(df_rf, colunas_essenciais_rf)
-            df_rf = criar_coluna_valor_renda_fixa(df_rf)
-            df_rf["Mês/Ano"] = mes_ano
-            df_rf["Usuário"] = usuario
-            df_rf = remover_totais_e_vazios(df_rf, ["Produto", "Valor"])
-            df_rf = filtrar_linhas_ativas(df_rf, "Valor")
-            df_rf = df_rf[colunas_essenciais_rf + ["Valor", "Mês/Ano", "Usuário"]]
-            df_rf_lista.append(df_rf)
-
-        elif tipo == "acoes":
-            df_acoes = df_sheet
-            colunas_essenciais_acoes = [
-                "Produto", "Instituição", "Conta", "Código de Negociação", "CNPJ da Empresa", "Código ISIN / Distribuição",
-                "Tipo", "Escriturador", "Quantidade", "Quantidade Disponível", "Quantidade Indisponível", "Motivo",
-                "Preço de Fechamento", "Valor Atualizado"
-            ]
-            for col in colunas_essenciais_acoes:
-                if col not in df_acoes.columns:
-                    for c in df_acoes.columns:
-                        if col.lower() in str(c).lower():
-                            df_acoes[col] = df_acoes[c]
-            df_acoes = garantir_colunas(df_acoes, colunas_essenciais_acoes)
-            df_acoes = criar_coluna_valor_acoes(df_acoes)
-            df_acoes["Mês/Ano"] = mes_ano
-            df_acoes["Usuário"] = usuario
-            df_acoes = remover_totais_e_vazios(df_acoes, ["Produto", "Valor"])
-            df_acoes = filtrar_linhas_ativas(df_acoes, "Valor")
-            df_acoes = df_acoes[colunas_essenciais_acoes + ["Valor", "Mês/Ano", "Usuário"]]
-            df_acoes_lista.append(df_acoes)
-
-        elif tipo == "prov":
-            df_prov = df_sheet
-            # Proventos Recebidos: preservar também Quantidade/Preço unitário para cálculo por-ação
-            colunas_essenciais_prov = [
-                "Produto",
-                "Data de Pagamento",
-                "Tipo de Provento",
-                "Valor Líquido",
-                "Instituição",
-                "Quantidade",
-                "Preço unitário",
-            ]
-
-            # Sinônimos comuns nas planilhas
-            if "Data de Pagamento" not in df_prov.columns and "Pagamento" in df_prov.columns:
-                df_prov["Data de Pagamento"] = df_prov["Pagamento"]
-            if "Tipo de Provento" not in df_prov.columns and "Tipo de Evento" in df_prov.columns:
-                df_prov["Tipo de Provento"] = df_prov["Tipo de Evento"]
-            if "Valor Líquido" not in df_prov.columns:
-                for c in df_prov.columns:
-                    if str(c).strip().lower() == "valor líquido" or str(c).strip().lower() == "valor liquido" or str(c).strip().lower() == "valor líquido".lower():
-                        df_prov["Valor Líquido"] = df_prov[c]
-                if "Valor Líquido" not in df_prov.columns and "Valor líquido" in df_prov.columns:
-                    df_prov["Valor Líquido"] = df_prov["Valor líquido"]
-            if "Preço unitário" not in df_prov.columns:
-                for c in df_prov.columns:
-                    if str(c).strip().lower() in ["preço unitário", "preco unitario", "preco unitário", "preço unitario"]:
-                        df_prov["Preço unitário"] = df_prov[c]
-            for col in colunas_essenciais_prov:
-                if col not in df_prov.columns:
+        with etapa("padronizacao"):
+            if tipo == "rf":
+                df_rf = df_sheet
+                colunas_essenciais_rf = [
+                    "Produto", "Instituição", "Emissor", "Código", "Indexador", "Tipo de regime", "Data de Emissão", "Vencimento",
+                    "Quantidade", "Quantidade Disponível", "Quantidade Indisponível", "Motivo", "Contraparte",
+                    "Preço Atualizado MTM", "Valor Atualizado MTM", "Preço Atualizado CURVA", "Valor Atualizado CURVA"
+                ]
+                for col in colunas_essenciais_rf:
+                    if col not in df_rf.columns:
+                        for c in df_rf.columns:
+                            if col.lower() in str(c).lower():
+                                df_rf[col] = df_rf[c]
+                df_rf = garantir_colunas(df_rf, colunas_essenciais_rf)
+                df_rf = criar_coluna_valor_renda_fixa(df_rf)
+                df_rf["Mês/Ano"] = mes_ano
+                df_rf["Usuário"] = usuario
+                df_rf = remover_totais_e_vazios(df_rf, ["Produto", "Valor"])
+                df_rf = filtrar_linhas_ativas(df_rf, "Valor")
+                df_rf = df_rf[colunas_essenciais_rf + ["Valor", "Mês/Ano", "Usuário"]]
+                df_rf_lista.append(df_rf)
+
+            elif tipo == "acoes":
+                df_acoes = df_sheet
+                colunas_essenciais_acoes = [
+                    "Produto", "Instituição", "Conta", "Código de Negociação", "CNPJ da Empresa", "Código ISIN / Distribuição",
+                    "Tipo", "Escriturador", "Quantidade", "Quantidade Disponível", "Quantidade Indisponível", "Motivo",
+                    "Preço de Fechamento", "Valor Atualizado"
+                ]
+                for col in colunas_essenciais_acoes:
+                    if col not in df_acoes.columns:
+                        for c in df_acoes.columns:
+                            if col.lower() in str(c).lower():
+                                df_acoes[col] = df_acoes[c]
+                df_acoes = garantir_colunas(df_acoes, colunas_essenciais_acoes)
+                df_acoes = criar_coluna_valor_acoes(df_acoes)
+                df_acoes["Mês/Ano"] = mes_ano
+                df_acoes["Usuário"] = usuario
+                df_acoes = remover_totais_e_vazios(df_acoes, ["Produto", "Valor"])
+                df_acoes = filtrar_linhas_ativas(df_acoes, "Valor")
+                df_acoes = df_acoes[colunas_essenciais_acoes + ["Valor", "Mês/Ano", "Usuário"]]
+                df_acoes_lista.append(df_acoes)
+
+            elif tipo == "prov":
+                df_prov = df_sheet
+                # Proventos Recebidos: preservar também Quantidade/Preço unitário para cálculo por-ação
+                colunas_essenciais_prov = [
+                    "Produto",
+                    "Data de Pagamento",
+                    "Tipo de Provento",
+                    "Valor Líquido",
+                    "Instituição",
+                    "Quantidade",
+                    "Preço unitário",
+                ]
+
+                # Sinônimos comuns nas planilhas
+                if "Data de Pagamento" not in df_prov.columns and "Pagamento" in df_prov.columns:
+                    df_prov["Data de Pagamento"] = df_prov["Pagamento"]
+                if "Tipo de Provento" not in df_prov.columns and "Tipo de Evento" in df_prov.columns:
+                    df_prov["Tipo de Provento"] = df_prov["Tipo de Evento"]
+                if "Valor Líquido" not in df_prov.columns:
+                    for c in df_prov.columns:
+                        if str(c).strip().lower() == "valor líquido" or str(c).strip().lower() == "valor liquido" or str(c).strip().lower() == "valor líquido".lower():
+                            df_prov["Valor Líquido"] = df_prov[c]
+                    if "Valor Líquido" not in df_prov.columns and "Valor líquido" in df_prov.columns:
+                        df_prov["Valor Líquido"] = df_prov["Valor líquido"]
+                if "Preço unitário" not in df_prov.columns:
                     for c in df_prov.columns:
-                        if col.lower() in str(c).lower():
-                            df_prov[col] = df_prov[c]
-            df_prov = garantir_colunas(df_prov, colunas_essenciais_prov)
-            df_prov["Mês/Ano"] = mes_ano
-            df_prov["Usuário"] = usuario
-            df_prov = filtrar_proventos(df_prov, colunas_essenciais_prov)
-            df_prov = df_prov[colunas_essenciais_prov + ["Mês/Ano", "Usuário"]]
-            df_prov_lista.append(df_prov)
+                        if str(c).strip().lower() in ["preço unitário", "preco unitario", "preco unitário", "preço unitario"]:
+                            df_prov["Preço unitário"] = df_prov[c]
+                for col in colunas_essenciais_prov:
+                    if col not in df_prov.columns:
+                        for c in df_prov.columns:
+                            if col.lower() in str(c).lower():
+                                df_prov[col] = df_prov[c]
+                df_prov = garantir_colunas(df_prov, colunas_essenciais_prov)
+                df_prov["Mês/Ano"] = mes_ano
+                df_prov["Usuário"] = usuario
+                df_prov = filtrar_proventos(df_prov, colunas_essenciais_prov)
+                df_prov = df_prov[colunas_essenciais_prov + ["Mês/Ano", "Usuário"]]
+                df_prov_lista.append(df_prov)
 
     df_acoes_final = pd.concat(df_acoes_lista, ignore_index=True) if df_acoes_lista else pd.DataFrame()
     df_rf_final = pd.concat(df_rf_lista, ignore_index=True) if df_rf_lista else pd.DataFrame()
@@ -342,36 +370,37 @@ def ler_relatorio_excel(file, usuario: str, mes_ano: str):
     return df_acoes_final, df_rf_final, df_prov_final
 
 
-def salvar_tipo_parquet(df_tipo: pd.DataFrame, path: str, chaves_substituicao=None, dedup_subset=None):
-    pasta = os.path.dirname(path)
-    if not os.path.exists(pasta):
-        os.makedirs(pasta)
+def salvar_tipo_parquet(df_tipo: pd.DataFrame, path: str, chaves_substituicao=None, dedup_subset=None, atualizar_tickers=True):
+    """Grava `df_tipo` na base particionada de `path` (ver `modules.base_particionada`).
+
+    Só as partições (Usuário, Mês/Ano) presentes em `df_tipo` são relidas e
+    reescritas; a substituição e a deduplicação valem dentro de cada partição.
+    Retorna o conteúdo gravado nas partições tocadas.
+    """
     if df_tipo.empty:
         print(f"Nada para salvar em {path}")
         return df_tipo
-    existente = pd.DataFrame()
-    if os.path.exists(path):
-        try:
-            existente = pd.read_parquet(path)
-        except Exception:
-            existente = pd.DataFrame()
-    if chaves_substituicao and not existente.empty:
-        chaves_substituicao = [c for c in chaves_substituicao if c in existente.columns and c in df_tipo.columns]
-        if chaves_substituicao:
-            tuplas_novas = set(df_tipo[chaves_substituicao].itertuples(index=False, name=None))
-            existente = existente[~existente[chaves_substituicao].apply(tuple, axis=1).isin(tuplas_novas)]
-    combinado = pd.concat([existente, df_tipo], ignore_index=True)
-    combinado = coerci_numericos(combinado)
-    if dedup_subset:
-        dedup_subset = [c for c in dedup_subset if c in combinado.columns]
+
+    def _mesclar(existente: pd.DataFrame, novo: pd.DataFrame) -> pd.DataFrame:
+        if chaves_substituicao and not existente.empty:
+            chaves = [c for c in chaves_substituicao if c in existente.columns and c in novo.columns]
+            if chaves:
+                chaves_novas = pd.MultiIndex.from_frame(novo[chaves].drop_duplicates())
+                existente = existente[~pd.MultiIndex.from_frame(existente[chaves]).isin(chaves_novas)]
+        combinado = pd.concat([existente, novo], ignore_index=True)
+        combinado = coerci_numericos(combinado)
         if dedup_subset:
-            combinado = combinado.drop_duplicates(subset=dedup_subset, keep="last")
+            subset = [c for c in dedup_subset if c in combinado.columns]
+            if subset:
+                combinado = combinado.drop_duplicates(subset=subset, keep="last")
+        return combinado
+
+    combinado = gravar_base(df_tipo, path, _mesclar)
     print(f"Salvando {len(combinado)} linhas em {path}")
-    combinado.to_parquet(path)
 
     # Atualizar cache de Setor/Segmento (yfinance) apenas para Ações
     try:
-        if os.path.normpath(path) == os.path.normpath(ACOES_PATH):
+        if atualizar_tickers and os.path.normpath(path) == os.path.normpath(ACOES_PATH):
             from modules.ticker_info import atualizar_cache_por_df
             atualizar_cache_por_df(combinado)
     except Exception:
@@ -453,8 +482,7 @@ def padronizar_renda_fixa(df_rf: pd.DataFrame) -> pd.DataFrame:
     
     # Converte para numérico (tolerante a separadores)
     for col in ["Quantidade", "Quantidade Disponível", "Preço", "Valor"]:
-        resultado[col] = resultado[col].apply(_parse_num_misto)
-        resultado[col] = pd.to_numeric(resultado[col], errors="coerce")
+        resultado[col] = parse_num_misto_serie(resultado[col])
     
     return resultado
 
@@ -482,27 +510,49 @@ def padronizar_acoes(df_acoes: pd.DataFrame) -> pd.DataFrame:
     
     # Converte para numérico (tolerante a separadores)
     for col in ["Quantidade", "Quantidade Disponível", "Preço", "Valor"]:
-        resultado[col] = resultado[col].apply(_parse_num_misto)
-        resultado[col] = pd.to_numeric(resultado[col], errors="coerce")
+        resultado[col] = parse_num_misto_serie(resultado[col])
     
     return resultado
 
 
-def _is_tesouro(produto: str, codigo: str) -> bool:
-    texto = " ".join([
-        str(produto or ""),
-        str(codigo or ""),
-    ]).lower()
-    return any(pat in texto for pat in ["tesouro", "ltn", "lft", "ntn", "ntnb", "ntnf", "selic", "ipca+"])
+PADROES_TESOURO = ["tesouro", "ltn", "lft", "ntn", "ntnb", "ntnf", "selic", "ipca+"]
+PADROES_OPCAO = ["opção de compra", "opcao de compra", "opção de venda", "opcao de venda", "opção", "opcao"]
+
+# Regras de classificação do Tipo: (tipo, trechos procurados em Ativo/Ticker,
+# sem diferenciar maiúsculas). Aplicadas em ordem; a última que casar vence.
+REGRAS_TIPO_ACOES = [
+    ("Opções", PADROES_OPCAO),
+    ("Tesouro Direto", PADROES_TESOURO),
+]
+REGRAS_TIPO_RENDA_FIXA = [
+    ("Tesouro Direto", PADROES_TESOURO),
+]
+
+COLUNAS_CLASSIFICACAO = ["Ativo", "Ticker"]
 
 
-def _is_opcao(produto: str, codigo: str) -> bool:
-    """Detecta se é uma opção de compra ou venda"""
-    texto = " ".join([
-        str(produto or ""),
-        str(codigo or ""),
-    ]).lower()
-    return any(pat in texto for pat in ["opção de compra", "opcao de compra", "opção de venda", "opcao de venda", "opção", "opcao"])
+def _mascara_padroes(textos, padroes) -> pd.Series:
+    """True onde algum texto (já em minúsculas) contém algum dos `padroes`."""
+    regex = "|".join(re.escape(p) for p in padroes)
+    mascara = textos[0].str.contains(regex, regex=True)
+    for txt in textos[1:]:
+        mascara |= txt.str.contains(regex, regex=True)
+    return mascara
+
+
+def classificar_tipo(df: pd.DataFrame, tipo_padrao: str, regras) -> pd.Series:
+    """Coluna Tipo: `tipo_padrao`, sobrescrito pelas `regras` que casarem em Ativo/Ticker."""
+    tipo = pd.Series(tipo_padrao, index=df.index)
+    textos = [
+        df[col].fillna("").astype(str).str.lower()
+        for col in COLUNAS_CLASSIFICACAO
+        if col in df.columns
+    ]
+    if not textos:
+        return tipo
+    for nome, padroes in regras:
+        tipo = tipo.mask(_mascara_padroes(textos, padroes), nome)
+    return tipo
 
 
 def padronizar_tabelas(df_acoes: pd.DataFrame, df_renda_fixa: pd.DataFrame) -> pd.DataFrame:
@@ -521,17 +571,9 @@ def padronizar_tabelas(df_acoes: pd.DataFrame, df_renda_fixa: pd.DataFrame) -> p
     
     # Adiciona coluna de tipo
     if not df_acoes_pad.empty:
-        df_acoes_pad["Tipo"] = "Ações"
-        # Classificar opções primeiro
-        mask_opcao = df_acoes_pad.apply(lambda r: _is_opcao(r.get("Ativo"), r.get("Ticker")), axis=1)
-        df_acoes_pad.loc[mask_opcao, "Tipo"] = "Opções"
-        # Depois classificar tesouro direto
-        mask_td_acoes = df_acoes_pad.apply(lambda r: _is_tesouro(r.get("Ativo"), r.get("Ticker")), axis=1)
-        df_acoes_pad.loc[mask_td_acoes, "Tipo"] = "Tesouro Direto"
+        df_acoes_pad["Tipo"] = classificar_tipo(df_acoes_pad, "Ações", REGRAS_TIPO_ACOES)
     if not df_rf_pad.empty:
-        df_rf_pad["Tipo"] = "Renda Fixa"
-        mask_td_rf = df_rf_pad.apply(lambda r: _is_tesouro(r.get("Ativo"), r.get("Ticker")), axis=1)
-        df_rf_pad.loc[mask_td_rf, "Tipo"] = "Tesouro Direto"
+        df_rf_pad["Tipo"] = classificar_tipo(df_rf_pad, "Renda Fixa", REGRAS_TIPO_RENDA_FIXA)
     
     # Consolida
     consolidado = pd.concat([df_acoes_pad, df_rf_pad], ignore_index=True)
@@ -578,39 +620,32 @@ def padronizar_dividendos(df_proventos: pd.DataFrame) -> pd.DataFrame:
 
     # Quantidade (quando disponível no relatório)
     if "Quantidade" in df.columns:
-        resultado["Quantidade"] = df.get("Quantidade").apply(_parse_num_misto)
-        resultado["Quantidade"] = pd.to_numeric(resultado["Quantidade"], errors="coerce")
+        resultado["Quantidade"] = parse_num_misto_serie(df.get("Quantidade"))
     else:
         resultado["Quantidade"] = pd.NA
 
     # Preço unitário (quando disponível no relatório)
     if "Preço unitário" in df.columns:
-        resultado["Preço unitário"] = df.get("Preço unitário").apply(_parse_num_misto)
-        resultado["Preço unitário"] = pd.to_numeric(resultado["Preço unitário"], errors="coerce")
+        resultado["Preço unitário"] = parse_num_misto_serie(df.get("Preço unitário"))
     elif "Preco unitario" in df.columns:
-        resultado["Preço unitário"] = df.get("Preco unitario").apply(_parse_num_misto)
-        resultado["Preço unitário"] = pd.to_numeric(resultado["Preço unitário"], errors="coerce")
+        resultado["Preço unitário"] = parse_num_misto_serie(df.get("Preco unitario"))
     else:
         resultado["Preço unitário"] = pd.NA
     
     # Valor Bruto (se não existir, assume igual ao Valor Líquido)
     if "Valor Bruto" in df.columns:
-        resultado["Valor Bruto"] = df.get("Valor Bruto").apply(_parse_num_misto)
-        resultado["Valor Bruto"] = pd.to_numeric(resultado["Valor Bruto"], errors="coerce")
+        resultado["Valor Bruto"] = parse_num_misto_serie(df.get("Valor Bruto"))
     else:
-        resultado["Valor Bruto"] = df.get("Valor Líquido").apply(_parse_num_misto)
-        resultado["Valor Bruto"] = pd.to_numeric(resultado["Valor Bruto"], errors="coerce")
+        resultado["Valor Bruto"] = parse_num_misto_serie(df.get("Valor Líquido"))
     
     # Impostos (se não existir, assume 0)
     if "Impostos" in df.columns:
-        resultado["Impostos"] = df.get("Impostos").apply(_parse_num_misto)
-        resultado["Impostos"] = pd.to_numeric(resultado["Impostos"], errors="coerce").fillna(0)
+        resultado["Impostos"] = parse_num_misto_serie(df.get("Impostos")).fillna(0)
     else:
         resultado["Impostos"] = 0.0
     
     # Valor Líquido
-    resultado["Valor Líquido"] = df.get("Valor Líquido").apply(_parse_num_misto)
-    resultado["Valor Líquido"] = pd.to_numeric(resultado["Valor Líquido"], errors="coerce")
+    resultado["Valor Líquido"] = parse_num_misto_serie(df.get("Valor Líquido"))
     
     # Usuário
     if "Usuário" in df.columns:
@@ -1,6 +1,8 @@
 import pandas as pd
 import os
 
+from modules.armazenamento import gravar_parquet_atomico
+
 USUARIOS_PATH = "data/usuarios.parquet"
 
 def carregar_usuarios():
@@ -10,4 +12,4 @@ def carregar_usuarios():
         return pd.DataFrame(columns=["Nome", "CPF"])
 
 def salvar_usuarios(df_usuarios):
-    df_usuarios.to_parquet(USUARIOS_PATH)
+    gravar_parquet_atomico(df_usuarios, USUARIOS_PATH, index=None)
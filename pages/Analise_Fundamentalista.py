@@ -8,8 +8,7 @@ from io import BytesIO
 import contextlib
 import io
 
-import yfinance as yf
-
+from modules.provedor_mercado import obter_provedor
 from modules.ticker_info import (
     CACHE_PATH as TICKER_INFO_PATH,
     _load_cache as _load_ticker_info_cache,
@@ -246,8 +245,8 @@ def _validar_tickers_em_lote(tickers_display: tuple[str, ...]) -> list[str]:
     try:
         # yfinance pode imprimir mensagens no console; suprimimos para não poluir logs do Streamlit.
         with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
-            df = yf.download(
-                tickers=yf_list,
+            df = obter_provedor().download(
+                yf_list,
                 period="5d",
                 interval="1d",
                 group_by="ticker",
@@ -708,7 +707,7 @@ def _build_indicators_periodic(
 @st.cache_data(ttl=600, show_spinner=False)
 def _yf_info(ticker_yf: str) -> dict:
     try:
-        return yf.Ticker(ticker_yf).info or {}
+        return obter_provedor().info(ticker_yf) or {}
     except Exception:
         return {}
 
@@ -716,7 +715,7 @@ def _yf_info(ticker_yf: str) -> dict:
 @st.cache_data(ttl=600, show_spinner=False)
 def _yf_history_price(ticker_yf: str, period: str) -> pd.DataFrame:
     try:
-        df = yf.Ticker(ticker_yf).history(period=period, auto_adjust=False)
+        df = obter_provedor().historico(ticker_yf, period=period, auto_adjust=False)
         if df is None or df.empty:
             return pd.DataFrame()
         df = df.reset_index().rename(columns={"Date": "Data"})
@@ -731,7 +730,7 @@ def _yf_history_price(ticker_yf: str, period: str) -> pd.DataFrame:
 @st.cache_data(ttl=600, show_spinner=False)
 def _yf_dividends(ticker_yf: str) -> pd.DataFrame:
     try:
-        s = yf.Ticker(ticker_yf).dividends
+        s = obter_provedor().atributo(ticker_yf, "dividends")
         if s is None or len(s) == 0:
             return pd.DataFrame(columns=["Data", "Dividendo"])
         df = s.reset_index()
@@ -748,7 +747,7 @@ def _yf_dividends(ticker_yf: str) -> pd.DataFrame:
 @st.cache_data(ttl=3600, show_spinner=False)
 def _yf_statements(ticker_yf: str) -> dict:
     """Busca demonstrativos anuais e trimestrais disponíveis via yfinance."""
-    tk = yf.Ticker(ticker_yf)
+    prov = obter_provedor()
 
     out = {
         "income_annual": pd.DataFrame(),
@@ -776,7 +775,7 @@ def _yf_statements(ticker_yf: str) -> dict:
     for key, attrs in attr_candidates.items():
         for attr in attrs:
             try:
-                df = getattr(tk, attr)
+                df = prov.atributo(ticker_yf, attr)
                 if isinstance(df, pd.DataFrame) and not df.empty:
                     out[key] = df
                     break
@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
+from modules.provedor_mercado import obter_provedor
 import plotly.express as px
 from modules.upload_relatorio import carregar_historico_parquet
 
@@ -82,8 +82,7 @@ if (not isinstance(st.session_state.get("im_data"), dict)) or (st.session_state.
                 ticker_sel = ticker_in.upper()
 
             try:
-                tk = yf.Ticker(ticker_sel)
-                hist = tk.history(period="1y")
+                hist = obter_provedor().historico(ticker_sel, period="1y")
                 data["ticker_sel"] = ticker_sel
                 data["hist"] = hist
             except Exception as e:
@@ -95,7 +94,7 @@ if (not isinstance(st.session_state.get("im_data"), dict)) or (st.session_state.
         if comp_txt:
             lista_tickers = [t.strip() for t in comp_txt.split(",") if t.strip()]
             try:
-                df_comp = yf.download(lista_tickers, period="1y")["Close"]
+                df_comp = obter_provedor().download(lista_tickers, period="1y")["Close"]
                 data["df_comp"] = df_comp
             except Exception as e:
                 data["df_comp_error"] = str(e)
@@ -103,14 +102,14 @@ if (not isinstance(st.session_state.get("im_data"), dict)) or (st.session_state.
         # Painel de moedas
         try:
             moedas = ["USDBRL=X", "EURBRL=X"]
-            df_moedas = yf.download(moedas, period="1mo")["Close"]
+            df_moedas = obter_provedor().download(moedas, period="1mo")["Close"]
             data["df_moedas"] = df_moedas
         except Exception as e:
             data["df_moedas_error"] = str(e)
 
         # Ranking
         try:
-            df_rank = yf.download(tickers_populares, period="5d")["Close"]
+            df_rank = obter_provedor().download(tickers_populares, period="5d")["Close"]
             var = df_rank.iloc[-1] / df_rank.iloc[0] - 1
             df_var = pd.DataFrame({"Ticker": var.index, "Variação (%)": var.values * 100})
             df_var = df_var.sort_values("Variação (%)", ascending=False)
@@ -5,6 +5,7 @@ from datetime import datetime
 
 try:
     from modules.upload_relatorio import ACOES_PATH, RENDA_FIXA_PATH, PROVENTOS_PATH
+    from modules.base_particionada import carregar_base
     tem_upload_relatorio = True
 except:
     tem_upload_relatorio = False
@@ -795,22 +796,22 @@ elif tem_upload_relatorio and indice_selecionado == "📥 Upload de Relatórios"
     col1, col2, col3 = st.columns(3)
     with col1:
         if os.path.exists(ACOES_PATH):
-            df = pd.read_parquet(ACOES_PATH)
-            st.metric("Snapshots de Ações", len(df["Mês/Ano"].unique()))
+            df = carregar_base(ACOES_PATH, colunas=["Mês/Ano"])
+            st.metric("Snapshots de Ações", df["Mês/Ano"].nunique() if "Mês/Ano" in df.columns else 0)
             st.info(f"Linhas totais: {len(df)}")
         else:
             st.warning("Sem dados de Ações")
     with col2:
         if os.path.exists(RENDA_FIXA_PATH):
-            df = pd.read_parquet(RENDA_FIXA_PATH)
-            st.metric("Snapshots de Renda Fixa", len(df["Mês/Ano"].unique()))
+            df = carregar_base(RENDA_FIXA_PATH, colunas=["Mês/Ano"])
+            st.metric("Snapshots de Renda Fixa", df["Mês/Ano"].nunique() if "Mês/Ano" in df.columns else 0)
             st.info(f"Linhas totais: {len(df)}")
         else:
             st.warning("Sem dados de Renda Fixa")
     with col3:
         if os.path.exists(PROVENTOS_PATH):
-            df = pd.read_parquet(PROVENTOS_PATH)
-            st.metric("Meses de Proventos", len(df["Mês/Ano"].unique()))
+            df = carregar_base(PROVENTOS_PATH, colunas=["Mês/Ano"])
+            st.metric("Meses de Proventos", df["Mês/Ano"].nunique() if "Mês/Ano" in df.columns else 0)
             st.info(f"Linhas totais: {len(df)}")
         else:
             st.warning("Sem dados de Proventos")
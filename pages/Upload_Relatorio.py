@@ -4,6 +4,9 @@ import pandas as pd
 import os
 import importlib
 import modules.upload_relatorio as ur
+from modules.upload_ingest import ItemLote, processar_lote
+from modules.leitura_paralela import TIMEOUT_ARQUIVO
+from modules.base_particionada import carregar_base, meses_base, particoes_base
 from modules.usuarios import carregar_usuarios
 from modules.upload_pdf_avenue import (
     processar_pdf_individual, processar_pasta_pdfs, processar_pdfs_usuario,
@@ -51,9 +54,9 @@ with tab_excel:
             disabled=usar_subpasta_usuario,
             help="Se desligar a opção acima, este usuário será usado para todos os arquivos",
         )
-        processar_lote = st.button("🚀 Processar pasta", use_container_width=True)
+        btn_processar_pasta = st.button("🚀 Processar pasta", use_container_width=True)
 
-        if processar_lote:
+        if btn_processar_pasta:
             if not os.path.isdir(pasta_base):
                 st.error("Pasta inválida. Ajuste o caminho e tente novamente.")
             else:
@@ -61,6 +64,7 @@ with tab_excel:
                 skip_sem_mes = []
                 skip_sem_usuario = []
                 skip_ja_processado = []
+                skip_inalterados = []
                 arquivos = []
                 for raiz, _dirs, files in os.walk(pasta_base):
                     for f in files:
@@ -72,63 +76,44 @@ with tab_excel:
                 if not arquivos:
                     st.warning("Nenhum arquivo .xlsx encontrado na pasta.")
                 else:
-                    progress = st.progress(0.0)
-                    for i, caminho in enumerate(arquivos, 1):
+                    # Chaves (Mês/Ano, Usuário) já gravadas: vêm dos nomes das partições
+                    chaves_existentes = set()
+                    if not sobrescrever_lote:
+                        chaves_existentes = {(mes, usuario) for usuario, mes in particoes_base(ACOES_PATH)}
+
+                    itens_lote = []
+                    for caminho in arquivos:
                         user_atual = os.path.basename(os.path.dirname(caminho)) if usar_subpasta_usuario else usuario_lote
                         if not user_atual:
                             skip_sem_usuario.append(caminho)
-                            progress.progress(i / len(arquivos))
                             continue
                         mes_ano = extrair_mes_ano_nome(os.path.basename(caminho))
                         if not mes_ano:
                             skip_sem_mes.append(caminho)
-                            progress.progress(i / len(arquivos))
                             continue
-                        
-                        # Verificar se já existe e não deve sobrescrever
-                        if not sobrescrever_lote:
-                            ja_existe = False
-                            if os.path.exists(ACOES_PATH):
-                                df_check = pd.read_parquet(ACOES_PATH)
-                                ja_existe = not df_check[
-                                    (df_check["Mês/Ano"] == mes_ano) & 
-                                    (df_check["Usuário"] == user_atual)
-                                ].empty
-                            if ja_existe:
-                                skip_ja_processado.append(caminho)
-                                progress.progress(i / len(arquivos))
-                                continue
-                        
-                        try:
-                            df_acoes, df_rf, df_prov = ler_relatorio_excel(caminho, user_atual, mes_ano)
-                            salvar_arquivo_upload_path(caminho, user_atual, mes_ano)
-                            if not df_acoes.empty:
-                                salvar_tipo_parquet(
-                                    df_acoes,
-                                    ACOES_PATH,
-                                    chaves_substituicao=["Mês/Ano", "Usuário"],
-                                    dedup_subset=["Mês/Ano", "Usuário", "Produto"],
-                                )
-                                total_a += len(df_acoes)
-                            if not df_rf.empty:
-                                salvar_tipo_parquet(
-                                    df_rf,
-                                    RENDA_FIXA_PATH,
-                                    chaves_substituicao=["Mês/Ano", "Usuário"],
-                                    dedup_subset=["Mês/Ano", "Usuário", "Produto", "Código"],
-                                )
-                                total_rf += len(df_rf)
-                            if not df_prov.empty:
-                                salvar_tipo_parquet(
-                                    df_prov,
-                                    PROVENTOS_PATH,
-                                    chaves_substituicao=["Mês/Ano", "Usuário"],
-                                    dedup_subset=["Mês/Ano", "Usuário", "Produto", "Data de Pagamento", "Valor Líquido"],
-                                )
-                                total_p += len(df_prov)
-                        except Exception as exc:
-                            st.warning(f"Falha ao processar {caminho}: {exc}")
-                        progress.progress(i / len(arquivos))
+                        if (mes_ano, user_atual) in chaves_existentes:
+                            skip_ja_processado.append(caminho)
+                            continue
+                        itens_lote.append(ItemLote(caminho=caminho, tipo="excel", usuario=user_atual, mes_ano=mes_ano))
+
+                    progress = st.progress(0.0)
+                    processar_lote(
+                        itens_lote,
+                        ao_progredir=lambda feitos, total: progress.progress(feitos / total),
+                        forcar=sobrescrever_lote,
+                    )
+                    progress.progress(1.0)
+                    for item in itens_lote:
+                        if item.erro:
+                            st.warning(f"Falha ao processar {item.caminho}: {item.erro}")
+                            continue
+                        if item.ignorado:
+                            skip_inalterados.append(item.caminho)
+                            continue
+                        salvar_arquivo_upload_path(item.caminho, item.usuario, item.mes_ano)
+                        total_a += item.linhas.get("acoes", 0)
+                        total_rf += item.linhas.get("renda_fixa", 0)
+                        total_p += item.linhas.get("proventos", 0)
 
                     st.success(f"Lote concluído. Ações: {total_a}, Renda Fixa: {total_rf}, Proventos: {total_p}")
                     if skip_sem_mes:
@@ -140,6 +125,9 @@ with tab_excel:
                     if skip_ja_processado:
                         st.info(f"Arquivos já processados (ignorados): {len(skip_ja_processado)}")
                         st.caption("\n".join(skip_ja_processado))
+                    if skip_inalterados:
+                        st.info(f"Arquivos sem mudança desde a última importação ou repetidos (ignorados): {len(skip_inalterados)}")
+                        st.caption("\n".join(skip_inalterados))
 
     # Visualizar histórico existente
     with st.expander("📈 Consultar histórico (sem novo upload)"):
@@ -147,11 +135,10 @@ with tab_excel:
         # Ações
         with cols_hist[0]:
             if os.path.exists(ACOES_PATH):
-                df_hist = pd.read_parquet(ACOES_PATH)
-                meses = sorted(df_hist["Mês/Ano"].dropna().unique()) if not df_hist.empty else []
+                meses = meses_base(ACOES_PATH)
                 if meses:
                     mes_sel = st.selectbox("Mês/Ano", meses, index=len(meses) - 1, key="hist_acoes_mes")
-                    df_view = df_hist[df_hist["Mês/Ano"] == mes_sel]
+                    df_view = carregar_base(ACOES_PATH, meses=[mes_sel])
                     st.metric("Valor total", df_view["Valor"].sum())
                     st.dataframe(df_view, use_container_width=True)
                 else:
@@ -161,11 +148,10 @@ with tab_excel:
         # Renda Fixa
         with cols_hist[1]:
             if os.path.exists(RENDA_FIXA_PATH):
-                df_hist = pd.read_parquet(RENDA_FIXA_PATH)
-                meses = sorted(df_hist["Mês/Ano"].dropna().unique()) if not df_hist.empty else []
+                meses = meses_base(RENDA_FIXA_PATH)
                 if meses:
                     mes_sel = st.selectbox("Mês/Ano", meses, index=len(meses) - 1, key="hist_rf_mes")
-                    df_view = df_hist[df_hist["Mês/Ano"] == mes_sel]
+                    df_view = carregar_base(RENDA_FIXA_PATH, meses=[mes_sel])
                     st.metric("Valor total", df_view["Valor"].sum())
                     st.dataframe(df_view, use_container_width=True)
                 else:
@@ -175,14 +161,14 @@ with tab_excel:
         # Proventos
         with cols_hist[2]:
             if os.path.exists(PROVENTOS_PATH):
-                df_hist = pd.read_parquet(PROVENTOS_PATH)
-                meses = sorted(df_hist["Mês/Ano"].dropna().unique()) if not df_hist.empty else []
+                meses = meses_base(PROVENTOS_PATH)
                 if meses:
                     mes_sel = st.selectbox("Mês/Ano", meses, index=len(meses) - 1, key="hist_prov_mes")
-                    df_view = df_hist[df_hist["Mês/Ano"] == mes_sel]
+                    df_view = carregar_base(PROVENTOS_PATH, meses=[mes_sel])
                     st.metric("Total do mês", df_view["Valor Líquido"].sum())
                     st.dataframe(df_view, use_container_width=True)
                     st.markdown("---")
+                    df_hist = carregar_base(PROVENTOS_PATH, colunas=["Mês/Ano", "Valor Líquido"])
                     agrupado = df_hist.groupby("Mês/Ano")["Valor Líquido"].sum().reset_index().sort_values("Mês/Ano")
                     st.bar_chart(agrupado.set_index("Mês/Ano"))
                 else:
@@ -379,21 +365,21 @@ with tab_excel:
     
         with col1:
             if os.path.exists(ACOES_PATH):
-                df_temp = pd.read_parquet(ACOES_PATH)
+                df_temp = carregar_base(ACOES_PATH, colunas=["Mês/Ano"])
                 st.info(f"**Ações**\n\n{len(df_temp)} linhas")
             else:
                 st.warning("Sem dados de Ações")
     
         with col2:
             if os.path.exists(RENDA_FIXA_PATH):
-                df_temp = pd.read_parquet(RENDA_FIXA_PATH)
+                df_temp = carregar_base(RENDA_FIXA_PATH, colunas=["Mês/Ano"])
                 st.info(f"**Renda Fixa**\n\n{len(df_temp)} linhas")
             else:
                 st.warning("Sem dados de Renda Fixa")
     
         with col3:
             if os.path.exists(PROVENTOS_PATH):
-                df_temp = pd.read_parquet(PROVENTOS_PATH)
+                df_temp = carregar_base(PROVENTOS_PATH, colunas=["Mês/Ano"])
                 st.info(f"**Proventos**\n\n{len(df_temp)} linhas")
             else:
                 st.warning("Sem dados de Proventos")
@@ -437,6 +423,21 @@ with tab_pdf:
             help="Se desligar a opção acima, este usuário será usado para todos os arquivos",
             key="pdf_user_default"
         )
+        col_workers_pdf, col_timeout_pdf = st.columns(2)
+        workers_lote_pdf = col_workers_pdf.number_input(
+            "Processos em paralelo",
+            min_value=1,
+            value=os.cpu_count() or 1,
+            key="pdf_workers_lote",
+        )
+        timeout_lote_pdf = col_timeout_pdf.number_input(
+            "Tempo máximo por PDF (s)",
+            min_value=10,
+            value=int(TIMEOUT_ARQUIVO or 300),
+            step=30,
+            help="PDF que passar desse tempo é pulado e avisado; os outros continuam",
+            key="pdf_timeout_lote",
+        )
         processar_lote_pdf = st.button("🚀 Processar pasta", use_container_width=True, key="btn_lote_pdf")
         
         if processar_lote_pdf:
@@ -445,6 +446,7 @@ with tab_pdf:
             else:
                 total_acoes = total_divid = 0
                 skip_sem_usuario = []
+                skip_inalterados = []
                 arquivos = []
                 for raiz, _dirs, files in os.walk(pasta_base_pdf):
                     for f in files:
@@ -456,12 +458,11 @@ with tab_pdf:
                 if not arquivos:
                     st.warning("Nenhum arquivo .pdf encontrado na pasta.")
                 else:
-                    progress = st.progress(0.0)
-                    for i, caminho in enumerate(arquivos, 1):
+                    itens_lote = []
+                    for caminho in arquivos:
                         user_atual = os.path.basename(os.path.dirname(caminho)) if usar_subpasta_usuario_pdf else usuario_lote_pdf
                         if not user_atual:
                             skip_sem_usuario.append(caminho)
-                            progress.progress(i / len(arquivos))
                             continue
                         try:
                             destino_pdf, status_save = salvar_pdf_relatorio_path(
@@ -469,27 +470,37 @@ with tab_pdf:
                                 overwrite=sobrescrever_lote_pdf,
                                 usuario=user_atual,
                             )
-                            if status_save == "skipped_exists" or not destino_pdf:
-                                progress.progress(i / len(arquivos))
-                                continue
-
-                            df_acoes_pdf, df_divid_pdf = processar_pdf_individual(destino_pdf, usuario=user_atual, mes_ano=None)
-                            
-                            if not df_acoes_pdf.empty:
-                                salvar_acoes_pdf_parquet(df_acoes_pdf, ACOES_PDF_PATH)
-                                total_acoes += len(df_acoes_pdf)
-                            
-                            if not df_divid_pdf.empty:
-                                salvar_dividendos_pdf_parquet(df_divid_pdf, DIVIDENDOS_PDF_PATH)
-                                total_divid += len(df_divid_pdf)
                         except Exception as exc:
                             st.warning(f"Falha ao processar {caminho}: {exc}")
-                        progress.progress(i / len(arquivos))
-                    
+                            continue
+                        if status_save == "skipped_exists" or not destino_pdf:
+                            continue
+                        itens_lote.append(ItemLote(caminho=str(destino_pdf), tipo="pdf", usuario=user_atual, mes_ano=None))
+
+                    progress = st.progress(0.0)
+                    processar_lote(
+                        itens_lote,
+                        max_workers=int(workers_lote_pdf),
+                        ao_progredir=lambda feitos, total: progress.progress(feitos / total),
+                        timeout_arquivo=float(timeout_lote_pdf),
+                        forcar=sobrescrever_lote_pdf,
+                    )
+                    progress.progress(1.0)
+                    for item in itens_lote:
+                        if item.erro:
+                            st.warning(f"Falha ao processar {item.caminho}: {item.erro}")
+                        if item.ignorado:
+                            skip_inalterados.append(item.caminho)
+                        total_acoes += item.linhas.get("acoes_pdf", 0)
+                        total_divid += item.linhas.get("dividendos_pdf", 0)
+
                     st.success(f"Lote concluído. Ações: {total_acoes}, Dividendos: {total_divid}")
                     if skip_sem_usuario:
                         st.warning(f"Arquivos ignorados por falta de usuário: {len(skip_sem_usuario)}")
                         st.caption("\n".join(skip_sem_usuario))
+                    if skip_inalterados:
+                        st.info(f"PDFs sem mudança desde a última importação ou repetidos (ignorados): {len(skip_inalterados)}")
+                        st.caption("\n".join(skip_inalterados))
     
     # Visualizar histórico existente
     with st.expander("📈 Consultar histórico (sem novo upload)"):
@@ -497,11 +508,10 @@ with tab_pdf:
         # Ações PDF
         with cols_hist[0]:
             if os.path.exists(ACOES_PDF_PATH):
-                df_hist = pd.read_parquet(ACOES_PDF_PATH)
-                meses = sorted(df_hist["Mês/Ano"].dropna().unique()) if not df_hist.empty else []
+                meses = meses_base(ACOES_PDF_PATH)
                 if meses:
                     mes_sel = st.selectbox("Mês/Ano", meses, index=len(meses) - 1, key="hist_acoes_pdf_mes")
-                    df_view = df_hist[df_hist["Mês/Ano"] == mes_sel]
+                    df_view = carregar_base(ACOES_PDF_PATH, meses=[mes_sel])
                     st.metric("Valor total", df_view["Valor"].sum())
                     st.dataframe(df_view, use_container_width=True)
                 else:
@@ -511,11 +521,10 @@ with tab_pdf:
         # Dividendos PDF
         with cols_hist[1]:
             if os.path.exists(DIVIDENDOS_PDF_PATH):
-                df_hist = pd.read_parquet(DIVIDENDOS_PDF_PATH)
-                meses = sorted(df_hist["Mês/Ano"].dropna().unique()) if not df_hist.empty else []
+                meses = meses_base(DIVIDENDOS_PDF_PATH)
                 if meses:
                     mes_sel = st.selectbox("Mês/Ano", meses, index=len(meses) - 1, key="hist_divid_pdf_mes")
-                    df_view = df_hist[df_hist["Mês/Ano"] == mes_sel]
+                    df_view = carregar_base(DIVIDENDOS_PDF_PATH, meses=[mes_sel])
                     st.metric("Total do mês", df_view["Valor Líquido"].sum())
                     st.dataframe(df_view, use_container_width=True)
                 else:
@@ -695,14 +704,14 @@ with tab_pdf:
         
         with col1:
             if os.path.exists(ACOES_PDF_PATH):
-                df_temp = pd.read_parquet(ACOES_PDF_PATH)
+                df_temp = carregar_base(ACOES_PDF_PATH, colunas=["Mês/Ano"])
                 st.info(f"**Ações (PDF)**\n\n{len(df_temp)} linhas")
             else:
                 st.warning("Sem dados de Ações PDF")
         
         with col2:
             if os.path.exists(DIVIDENDOS_PDF_PATH):
-                df_temp = pd.read_parquet(DIVIDENDOS_PDF_PATH)
+                df_temp = carregar_base(DIVIDENDOS_PDF_PATH, colunas=["Mês/Ano"])
                 st.info(f"**Dividendos (PDF)**\n\n{len(df_temp)} linhas")
             else:
                 st.warning("Sem dados de Dividendos PDF")
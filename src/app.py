@@ -11,8 +11,10 @@ from modules.ticker_info import CACHE_PATH as TICKER_INFO_PATH
 
 from modules.usuarios import carregar_usuarios, salvar_usuarios
 from modules.upload_relatorio import ACOES_PATH, RENDA_FIXA_PATH, PROVENTOS_PATH, padronizar_tabelas, padronizar_dividendos
+from modules.base_particionada import assinatura_base, carregar_base
 from modules.avenue_views import aba_acoes_avenue, aba_proventos_avenue, padronizar_dividendos_avenue, carregar_dividendos_avenue, padronizar_acoes_avenue, carregar_acoes_avenue
 from modules.cotacoes import converter_usd_para_brl, obter_historico_indice
+from modules.parse_numeros import parse_num_misto_serie
 from modules.posicao_atual import preparar_posicao_base, atualizar_cotacoes, dataframe_para_excel_bytes, preparar_tabela_posicao_estilizada
 from modules.investimentos_manuais import (
     carregar_caixa,
@@ -111,12 +113,15 @@ div[data-testid="stMetricValue"] {
 
 @st.cache_data(show_spinner=False)
 def _read_parquet_cached(path: str, mtime: float):
-    return pd.read_parquet(path)
+    # Arquivo único ou base particionada por usuário/mês
+    return carregar_base(path)
 
 def carregar_df_parquet(path):
     if os.path.exists(path):
         try:
-            mtime = os.path.getmtime(path)
+            mtime = assinatura_base(path)
+            if mtime is None:
+                return pd.DataFrame()
             return _read_parquet_cached(path, mtime)
         except Exception:
             return pd.DataFrame()
@@ -1810,64 +1815,6 @@ with tab_consolidacao:
                 txt = txt.split(" - ", 1)[0].strip()
             return txt.upper()
 
-        def _parse_num_misto(valor):
-            """Parse numérico tolerante (pt-BR e US), sem destruir strings com milhar."""
-            if pd.isna(valor):
-                return np.nan
-            if isinstance(valor, (int, float, np.integer, np.floating)):
-                try:
-                    return float(valor)
-                except Exception:
-                    return np.nan
-            txt = str(valor).strip()
-            if not txt:
-                return np.nan
-            # remove símbolos comuns
-            txt = txt.replace("R$", "").replace("US$", "").replace("$", "")
-            txt = txt.replace("%", "").replace("\u00a0", " ")
-            txt = txt.replace(" ", "")
-            # parênteses para negativo
-            negativo = False
-            if txt.startswith("(") and txt.endswith(")"):
-                negativo = True
-                txt = txt[1:-1]
-            # sinais
-            if txt.startswith("+"):
-                txt = txt[1:]
-            elif txt.startswith("-"):
-                negativo = True
-                txt = txt[1:]
-
-            if not txt:
-                return np.nan
-
-            # Se tem "." e ",": assume pt-BR (milhar "." e decimal ",")
-            if "." in txt and "," in txt:
-                txt_norm = txt.replace(".", "").replace(",", ".")
-            # Só vírgula: assume decimal
-            elif "," in txt:
-                txt_norm = txt.replace(".", "").replace(",", ".")
-            # Só ponto: pode ser decimal ou milhar
-            elif "." in txt:
-                partes = txt.split(".")
-                # Ex.: 14.000 (milhar) / 1.234.567
-                if len(partes) > 2:
-                    txt_norm = "".join(partes)
-                else:
-                    # uma ocorrência: se exatamente 3 dígitos após ponto, tratar como milhar
-                    if len(partes) == 2 and len(partes[1]) == 3 and partes[0].isdigit() and partes[1].isdigit():
-                        txt_norm = "".join(partes)
-                    else:
-                        txt_norm = txt
-            else:
-                txt_norm = txt
-
-            try:
-                num = float(txt_norm)
-                return -num if negativo else num
-            except Exception:
-                return np.nan
-
         def _parse_mes_ano_to_periodo(mes_ano) -> pd.Period | None:
             if pd.isna(mes_ano):
                 return None
@@ -1942,9 +1889,9 @@ with tab_consolidacao:
                     return None
 
             return {
-                "acoes": _mtime(ACOES_PATH),
-                "renda_fixa": _mtime(RENDA_FIXA_PATH),
-                "proventos": _mtime(PROVENTOS_PATH),
+                "acoes": assinatura_base(ACOES_PATH),
+                "renda_fixa": assinatura_base(RENDA_FIXA_PATH),
+                "proventos": assinatura_base(PROVENTOS_PATH),
                 "vendas_opcoes": _mtime(str(ARQ_VENDAS_OPCOES)),
                 "rentab_version": 8,
             }
@@ -1965,21 +1912,20 @@ with tab_consolidacao:
                 if "Quantidade Disponível" in dfp.columns:
                     qtd = qtd.where(qtd.notna(), dfp["Quantidade Disponível"])
             dfp["Quantidade"] = qtd
-            dfp["Quantidade"] = dfp["Quantidade"].apply(_parse_num_misto)
-            dfp["Quantidade"] = pd.to_numeric(dfp["Quantidade"], errors="coerce").fillna(0.0)
+            dfp["Quantidade"] = parse_num_misto_serie(dfp["Quantidade"]).fillna(0.0)
 
             # Preço: usar exclusivamente a coluna 'Preço' (não derivar de Valor/Quantidade)
             if "Preço" in dfp.columns:
-                dfp["Preco"] = dfp["Preço"].apply(_parse_num_misto)
+                dfp["Preco"] = parse_num_misto_serie(dfp["Preço"])
             else:
                 dfp["Preco"] = np.nan
             dfp["Preco"] = dfp["Preco"].where(dfp["Preco"].notna() & (dfp["Preco"] > 0))
 
             # Valor (para fallback controlado em tipos sem preço no relatório)
             if "Valor" in dfp.columns:
-                dfp["ValorSrc"] = dfp["Valor"].apply(_parse_num_misto)
+                dfp["ValorSrc"] = parse_num_misto_serie(dfp["Valor"])
             elif "Valor de Mercado" in dfp.columns:
-                dfp["ValorSrc"] = dfp["Valor de Mercado"].apply(_parse_num_misto)
+                dfp["ValorSrc"] = parse_num_misto_serie(dfp["Valor de Mercado"])
             else:
                 dfp["ValorSrc"] = np.nan
             dfp["ValorSrc"] = pd.to_numeric(dfp["ValorSrc"], errors="coerce")
@@ -2051,7 +1997,7 @@ with tab_consolidacao:
                 dfd["Chave"] = ""
 
             if "Valor Líquido" in dfd.columns:
-                dfd["Dividendos"] = dfd["Valor Líquido"].apply(_parse_num_misto)
+                dfd["Dividendos"] = parse_num_misto_serie(dfd["Valor Líquido"])
             else:
                 dfd["Dividendos"] = 0.0
             dfd["Dividendos"] = pd.to_numeric(dfd["Dividendos"], errors="coerce").fillna(0.0)
@@ -0,0 +1,117 @@
+"""Confere que `parse_num_misto_serie` (vetorizado) == `parse_num_misto` (escalar).
+
+Teste de propriedade com geração aleatória (semente fixa) de valores no
+formato dos relatórios: números pt-BR/US com milhar, moedas, %, parênteses,
+sinais, espaços, lixo e tipos não-texto. Também mede o ganho de tempo.
+
+Uso: python tools/verify_parse_numeros.py [quantidade] [semente]
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from modules.parse_numeros import parse_num_misto, parse_num_misto_serie  # noqa: E402
+
+CASOS_FIXOS = [
+    "R$ 1.234,56", "US$ 1,234.56", "(1.234,56)", "-14.000", "+14.000", "1.5", "1.50", "14.000",
+    "1.234.567", "12,5%", "  3 ", " R$ 10,00", "()", "(-5)", "-", "+", "", "   ", "abc",
+    "1e3", "1E-2", "-1e+2", ".5", "5.", "1_000", "inf", "-nan", "١٢٣", "1.234\n", "1.2.3,4",
+    "0,001", "$-1", "US$", "R$-(2)", "1.²³⁴", "--1", "+-1", "(1", "1)", "0.000", "007",
+    0, 1, -2.5, True, False, np.int64(7), np.float32(1.5), np.bool_(True), None, np.nan, pd.NA,
+    pd.NaT, Decimal("1.25"), 10**400, pd.Timestamp("2024-01-01"), complex(1, 2),
+]
+
+_PEDACOS = ["R$", "US$", "$", "%", " ", " ", "(", ")", "+", "-", ".", ",", "e", "E", "x", "_", "\t"]
+
+
+def _numero_aleatorio(rng: random.Random) -> str:
+    inteiro = str(rng.randint(0, 10 ** rng.randint(1, 9)))
+    estilo = rng.random()
+    if estilo < 0.35:  # pt-BR com milhar
+        grupos = []
+        while len(inteiro) > 3:
+            grupos.insert(0, inteiro[-3:])
+            inteiro = inteiro[:-3]
+        grupos.insert(0, inteiro)
+        txt = ".".join(grupos) + ("," + str(rng.randint(0, 99)).zfill(2) if rng.random() < 0.7 else "")
+    elif estilo < 0.7:  # US
+        txt = f"{int(inteiro):,}" + (f".{rng.randint(0, 999):0{rng.randint(1, 4)}d}" if rng.random() < 0.7 else "")
+    else:
+        txt = inteiro + (f".{rng.randint(0, 9999)}" if rng.random() < 0.5 else "")
+    if rng.random() < 0.2:
+        txt = f"({txt})"
+    if rng.random() < 0.2:
+        txt = rng.choice(["-", "+"]) + txt
+    if rng.random() < 0.3:
+        txt = rng.choice(["R$ ", "US$", "$", "R$ "]) + txt
+    if rng.random() < 0.1:
+        txt += "%"
+    if rng.random() < 0.2:
+        txt = " " * rng.randint(0, 2) + txt + " " * rng.randint(0, 2)
+    return txt
+
+
+def _valor_aleatorio(rng: random.Random):
+    r = rng.random()
+    if r < 0.65:
+        return _numero_aleatorio(rng)
+    if r < 0.85:  # embaralhado: pedaços e dígitos em qualquer ordem
+        return "".join(rng.choice(_PEDACOS + list("0123456789")) for _ in range(rng.randint(0, 10)))
+    if r < 0.95:
+        return rng.choice([rng.uniform(-1e6, 1e6), rng.randint(-10**6, 10**6), None, np.nan])
+    return rng.choice(CASOS_FIXOS)
+
+
+def _iguais(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+def main() -> None:
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    semente = int(sys.argv[2]) if len(sys.argv) > 2 else 20260101
+    rng = random.Random(semente)
+    valores = CASOS_FIXOS + [_valor_aleatorio(rng) for _ in range(quantidade)]
+    serie = pd.Series(valores, dtype=object)
+
+    t0 = time.perf_counter()
+    esperado = np.array([parse_num_misto(v) for v in valores], dtype=float)
+    t_escalar = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    obtido = parse_num_misto_serie(serie).to_numpy(dtype=float)
+    t_vetor = time.perf_counter() - t0
+
+    ok = _iguais(esperado, obtido)
+    # -0.0 e 0.0 são iguais em ==; confere o sinal também (exceto em NaN)
+    ok &= np.isnan(esperado) | (np.signbit(esperado) == np.signbit(obtido))
+    if not ok.all():
+        for i in np.flatnonzero(~ok)[:20]:
+            print(f"DIVERGE: {valores[i]!r}: escalar={esperado[i]!r} vetorizado={obtido[i]!r}")
+        raise AssertionError(f"{(~ok).sum()} divergências em {len(valores)} valores")
+
+    # Colunas já numéricas e Series com índice não trivial
+    for s in [pd.Series([1, 2, 3]), pd.Series([1.5, np.nan]), pd.Series([True, False]),
+              pd.Series(pd.array([1, None], dtype="Int64")), pd.Series(["1,5", "2"], index=[10, 5], name="Valor"),
+              pd.Series(["R$ 1.234,56", "(3)", None, 2.5] * 300, name="Valor")]:
+        r = parse_num_misto_serie(s)
+        assert r.index.equals(s.index) and r.name == s.name
+        assert _iguais(r.to_numpy(dtype=float), np.array([parse_num_misto(v) for v in s], dtype=float)).all()
+
+    print(
+        f"OK: {len(valores)} valores idênticos | escalar {t_escalar:.2f}s, "
+        f"vetorizado {t_vetor:.2f}s ({t_escalar / max(t_vetor, 1e-9):.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()